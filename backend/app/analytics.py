@@ -0,0 +1,111 @@
+"""Prediction analytics served from incrementally maintained rollup tables.
+
+Every stored prediction adds itself to one hourly and one daily bucket of
+``prediction_rollups`` (per model and predicted category) inside the same
+transaction, so analytics queries read a handful of pre-aggregated rows
+instead of scanning ``predictions``.
+"""
+import datetime
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .database import Prediction, PredictionRollup, to_naive_utc
+
+ROLLUP_FEATURES = ['price', 'size', 'rooms', 'bathroom', 'parking', 'furnished',
+                   'elevator', 'balcony', 'floor', 'age', 'location_score']
+GRANULARITIES = ("hour", "day")
+
+# strftime formats that truncate a timestamp to the start of its bucket
+_BUCKET_FORMATS = {"hour": "%Y-%m-%d %H:00:00", "day": "%Y-%m-%d 00:00:00"}
+
+
+def bucket_start(timestamp, granularity):
+    """Truncate a timestamp to the start of its hour or day bucket"""
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _upsert_rollup(db: Session, granularity, start, model_used, prediction_result, count, sums):
+    """Add a count and feature sums to one rollup bucket, creating it if needed"""
+    values = {
+        "granularity": granularity,
+        "bucket_start": start,
+        "model_used": model_used,
+        "prediction_result": prediction_result,
+        "count": count,
+        **{f"sum_{feature}": float(sums[feature]) for feature in ROLLUP_FEATURES},
+    }
+    statement = insert(PredictionRollup).values(**values)
+    statement = statement.on_conflict_do_update(
+        index_elements=["granularity", "bucket_start", "model_used", "prediction_result"],
+        set_={
+            "count": PredictionRollup.count + statement.excluded.count,
+            **{f"sum_{feature}": getattr(PredictionRollup, f"sum_{feature}") + getattr(statement.excluded, f"sum_{feature}")
+               for feature in ROLLUP_FEATURES},
+        },
+    )
+    db.execute(statement)
+
+
+def update_rollups(db: Session, prediction: Prediction):
+    """Add one prediction to its hourly and daily rollups (caller commits)"""
+    sums = {feature: getattr(prediction, feature) for feature in ROLLUP_FEATURES}
+    for granularity in GRANULARITIES:
+        _upsert_rollup(db, granularity, bucket_start(prediction.timestamp, granularity),
+                       prediction.model_used, prediction.prediction_result, 1, sums)
+
+
+def rebuild_rollups(db: Session):
+    """Rebuild all rollups from the predictions table with one GROUP BY per granularity"""
+    db.query(PredictionRollup).delete()
+    for granularity in GRANULARITIES:
+        bucket = func.strftime(_BUCKET_FORMATS[granularity], Prediction.timestamp)
+        rows = db.query(
+            bucket,
+            Prediction.model_used,
+            Prediction.prediction_result,
+            func.count(Prediction.id),
+            *[func.sum(getattr(Prediction, feature)) for feature in ROLLUP_FEATURES],
+        ).group_by(bucket, Prediction.model_used, Prediction.prediction_result).all()
+
+        for start, model_used, prediction_result, count, *sums in rows:
+            _upsert_rollup(db, granularity, datetime.datetime.fromisoformat(start), model_used,
+                           prediction_result, count, dict(zip(ROLLUP_FEATURES, sums)))
+    db.commit()
+
+
+def ensure_rollups(db: Session):
+    """Backfill rollups for databases that have predictions from before rollups existed"""
+    if db.query(PredictionRollup.id).first() is None and db.query(Prediction.id).first() is not None:
+        rebuild_rollups(db)
+
+
+def get_prediction_analytics(db: Session, granularity="day", start=None, end=None, model_name=None):
+    """Get prediction counts and mean input features per bucket, model and category"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    query = db.query(PredictionRollup).filter(PredictionRollup.granularity == granularity)
+    if start is not None:
+        query = query.filter(PredictionRollup.bucket_start >= bucket_start(start, granularity))
+    if end is not None:
+        # end is exclusive, like the export filters
+        query = query.filter(PredictionRollup.bucket_start < end)
+    if model_name is not None:
+        query = query.filter(PredictionRollup.model_used == model_name)
+    query = query.order_by(PredictionRollup.bucket_start, PredictionRollup.model_used,
+                           PredictionRollup.prediction_result)
+
+    return [{
+        "bucket_start": rollup.bucket_start.isoformat(),
+        "model_used": rollup.model_used,
+        "prediction_result": rollup.prediction_result,
+        "count": rollup.count,
+        "mean_features": {
+            feature: getattr(rollup, f"sum_{feature}") / rollup.count for feature in ROLLUP_FEATURES
+        },
+    } for rollup in query.all()]
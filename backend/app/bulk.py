@@ -0,0 +1,239 @@
+"""Bulk scoring jobs for CSV files of apartment features.
+
+The upload is streamed straight to a job directory on disk, so memory does
+not grow with the file, and every block is validated column by column on the
+way so malformed files are rejected before a job is queued. A single worker
+thread then reads it back with
+``pandas.read_csv`` in fixed-size chunks. Each chunk is scored with one
+vectorized ``make_prediction`` call, added to the drift monitor's live window
+when the default models score it, and appended to
+the result file, which is downloaded once the job is done. Job state lives in
+``status.json`` next to the files, so any worker process can report it.
+"""
+import datetime
+import glob
+import io
+import json
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import models.ml_models as ml_models
+from models.registry import market_registry
+from .drift import drift_monitor
+from models.dataset import FEATURE_COLUMNS
+
+BULK_JOB_DIR = os.getenv(
+    "BULK_JOB_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'jobs'),
+)
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "50000"))
+# Finished jobs and their files are removed after this many hours
+BULK_JOB_TTL_HOURS = float(os.getenv("BULK_JOB_TTL_HOURS", "24"))
+BULK_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Rent categories predicted by the models
+N_CLASSES = 3
+# Columns that must hold whole numbers, as in ApartmentFeatures
+INTEGER_COLUMNS = ['rooms', 'bathroom', 'parking', 'furnished', 'elevator', 'balcony', 'floor', 'location_score']
+
+# One job at a time keeps bulk scoring from starving interactive requests
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-scoring")
+
+
+class BulkValidationError(ValueError):
+    """Raised when an upload does not have the expected columns or values"""
+
+
+def check_header(header_line):
+    """Validate the CSV header line of an upload, before the rest is read; returns its columns"""
+    columns = [column.strip().strip('"') for column in header_line.split(",")]
+    missing = [column for column in FEATURE_COLUMNS if column not in columns]
+    if missing:
+        raise BulkValidationError(f"Missing columns: {', '.join(missing)}")
+    return columns
+
+
+class UploadValidator:
+    """Validate an upload block by block as it is received, carrying partial lines over"""
+
+    def __init__(self):
+        self.columns = None
+        self.rows = 0
+        self._partial = b""
+
+    def feed(self, data, final=False):
+        data = self._partial + data
+        if final:
+            self._partial = b""
+        else:
+            data, _, self._partial = data.rpartition(b"\n")
+        if self.columns is None:
+            if not data:
+                return
+            header, _, data = data.partition(b"\n")
+            self.columns = check_header(header.decode("utf-8-sig").rstrip("\r"))
+        if not data.strip():
+            return
+
+        try:
+            chunk = pd.read_csv(io.BytesIO(data), header=None, names=self.columns,
+                                usecols=FEATURE_COLUMNS, dtype=str)
+        except (pd.errors.ParserError, UnicodeDecodeError) as e:
+            raise BulkValidationError(f"Unreadable CSV after row {self.rows}: {e}")
+        _, valid, errors = validate_chunk(chunk)
+        if not valid.all():
+            row = int(np.flatnonzero(~valid)[0])
+            raise BulkValidationError(f"Row {self.rows + row}: {errors[row]}")
+        self.rows += len(chunk)
+
+
+def job_dir(job_id):
+    return os.path.join(BULK_JOB_DIR, job_id)
+
+
+def _write_status(job_id, **fields):
+    path = os.path.join(job_dir(job_id), "status.json")
+    status = read_status(job_id) or {}
+    status.update(fields)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(status, f)
+    os.replace(tmp_path, path)
+
+
+def read_status(job_id):
+    """Get the status of a job, or None if there is no such job"""
+    path = os.path.join(job_dir(job_id), "status.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def result_path(job_id, fmt):
+    return os.path.join(job_dir(job_id), f"result.{fmt}")
+
+
+def create_job(model_name, fmt, explain=False, market=None):
+    """Create a job directory and return its id and the path to write the upload to"""
+    remove_expired_jobs()
+    job_id = uuid.uuid4().hex
+    os.makedirs(job_dir(job_id))
+    _write_status(job_id, id=job_id, status="uploading", model_name=model_name, format=fmt, explain=explain, market=market,
+                  created_at=datetime.datetime.utcnow().isoformat(), rows_scored=0, rows_invalid=0)
+    return job_id, os.path.join(job_dir(job_id), "input.csv")
+
+
+def validate_chunk(chunk):
+    """Coerce a chunk's feature columns to numbers and describe invalid rows.
+
+    Returns the feature matrix, a mask of valid rows and a per-row error
+    string (None for valid rows).
+    """
+    values = chunk[FEATURE_COLUMNS].apply(pd.to_numeric, errors="coerce")
+    invalid = values.isna().to_numpy()
+    integer_values = values[INTEGER_COLUMNS].to_numpy()
+    with np.errstate(invalid="ignore"):
+        invalid[:, [FEATURE_COLUMNS.index(column) for column in INTEGER_COLUMNS]] |= integer_values % 1 != 0
+
+    valid = ~invalid.any(axis=1)
+    errors = np.full(len(chunk), None, dtype=object)
+    # Only the (usually few) invalid rows are described one by one
+    for row in np.flatnonzero(~valid):
+        errors[row] = "invalid " + ", ".join(np.asarray(FEATURE_COLUMNS)[invalid[row]])
+    return values.to_numpy(dtype=np.float64), valid, errors
+
+
+def score_chunk(chunk, first_row, model_name, explain=False, bundle=None):
+    """Score one chunk, returning the result rows as a DataFrame.
+
+    With ``explain``, the Random Forest's per-feature contributions to the
+    predicted class are added as ``contribution_<feature>`` columns.
+    """
+    features, valid, errors = validate_chunk(chunk)
+    prediction = np.full(len(chunk), np.nan)
+    probabilities = np.full((len(chunk), N_CLASSES), np.nan)
+    contributions = np.full((len(chunk), len(FEATURE_COLUMNS)), np.nan)
+    if valid.any():
+        if explain:
+            valid_prediction, valid_probabilities, _, valid_contributions = ml_models.explain_prediction(features[valid], bundle)
+            predicted_class = np.argmax(valid_probabilities, axis=1)
+            contributions[valid] = valid_contributions[np.arange(len(predicted_class)), :, predicted_class]
+        else:
+            valid_prediction, valid_probabilities = ml_models.make_prediction(features[valid], model_name, bundle)
+        if bundle is None:
+            # Drift tracks the default market's models, as for /predict/
+            drift_monitor.observe(features[valid])
+        prediction[valid] = valid_prediction
+        probabilities[valid] = valid_probabilities
+
+    result = pd.DataFrame({"row": np.arange(first_row, first_row + len(chunk))})
+    result["prediction"] = pd.array(prediction, dtype="Int64")
+    for i in range(N_CLASSES):
+        result[f"probability_{i}"] = probabilities[:, i]
+    if explain:
+        for i, feature in enumerate(FEATURE_COLUMNS):
+            result[f"contribution_{feature}"] = contributions[:, i]
+    result["error"] = errors
+    return result, int((~valid).sum())
+
+
+def _append_result(path, result, fmt, header):
+    with open(path, "a", newline="") as f:
+        if fmt == "csv":
+            result.to_csv(f, header=header, index=False)
+        else:
+            f.write(result.to_json(orient="records", lines=True))
+            f.write("\n")
+
+
+def run_job(job_id, input_path, chunk_size=BULK_CHUNK_SIZE):
+    """Score an uploaded file chunk by chunk"""
+    status = read_status(job_id)
+    fmt, model_name, explain = status["format"], status["model_name"], status.get("explain", False)
+    output_path = result_path(job_id, fmt)
+    _write_status(job_id, status="running", started_at=datetime.datetime.utcnow().isoformat())
+
+    try:
+        start = time.perf_counter()
+        bundle = market_registry.get_bundle(status["market"]) if status.get("market") else None
+        rows_scored = rows_invalid = 0
+        # Read everything as strings so bad values are reported instead of failing the chunk
+        reader = pd.read_csv(input_path, usecols=lambda column: column in FEATURE_COLUMNS,
+                             dtype=str, chunksize=chunk_size)
+        for chunk in reader:
+            result, invalid = score_chunk(chunk, rows_scored, model_name, explain, bundle)
+            _append_result(output_path, result, fmt, header=rows_scored == 0)
+            rows_scored += len(chunk)
+            rows_invalid += invalid
+            _write_status(job_id, rows_scored=rows_scored, rows_invalid=rows_invalid)
+        _write_status(job_id, status="done", seconds=time.perf_counter() - start,
+                      finished_at=datetime.datetime.utcnow().isoformat())
+    except Exception as e:
+        _write_status(job_id, status="failed", error=str(e))
+    finally:
+        os.remove(input_path)
+
+
+def submit_job(job_id, input_path):
+    _write_status(job_id, status="queued")
+    _executor.submit(run_job, job_id, input_path)
+
+
+def discard_job(job_id):
+    """Remove a job whose upload was rejected"""
+    shutil.rmtree(job_dir(job_id), ignore_errors=True)
+
+
+def remove_expired_jobs(ttl_hours=BULK_JOB_TTL_HOURS):
+    """Delete the directories of jobs created more than ttl_hours ago"""
+    cutoff = time.time() - ttl_hours * 3600
+    for path in glob.glob(os.path.join(BULK_JOB_DIR, "*")):
+        if os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
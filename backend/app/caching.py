@@ -0,0 +1,149 @@
+"""HTTP caching and compression for responses that only change on retraining.
+
+Responses from the model-version-stable endpoints get an ETag and a
+Last-Modified header derived from the version of the models loaded in memory
+that answer them (the default models, or the market's bundle). Conditional
+requests that still match are answered with 304 straight from the middleware,
+before the endpoint (and ``ml_models``) runs at all. Full responses above a
+size threshold are compressed with brotli or gzip.
+"""
+import datetime
+import gzip
+import hashlib
+import os
+from email.utils import format_datetime, parsedate_to_datetime
+
+from starlette.datastructures import MutableHeaders
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import models.ml_models as ml_models
+from models.packaging import CorruptBundleError
+from models.registry import DEFAULT_MARKET, UnknownMarketError, market_registry
+
+# Endpoints whose responses only change when the models are retrained
+VERSIONED_PATHS = ("/model-metrics/", "/clustering/", "/visualizations/", "/feature-importance/", "/plot-data/")
+
+CACHE_MAX_AGE = int(os.getenv("CACHE_MAX_AGE", "30"))
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+
+def _representation_etag(version, request):
+    """Build an ETag for one representation of a versioned resource"""
+    variant = "|".join([
+        request.url.path,
+        request.url.query,
+        request.headers.get("accept", ""),
+    ])
+    digest = hashlib.sha1(variant.encode("utf-8")).hexdigest()[:8]
+    return f'W/"{version}-{digest}"'
+
+
+def _serving_version(request):
+    """Version and creation time of the in-memory models that answer a request"""
+    market = request.query_params.get("market", DEFAULT_MARKET)
+    if market == DEFAULT_MARKET:
+        return ml_models.model_version, ml_models.model_created_at
+    try:
+        # Loads a cold market, which the endpoint would do anyway
+        bundle = market_registry.get_bundle(market)
+    except (UnknownMarketError, CorruptBundleError):
+        # The endpoint answers with the error
+        return None, None
+    return bundle["version"], bundle.get("created_at")
+
+
+def _last_modified(created_at):
+    if created_at is None:
+        return None
+    created_at = datetime.datetime.fromisoformat(created_at)
+    return created_at.replace(tzinfo=datetime.timezone.utc, microsecond=0)
+
+
+def _opaque_tag(tag):
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _not_modified(request, etag, last_modified):
+    """Check a request's validators against the current ETag and Last-Modified"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison, as required for If-None-Match
+        return "*" in tags or any(_opaque_tag(tag) == _opaque_tag(etag) for tag in tags)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _choose_encoding(accept_encoding):
+    """Pick the best supported content coding the client accepts"""
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    """Compress a response body with the chosen content coding"""
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class ModelVersionCacheMiddleware(BaseHTTPMiddleware):
+    """Conditional GET, Cache-Control and compression for versioned endpoints"""
+
+    async def dispatch(self, request, call_next):
+        if request.method not in ("GET", "HEAD") or not request.url.path.startswith(VERSIONED_PATHS):
+            return await call_next(request)
+
+        version, created_at = await run_in_threadpool(_serving_version, request)
+        if version is None:
+            # Nothing to version against yet (models still being trained)
+            return await call_next(request)
+
+        etag = _representation_etag(version, request)
+        last_modified = _last_modified(created_at)
+        validators = {
+            "ETag": etag,
+            "Cache-Control": f"public, max-age={CACHE_MAX_AGE}, must-revalidate",
+            "Vary": "Accept, Accept-Encoding",
+        }
+        if last_modified is not None:
+            validators["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+        if _not_modified(request, etag, last_modified):
+            return Response(status_code=304, headers=validators)
+
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        if (await run_in_threadpool(_serving_version, request))[0] != version:
+            # The models were replaced while this response was built; don't let it be cached
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        headers = MutableHeaders(raw=[(k, v) for k, v in response.raw_headers if k != b"content-length"])
+        headers.update(validators)
+
+        encoding = _choose_encoding(request.headers.get("accept-encoding", ""))
+        if encoding is not None and len(body) >= COMPRESSION_MIN_SIZE and "content-encoding" not in headers:
+            body = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+
+        return Response(content=body, status_code=response.status_code, headers=dict(headers),
+                        background=response.background)
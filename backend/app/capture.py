@@ -0,0 +1,129 @@
+"""Capture of live prediction traffic for deterministic replay.
+
+When ``TRAFFIC_CAPTURE_DIR`` is set, every ``/predict/`` request on the
+default market is appended to a compact binary log: arrival time, model,
+raw features, the prediction and probabilities returned, and the time the
+model took. A log file starts with one JSON header line (model version,
+record layout, model names) followed by fixed-size records, so it can be
+read back with a single ``np.frombuffer``. Records are flushed to the file
+every ``TRAFFIC_CAPTURE_FLUSH_RECORDS`` requests (each one by default), so a
+log can be replayed while it is still being written. A new file is started
+whenever the models are retrained or the file reaches
+``TRAFFIC_CAPTURE_FILE_MB``.
+
+Logs are replayed with ``python -m benchmarks.replay``.
+"""
+import datetime
+import json
+import os
+import threading
+
+import numpy as np
+
+from models.dataset import FEATURE_COLUMNS
+
+TRAFFIC_CAPTURE_DIR = os.getenv("TRAFFIC_CAPTURE_DIR", "")
+TRAFFIC_CAPTURE_FILE_MB = float(os.getenv("TRAFFIC_CAPTURE_FILE_MB", "64"))
+# Records buffered before they are flushed to the capture file
+TRAFFIC_CAPTURE_FLUSH_RECORDS = max(1, int(os.getenv("TRAFFIC_CAPTURE_FLUSH_RECORDS", "1")))
+CAPTURE_SUFFIX = ".traffic"
+
+# Models a record can refer to, by index; only ever append to this list
+CAPTURE_MODELS = ["knn", "naive_bayes", "random_forest", "hist_gradient_boosting", "fast"]
+N_CLASSES = 3
+
+RECORD_DTYPE = np.dtype([
+    ("time", "<f8"),  # Unix time the request arrived
+    ("latency_ms", "<f4"),  # Model time, as measured by the endpoint
+    ("model", "u1"),
+    ("explain", "u1"),
+    ("prediction", "<i2"),
+    ("features", "<f8", (len(FEATURE_COLUMNS),)),
+    ("probability", "<f4", (N_CLASSES,)),
+])
+
+
+def _dtype_descr(dtype):
+    return [list(field) for field in dtype.descr]
+
+
+def read_capture(path):
+    """Read a capture file, returning its header and its records as a structured array"""
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        dtype = np.dtype([(name, kind, *map(tuple, shape)) for name, kind, *shape in header["dtype"]])
+        data = f.read()
+    # A record cut short by a crash is ignored
+    n_records = len(data) // dtype.itemsize
+    return header, np.frombuffer(data, dtype=dtype, count=n_records)
+
+
+class TrafficRecorder:
+    """Append prediction requests to rotating capture files"""
+
+    def __init__(self, capture_dir=TRAFFIC_CAPTURE_DIR, max_file_mb=TRAFFIC_CAPTURE_FILE_MB,
+                 flush_records=TRAFFIC_CAPTURE_FLUSH_RECORDS):
+        self.capture_dir = capture_dir
+        self.max_file_bytes = max_file_mb * 1024 * 1024
+        self.flush_records = flush_records
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._file = None
+        self._version = None
+        self._bytes = 0
+        self._unflushed = 0
+        self.records = 0
+
+    @property
+    def enabled(self):
+        return bool(self.capture_dir)
+
+    def _open(self, model_version):
+        self._close()
+        os.makedirs(self.capture_dir, exist_ok=True)
+        now = datetime.datetime.utcnow()
+        path = os.path.join(self.capture_dir, f"capture-{now:%Y%m%dT%H%M%S%f}-{os.getpid()}{CAPTURE_SUFFIX}")
+        header = {"model_version": model_version, "created_at": now.isoformat(), "models": CAPTURE_MODELS,
+                  "features": FEATURE_COLUMNS, "dtype": _dtype_descr(RECORD_DTYPE)}
+        self._file = open(path, "ab")
+        self._bytes = self._file.write(json.dumps(header).encode() + b"\n")
+        self._file.flush()
+        self._version = model_version
+        self._unflushed = 0
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def record(self, arrival_time, features_array, model_name, explain, prediction, probabilities, latency_ms,
+               model_version):
+        """Append one scored request (a single feature row) to the current capture file"""
+        if not self.enabled or model_name not in CAPTURE_MODELS:
+            return
+        record = np.zeros(1, dtype=RECORD_DTYPE)
+        record["time"] = arrival_time
+        record["latency_ms"] = latency_ms
+        record["model"] = CAPTURE_MODELS.index(model_name)
+        record["explain"] = explain
+        record["prediction"] = prediction[0]
+        record["features"] = features_array[0]
+        record["probability"] = probabilities[0]
+
+        with self._lock:
+            if self._stopped:
+                return
+            if self._file is None or model_version != self._version or self._bytes >= self.max_file_bytes:
+                self._open(model_version)
+            self._bytes += self._file.write(record.tobytes())
+            self.records += 1
+            self._unflushed += 1
+            if self._unflushed >= self.flush_records:
+                self._file.flush()
+                self._unflushed = 0
+
+    def stop(self):
+        """Flush and close the current file; later requests are not recorded"""
+        with self._lock:
+            self._stopped = True
+            self._close()
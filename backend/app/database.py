@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime
+from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import datetime
@@ -33,6 +33,43 @@ class Prediction(Base):
     model_used = Column(String)
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
 
+# Prediction columns in the order used by exports and the Parquet archive
+PREDICTION_COLUMNS = ['id', 'price', 'size', 'rooms', 'bathroom', 'parking', 'furnished',
+                      'elevator', 'balcony', 'floor', 'age', 'location_score',
+                      'prediction_result', 'model_used', 'timestamp']
+
+def to_naive_utc(value):
+    """Convert a timezone-aware datetime to the naive UTC form timestamps are stored in"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+class PredictionRollup(Base):
+    """Running counts and feature sums of predictions per time bucket"""
+    __tablename__ = "prediction_rollups"
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "model_used", "prediction_result",
+                         name="uq_prediction_rollup_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    model_used = Column(String, nullable=False)
+    prediction_result = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    sum_price = Column(Float, nullable=False, default=0.0)
+    sum_size = Column(Float, nullable=False, default=0.0)
+    sum_rooms = Column(Float, nullable=False, default=0.0)
+    sum_bathroom = Column(Float, nullable=False, default=0.0)
+    sum_parking = Column(Float, nullable=False, default=0.0)
+    sum_furnished = Column(Float, nullable=False, default=0.0)
+    sum_elevator = Column(Float, nullable=False, default=0.0)
+    sum_balcony = Column(Float, nullable=False, default=0.0)
+    sum_floor = Column(Float, nullable=False, default=0.0)
+    sum_age = Column(Float, nullable=False, default=0.0)
+    sum_location_score = Column(Float, nullable=False, default=0.0)
+
 # Create tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
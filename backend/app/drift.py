@@ -0,0 +1,144 @@
+"""Streaming input-drift monitor for prediction traffic.
+
+At training time every feature gets fixed bins (training-set quantiles) and
+reference counts. Each prediction request then adds its inputs to the live
+counts with a constant amount of work, and PSI and binned KS scores between
+the two distributions are computed only when asked for. Live counts are kept
+in memory per process and start over when the models are retrained or the
+monitor is reset.
+"""
+import datetime
+import os
+import threading
+
+import numpy as np
+
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", "10"))
+# Population stability index thresholds for "moderate" and "significant" drift
+PSI_WARNING = 0.1
+PSI_ALERT = 0.25
+# Added to empty bins so PSI stays finite
+_EPSILON = 1e-4
+
+
+def build_reference(X_raw, feature_names, n_bins=DRIFT_BINS):
+    """Compute bin edges and reference counts for every feature of the training data"""
+    X_raw = np.asarray(X_raw, dtype=np.float64)
+    quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+    edges, counts = [], []
+    for column in X_raw.T:
+        # Repeated quantiles (discrete features) collapse into one edge
+        feature_edges = np.unique(np.quantile(column, quantiles))
+        bins = np.searchsorted(feature_edges, column, side="right")
+        edges.append(feature_edges.tolist())
+        counts.append(np.bincount(bins, minlength=len(feature_edges) + 1).tolist())
+    return {"features": list(feature_names), "n_rows": len(X_raw), "edges": edges, "counts": counts}
+
+
+def _status(psi):
+    if psi >= PSI_ALERT:
+        return "significant"
+    if psi >= PSI_WARNING:
+        return "moderate"
+    return "stable"
+
+
+class DriftMonitor:
+    """Live feature histograms compared against a training-time reference"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reference = None
+
+    def set_reference(self, reference):
+        """Install a new reference and start a fresh live window"""
+        n_bins = max(len(edges) for edges in reference["edges"]) + 1
+        # Pad every feature to the same number of edges; +inf edges are never reached
+        edges = np.full((len(reference["edges"]), n_bins - 1), np.inf)
+        reference_counts = np.zeros((len(reference["edges"]), n_bins))
+        for i, (feature_edges, counts) in enumerate(zip(reference["edges"], reference["counts"])):
+            edges[i, :len(feature_edges)] = feature_edges
+            reference_counts[i, :len(counts)] = counts
+
+        with self._lock:
+            self.reference = reference
+            self._edges = edges
+            self._n_bins = n_bins
+            self._reference_counts = reference_counts
+            self._offsets = np.arange(len(edges)) * n_bins
+            self._reset()
+
+    def _reset(self):
+        self._live = np.zeros(self._edges.shape[0] * self._n_bins, dtype=np.int64)
+        self.n_live = 0
+        self.since = datetime.datetime.utcnow()
+
+    def reset(self):
+        with self._lock:
+            if self.reference is not None:
+                self._reset()
+
+    def observe(self, features_array):
+        """Add a batch of raw input rows (n_rows, n_features) to the live counts"""
+        if self.reference is None:
+            return
+        X = np.asarray(features_array, dtype=np.float64)
+        with self._lock:
+            # Same bins as np.searchsorted(edges, x, side="right"), for all features at once
+            bins = (X[:, :, None] >= self._edges[None, :, :]).sum(axis=2)
+            self._live += np.bincount((bins + self._offsets).ravel(), minlength=self._live.size)
+            self.n_live += len(X)
+
+    def scores(self):
+        """PSI and binned KS statistic per feature for the current live window"""
+        if self.reference is None:
+            return None
+        with self._lock:
+            live = self._live.reshape(-1, self._n_bins).astype(np.float64)
+            reference, reference_counts = self.reference, self._reference_counts
+            n_live, since = self.n_live, self.since
+
+        result = {
+            "n_reference": reference["n_rows"],
+            "n_live": n_live,
+            "since": since.isoformat(),
+            "features": {},
+        }
+        if n_live == 0:
+            return result
+
+        expected = reference_counts / reference_counts.sum(axis=1, keepdims=True)
+        actual = live / n_live
+        # Padded bins are empty on both sides and contribute nothing
+        padded = (reference_counts == 0) & (live == 0)
+        expected_s = np.where(padded, 1.0, np.maximum(expected, _EPSILON))
+        actual_s = np.where(padded, 1.0, np.maximum(actual, _EPSILON))
+        psi = ((actual_s - expected_s) * np.log(actual_s / expected_s)).sum(axis=1)
+        ks = np.abs(np.cumsum(actual, axis=1) - np.cumsum(expected, axis=1)).max(axis=1)
+
+        for name, feature_psi, feature_ks in zip(reference["features"], psi, ks):
+            result["features"][name] = {"psi": float(feature_psi), "ks": float(feature_ks),
+                                        "status": _status(feature_psi)}
+        result["max_psi"] = float(psi.max())
+        result["status"] = _status(psi.max())
+        return result
+
+    def prometheus_metrics(self):
+        """Render the current scores in the Prometheus text exposition format"""
+        scores = self.scores()
+        lines = [
+            "# HELP prediction_drift_live_rows Prediction inputs observed in the current drift window",
+            "# TYPE prediction_drift_live_rows gauge",
+            f"prediction_drift_live_rows {scores['n_live'] if scores else 0}",
+        ]
+        if scores and scores["features"]:
+            for metric, help_text in (("psi", "Population stability index"), ("ks", "Binned Kolmogorov-Smirnov statistic")):
+                lines += [f"# HELP prediction_drift_{metric} {help_text} against the training data",
+                          f"# TYPE prediction_drift_{metric} gauge"]
+                lines += [f'prediction_drift_{metric}{{feature="{name}"}} {values[metric]:.6f}'
+                          for name, values in scores["features"].items()]
+        return "\n".join(lines) + "\n"
+
+
+# Shared by the prediction endpoints of this process
+drift_monitor = DriftMonitor()
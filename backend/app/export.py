@@ -0,0 +1,82 @@
+"""Streaming export of the prediction history as CSV or NDJSON.
+
+Rows are read through a server-side cursor in ``yield_per`` batches and
+encoded one batch at a time, so memory stays flat however large the
+``predictions`` table is. Archived rows are streamed from their Parquet
+segments first, so exports cover both storage tiers.
+"""
+import csv
+import io
+import itertools
+import json
+
+from sqlalchemy import select
+
+from .database import PREDICTION_COLUMNS, Prediction, SessionLocal, to_naive_utc
+from .retention import iter_archived_rows
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+EXPORT_COLUMNS = PREDICTION_COLUMNS
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_BATCH_SIZE = 5000
+
+
+def iter_prediction_rows(db, start=None, end=None, model_name=None, batch_size=EXPORT_BATCH_SIZE):
+    """Yield batches of prediction rows (as tuples) matching the filters, oldest first"""
+    statement = select(*[getattr(Prediction, column) for column in EXPORT_COLUMNS])
+    if start is not None:
+        statement = statement.where(Prediction.timestamp >= start)
+    if end is not None:
+        statement = statement.where(Prediction.timestamp < end)
+    if model_name is not None:
+        statement = statement.where(Prediction.model_used == model_name)
+    statement = statement.order_by(Prediction.id).execution_options(yield_per=batch_size)
+
+    for partition in db.execute(statement).partitions():
+        yield [tuple(row) for row in partition]
+
+
+def _with_iso_timestamp(row):
+    timestamp = row[-1]
+    return row[:-1] + (timestamp.isoformat() if timestamp is not None else None,)
+
+
+def _encode_csv(rows, header=False):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows([_with_iso_timestamp(row) for row in rows])
+    return buf.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(rows):
+    records = [dict(zip(EXPORT_COLUMNS, _with_iso_timestamp(row))) for row in rows]
+    if orjson is not None:
+        return b"".join(orjson.dumps(record) + b"\n" for record in records)
+    return "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+
+
+def stream_predictions(fmt="csv", start=None, end=None, model_name=None, batch_size=EXPORT_BATCH_SIZE):
+    """Generate the encoded export chunk by chunk.
+
+    The session is owned by the generator because the response body is sent
+    after the endpoint (and its dependencies) have returned.
+    """
+    # Both tiers store naive UTC timestamps
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    db = SessionLocal()
+    try:
+        if fmt == "csv":
+            yield _encode_csv([], header=True)
+        # Archived rows are older than everything still in SQLite
+        batches = itertools.chain(iter_archived_rows(start, end, model_name, batch_size),
+                                  iter_prediction_rows(db, start, end, model_name, batch_size))
+        for rows in batches:
+            yield _encode_csv(rows) if fmt == "csv" else _encode_ndjson(rows)
+    finally:
+        db.close()
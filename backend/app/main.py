@@ -1,16 +1,37 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import pandas as pd
 import numpy as np
-from typing import List, Dict
-from pydantic import BaseModel
-from .database import get_db, engine, SessionLocal
+from typing import List, Dict, Optional
+import datetime
+import math
+import time
+from pydantic import BaseModel, Field
+from .database import get_db, engine, SessionLocal, create_tables
+from .serialization import fast_response
+from .caching import ModelVersionCacheMiddleware
+from .analytics import ensure_rollups, get_prediction_analytics
+from .export import EXPORT_FORMATS, stream_predictions
+from .retention import RetentionScheduler
+from .drift import drift_monitor
+from .shadow import ShadowEvaluator
+from .capture import TrafficRecorder
+from .bulk import (BULK_FORMATS, INTEGER_COLUMNS, BulkValidationError, UploadValidator, create_job,
+                   discard_job, read_status, result_path, submit_job)
+from models.dataset import FEATURE_COLUMNS
+from models.registry import DEFAULT_MARKET, UnknownMarketError, list_markets, market_registry
+from models.packaging import CorruptBundleError
 from sqlalchemy.orm import Session
 import models.ml_models as ml_models
 import json
 
 app = FastAPI(title="Apartment Rental ML API")
 
+# Serve 304s and compressed bodies for responses that only change on retraining
+app.add_middleware(ModelVersionCacheMiddleware)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -34,37 +55,181 @@ class ApartmentFeatures(BaseModel):
     age: float
     location_score: int
     
+class Explanation(BaseModel):
+    bias: Dict[str, float]
+    contributions: Dict[str, Dict[str, float]]
+
 class PredictionResponse(BaseModel):
     prediction: int
     probability: Dict[str, float]
+    explanation: Optional[Explanation] = None
     
+class SweepAxis(BaseModel):
+    feature: str
+    start: float = Field(allow_inf_nan=False)
+    stop: float = Field(allow_inf_nan=False)
+    steps: int = Field(50, ge=1, le=ml_models.MAX_SWEEP_POINTS)
+
+class SweepRequest(BaseModel):
+    base: ApartmentFeatures
+    vary: List[SweepAxis]
+    models: List[str] = ["random_forest"]
+
 class TrainingResult(BaseModel):
     algorithm: str
     accuracy: float
     precision: float
     recall: float
     f1_score: float
+    # Costs recorded when the models were trained
+    training_seconds: Optional[float] = None
+    artifact_bytes: Optional[int] = None
+    single_row_ms: Optional[float] = None
+    batch_ms: Optional[float] = None
+    batch_rows: Optional[int] = None
     
 class ClusteringResult(BaseModel):
     cluster_id: int
     data_points: List[Dict[str, float]]
     centroid: Dict[str, float]
 
+class ModelImportance(BaseModel):
+    baseline_accuracy: float
+    importances_mean: List[float]
+    importances_std: List[float]
+
+class FeatureImportanceResult(BaseModel):
+    model_version: str
+    n_repeats: int
+    features: List[str]
+    models: Dict[str, ModelImportance]
+
+class PredictionRollupResult(BaseModel):
+    bucket_start: str
+    model_used: str
+    prediction_result: int
+    count: int
+    mean_features: Dict[str, float]
+
+class LatencySummary(BaseModel):
+    p50: float
+    p99: float
+
+class ShadowModelResult(BaseModel):
+    samples: int
+    agreement_rate: float
+    mean_probability_diff: float
+    active_latency_ms: Optional[LatencySummary] = None
+    shadow_latency_ms: Optional[LatencySummary] = None
+
+class ShadowResult(BaseModel):
+    enabled: bool
+    active_version: Optional[str] = None
+    candidate_version: Optional[str] = None
+    sample_rate: float
+    queued: int
+    dropped: int
+    errors: int
+    models: Dict[str, ShadowModelResult]
+
+class FeatureDrift(BaseModel):
+    psi: float
+    ks: float
+    status: str
+
+class DriftResult(BaseModel):
+    n_reference: int
+    n_live: int
+    since: str
+    features: Dict[str, FeatureDrift]
+    max_psi: Optional[float] = None
+    status: Optional[str] = None
+
+# Archives old predictions in the background
+retention_scheduler = RetentionScheduler()
+
+# Scores a sample of live traffic with a candidate model bundle, if configured
+shadow_evaluator = ShadowEvaluator()
+
+# Logs /predict/ traffic for replay against other model versions, if configured
+traffic_recorder = TrafficRecorder()
+
 # Initialize ML models
 @app.on_event("startup")
 def startup_db_client():
+    # Tables must exist before any request, whether the models are loaded or trained
+    create_tables()
+    
+    # Backfill analytics rollups for predictions stored before they existed
+    db = SessionLocal()
     try:
-        ml_models.initialize_models()
+        ensure_rollups(db)
     except Exception as e:
-        print(f"Error initializing models: {e}")
+        print(f"Error building prediction rollups: {e}")
+    finally:
+        db.close()
+    
+    # Models are loaded or trained in the background; see /health/ready
+    ml_models.start_model_preparation()
+    
+    retention_scheduler.start()
+    shadow_evaluator.start()
+
+@app.on_event("shutdown")
+def shutdown_db_client():
+    retention_scheduler.stop()
+    shadow_evaluator.stop()
+    traffic_recorder.stop()
+
+def model_not_ready(error):
+    """503 response for requests that need a model that is still loading or training"""
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "5"})
+
+def market_bundle(market):
+    """Model bundle of a market, or None for the default models"""
+    if market is None or market == DEFAULT_MARKET:
+        return None
+    try:
+        return market_registry.get_bundle(market)
+    except UnknownMarketError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except CorruptBundleError as e:
+        raise HTTPException(status_code=503, detail=f"Models of market '{market}' failed verification: {e}")
 
 # Endpoints for prediction and model metrics
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Apartment Rental ML API"}
 
+@app.get("/health/live")
+def health_live():
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def health_ready(model_name: Optional[str] = None):
+    """Ready once any prediction model can serve traffic, or the given one if model_name is set"""
+    statuses = dict(ml_models.MODEL_STATUS)
+    if model_name is not None and model_name not in statuses:
+        raise HTTPException(status_code=404, detail=f"Unknown model: {model_name}")
+    
+    if model_name is not None:
+        ready = statuses[model_name] == "ready"
+    else:
+        ready = any(statuses[name] == "ready" for name in PREDICTION_MODELS)
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "model_version": ml_models.model_version,
+        "complete": all(status == "ready" for status in statuses.values()),
+        "models": statuses,
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
 @app.post("/predict/", response_model=PredictionResponse)
-def predict_rental(features: ApartmentFeatures, model_name: str = "random_forest"):
+def predict_rental(features: ApartmentFeatures, model_name: str = "random_forest", explain: bool = False,
+                   market: Optional[str] = None):
+    if explain and model_name != "random_forest":
+        raise HTTPException(status_code=400, detail="explain is only available for random_forest")
+    bundle = market_bundle(market)
     try:
         # Convert features to numpy array for prediction
         feature_array = np.array([[
@@ -74,7 +239,20 @@ def predict_rental(features: ApartmentFeatures, model_name: str = "random_forest
         ]])
         
         # Make prediction
-        prediction, probabilities = ml_models.make_prediction(feature_array, model_name)
+        arrival_time = time.time()
+        start = time.perf_counter()
+        if explain:
+            # Same forest pass, with the probabilities split over the features
+            prediction, probabilities, bias, contributions = ml_models.explain_prediction(feature_array, bundle)
+        else:
+            prediction, probabilities = ml_models.make_prediction(feature_array, model_name, bundle)
+        latency_ms = (time.perf_counter() - start) * 1e3
+        if bundle is None:
+            # Drift and shadow evaluation track the default market's models
+            drift_monitor.observe(feature_array)
+            shadow_evaluator.submit(feature_array, model_name, prediction, probabilities, latency_ms)
+            traffic_recorder.record(arrival_time, feature_array, model_name, explain, prediction, probabilities,
+                                    latency_ms, ml_models.model_version)
         
         # Convert probabilities to dictionary
         probs_dict = {str(i): float(prob) for i, prob in enumerate(probabilities[0])}
@@ -82,42 +260,253 @@ def predict_rental(features: ApartmentFeatures, model_name: str = "random_forest
         # Store prediction in database
         db = SessionLocal()
         try:
-            ml_models.store_prediction(db, features, prediction, model_name)
+            model_used = model_name if bundle is None else f"{model_name}@{market}"
+            ml_models.store_prediction(db, features, prediction, model_used)
         finally:
             db.close()
             
-        return {"prediction": int(prediction[0]), "probability": probs_dict}
+        response = {"prediction": int(prediction[0]), "probability": probs_dict}
+        if explain:
+            response["explanation"] = {
+                "bias": {str(i): float(value) for i, value in enumerate(bias)},
+                "contributions": {name: {str(i): float(value) for i, value in enumerate(row)}
+                                  for name, row in zip(FEATURE_COLUMNS, contributions[0])},
+            }
+        return response
+    except ml_models.ModelNotReadyError as e:
+        raise model_not_ready(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
 
+PREDICTION_MODELS = ("knn", "naive_bayes", "random_forest", "hist_gradient_boosting", "fast")
+
+@app.post("/predict/sweep")
+def predict_sweep(sweep: SweepRequest, request: Request, market: Optional[str] = None):
+    """Score a 1-D or 2-D what-if grid around a base apartment (not stored)"""
+    features = [axis.feature for axis in sweep.vary]
+    if not 1 <= len(features) <= 2 or len(set(features)) != len(features):
+        raise HTTPException(status_code=400, detail="vary must list one or two distinct features")
+    unknown = [name for name in features if name not in FEATURE_COLUMNS]
+    unknown += [name for name in sweep.models if name not in PREDICTION_MODELS]
+    if unknown or not sweep.models:
+        raise HTTPException(status_code=400, detail=f"Unknown features or models: {', '.join(unknown)}")
+    
+    # Bound the grid size before building any arrays; integer features take
+    # at most one value per whole number in their range
+    sizes = [min(axis.steps, math.floor(abs(axis.stop - axis.start)) + 2) if axis.feature in INTEGER_COLUMNS
+             else axis.steps for axis in sweep.vary]
+    if math.prod(sizes) > ml_models.MAX_SWEEP_POINTS:
+        raise HTTPException(status_code=400, detail=f"Sweep is limited to {ml_models.MAX_SWEEP_POINTS} points")
+    
+    axes = []
+    for axis in sweep.vary:
+        values = np.linspace(axis.start, axis.stop, axis.steps)
+        if axis.feature in INTEGER_COLUMNS:
+            values = np.unique(np.round(values))
+        axes.append((axis.feature, values))
+    
+    base = [getattr(sweep.base, name) for name in FEATURE_COLUMNS]
+    bundle = market_bundle(market)
+    try:
+        return fast_response(request, ml_models.sweep_predictions(base, axes, sweep.models, bundle))
+    except ml_models.ModelNotReadyError as e:
+        raise model_not_ready(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Sweep error: {str(e)}")
+
+# Upload bytes are written to disk in blocks of this size
+BULK_WRITE_BUFFER = 1 << 20
+
+@app.post("/predict/bulk", status_code=202)
+async def submit_bulk_scoring(request: Request, model_name: str = "random_forest", format: str = "csv",
+                              explain: bool = False, market: Optional[str] = None):
+    """Score a CSV upload (raw request body) as a background job"""
+    if format not in BULK_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+    if explain and model_name != "random_forest":
+        raise HTTPException(status_code=400, detail="explain is only available for random_forest")
+    if await run_in_threadpool(market_bundle, market) is None:
+        market = None
+        try:
+            ml_models.ensure_prediction_model(model_name)
+        except ml_models.ModelNotReadyError as e:
+            raise model_not_ready(e)
+    
+    job_id, input_path = create_job(model_name, format, explain, market)
+    validator = UploadValidator()
+    
+    def write_block(f, block, final=False):
+        validator.feed(block, final)
+        f.write(block)
+    
+    try:
+        buffer = bytearray()
+        with open(input_path, "wb") as f:
+            async for chunk in request.stream():
+                buffer += chunk
+                # Reject files with the wrong columns as soon as the header arrives
+                if len(buffer) >= BULK_WRITE_BUFFER or (validator.columns is None and b"\n" in buffer):
+                    await run_in_threadpool(write_block, f, bytes(buffer))
+                    buffer.clear()
+            await run_in_threadpool(write_block, f, bytes(buffer), True)
+        if validator.columns is None:
+            raise BulkValidationError("The upload is empty")
+    except BulkValidationError as e:
+        discard_job(job_id)
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception:
+        discard_job(job_id)
+        raise
+    
+    submit_job(job_id, input_path)
+    return {"job_id": job_id, "status": "queued", "status_url": f"/predict/bulk/{job_id}",
+            "download_url": f"/predict/bulk/{job_id}/result"}
+
+@app.get("/predict/bulk/{job_id}")
+def get_bulk_scoring_status(job_id: str):
+    status = read_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if status["status"] == "done":
+        status["download_url"] = f"/predict/bulk/{job_id}/result"
+    return status
+
+@app.get("/predict/bulk/{job_id}/result")
+def download_bulk_scoring_result(job_id: str):
+    status = read_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if status["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}")
+    
+    fmt = status["format"]
+    return FileResponse(result_path(job_id, fmt), media_type=BULK_FORMATS[fmt],
+                        filename=f"predictions-{job_id}.{fmt}")
+
 @app.get("/model-metrics/", response_model=List[TrainingResult])
-def get_model_metrics():
+def get_model_metrics(request: Request, market: Optional[str] = None):
+    bundle = market_bundle(market)
     try:
-        metrics = ml_models.get_model_metrics()
-        return metrics
+        return fast_response(request, ml_models.get_model_metrics(bundle))
+    except ml_models.ModelNotReadyError as e:
+        raise model_not_ready(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving metrics: {str(e)}")
 
 @app.get("/clustering/", response_model=List[ClusteringResult])
-def get_clustering_results():
+def get_clustering_results(request: Request, market: Optional[str] = None):
+    bundle = market_bundle(market)
     try:
-        clustering_results = ml_models.get_clustering_results()
-        return clustering_results
+        clustering_results = ml_models.get_clustering_results(bundle)
+        return fast_response(request, clustering_results)
+    except ml_models.ModelNotReadyError as e:
+        raise model_not_ready(e)
+    except ml_models.AnalysisNotAvailableError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving clustering results: {str(e)}")
 
+@app.get("/feature-importance/", response_model=FeatureImportanceResult)
+def get_feature_importance(market: Optional[str] = None):
+    bundle = market_bundle(market)
+    try:
+        return ml_models.get_permutation_importance(bundle)
+    except ml_models.ModelNotReadyError as e:
+        raise model_not_ready(e)
+    except ml_models.AnalysisNotAvailableError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving feature importance: {str(e)}")
+
 @app.get("/visualizations/{plot_type}")
-def get_visualization(plot_type: str):
+def get_visualization(plot_type: str, market: Optional[str] = None):
+    bundle = market_bundle(market)
     try:
-        visualization_data = ml_models.get_visualization(plot_type)
+        visualization_data = ml_models.get_visualization(plot_type, bundle)
         return {"data": json.loads(visualization_data)}
+    except ml_models.ModelNotReadyError as e:
+        raise model_not_ready(e)
+    except ml_models.AnalysisNotAvailableError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving visualization: {str(e)}")
 
+PLOT_TYPES = ("clustering", "model_comparison", "feature_importance")
+
+@app.get("/plot-data/{plot_type}")
+def get_plot_data(request: Request, plot_type: str, points: int = ml_models.PLOT_POINTS,
+                  market: Optional[str] = None):
+    if plot_type not in PLOT_TYPES:
+        raise HTTPException(status_code=404, detail=f"plot_type must be one of: {', '.join(PLOT_TYPES)}")
+    if not 1 <= points <= ml_models.MAX_PLOT_POINTS:
+        raise HTTPException(status_code=400, detail=f"points must be between 1 and {ml_models.MAX_PLOT_POINTS}")
+    bundle = market_bundle(market)
+    try:
+        return fast_response(request, ml_models.get_plot_data(plot_type, points, bundle))
+    except ml_models.ModelNotReadyError as e:
+        raise model_not_ready(e)
+    except ml_models.AnalysisNotAvailableError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving plot data: {str(e)}")
+
 @app.get("/predictions/", response_model=List[Dict])
-def get_previous_predictions(db: Session = Depends(get_db)):
+def get_previous_predictions(request: Request, db: Session = Depends(get_db)):
     try:
         predictions = ml_models.get_stored_predictions(db)
-        return predictions
+        return fast_response(request, predictions)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving predictions: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error retrieving predictions: {str(e)}")
+
+@app.get("/predictions/export")
+def export_predictions(format: str = "csv",
+                       start: Optional[datetime.datetime] = None,
+                       end: Optional[datetime.datetime] = None,
+                       model_name: Optional[str] = None):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+    
+    filename = f"predictions.{format}"
+    return StreamingResponse(
+        stream_predictions(format, start, end, model_name),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/analytics/predictions/", response_model=List[PredictionRollupResult])
+def get_prediction_analytics_endpoint(request: Request, granularity: str = "day",
+                                      start: Optional[datetime.datetime] = None,
+                                      end: Optional[datetime.datetime] = None,
+                                      model_name: Optional[str] = None,
+                                      db: Session = Depends(get_db)):
+    if granularity not in ("hour", "day"):
+        raise HTTPException(status_code=400, detail="granularity must be 'hour' or 'day'")
+    try:
+        analytics = get_prediction_analytics(db, granularity, start, end, model_name)
+        return fast_response(request, analytics)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving prediction analytics: {str(e)}")
+
+@app.get("/drift/", response_model=DriftResult)
+def get_drift():
+    scores = drift_monitor.scores()
+    if scores is None:
+        raise HTTPException(status_code=503, detail="Drift reference not available until models are trained")
+    return scores
+
+@app.get("/drift/metrics", response_class=PlainTextResponse)
+def get_drift_metrics():
+    return PlainTextResponse(drift_monitor.prometheus_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.post("/drift/reset")
+def reset_drift():
+    drift_monitor.reset()
+    return {"message": "Drift window reset"}
+
+@app.get("/shadow/", response_model=ShadowResult)
+def get_shadow_results():
+    return shadow_evaluator.summary()
+
+@app.get("/markets/")
+def get_markets():
+    return {"default": DEFAULT_MARKET, "markets": list_markets(), "registry": market_registry.stats()}
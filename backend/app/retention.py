@@ -0,0 +1,260 @@
+"""Time-based retention of the predictions table.
+
+Rows older than ``PREDICTION_RETENTION_DAYS`` are moved, batch by batch, into
+zstd-compressed Parquet segments partitioned by day under
+``data/archive/predictions/date=YYYY-MM-DD/``. Each batch is written to disk
+before its rows are deleted in a short transaction, so the SQLite write lock
+is only ever held for one batch. Small segments are periodically compacted
+into one file per day and the database file is vacuumed.
+
+Run one retention cycle by hand from the backend directory with:
+
+    python -m app.retention
+"""
+import argparse
+import datetime
+import glob
+import os
+import threading
+
+from sqlalchemy import delete, select, text
+
+from .database import PREDICTION_COLUMNS, Prediction, SessionLocal, engine, to_naive_utc
+
+ARCHIVE_DIR = os.getenv(
+    "PREDICTION_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'archive', 'predictions'),
+)
+RETENTION_DAYS = float(os.getenv("PREDICTION_RETENTION_DAYS", "30"))
+# Hours between background retention cycles; 0 disables the scheduler
+RETENTION_INTERVAL_HOURS = float(os.getenv("PREDICTION_RETENTION_INTERVAL_HOURS", "24"))
+ARCHIVE_BATCH_SIZE = 10000
+
+
+def _archive_schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [("id", pa.int64())]
+        + [(column, pa.float64()) for column in ('price', 'size')]
+        + [(column, pa.int64()) for column in ('rooms', 'bathroom', 'parking', 'furnished',
+                                                 'elevator', 'balcony', 'floor')]
+        + [("age", pa.float64()), ("location_score", pa.int64()), ("prediction_result", pa.int64()),
+           ("model_used", pa.string()), ("timestamp", pa.timestamp("us"))]
+    )
+
+
+def _partition_dir(day):
+    return os.path.join(ARCHIVE_DIR, f"date={day.isoformat()}")
+
+
+def _write_segment(path, rows):
+    """Atomically write rows (tuples in PREDICTION_COLUMNS order) to a Parquet segment"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = list(zip(*rows))
+    table = pa.table({name: list(values) for name, values in zip(PREDICTION_COLUMNS, columns)},
+                     schema=_archive_schema())
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+def archive_predictions(retention_days=RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move predictions older than the retention age into Parquet segments.
+
+    Batches are taken in id order and segments are named after their id
+    range, so a batch interrupted between writing and deleting is simply
+    rewritten to the same file on the next run.
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=retention_days)
+    columns = [getattr(Prediction, column) for column in PREDICTION_COLUMNS]
+    archived = 0
+
+    while True:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(*columns).where(Prediction.timestamp < cutoff).order_by(Prediction.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            by_day = {}
+            for row in rows:
+                by_day.setdefault(row.timestamp.date(), []).append(tuple(row))
+            for day, day_rows in by_day.items():
+                os.makedirs(_partition_dir(day), exist_ok=True)
+                segment = f"part-{day_rows[0][0]:012d}-{day_rows[-1][0]:012d}.parquet"
+                _write_segment(os.path.join(_partition_dir(day), segment), day_rows)
+
+            # One short write transaction per batch
+            db.execute(delete(Prediction).where(Prediction.id.between(rows[0].id, rows[-1].id),
+                                                Prediction.timestamp < cutoff))
+            db.commit()
+            archived += len(rows)
+        finally:
+            db.close()
+
+    return archived
+
+
+def compact_archive(min_segments=2):
+    """Merge the segments of each day partition into a single file"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    compacted = 0
+    for partition in sorted(glob.glob(os.path.join(ARCHIVE_DIR, "date=*"))):
+        segments = sorted(glob.glob(os.path.join(partition, "part-*.parquet")))
+        if len(segments) < min_segments:
+            continue
+
+        table = pa.concat_tables([pq.read_table(segment) for segment in segments]).sort_by("id")
+        ids = table.column("id")
+        merged = os.path.join(partition, f"part-{ids[0].as_py():012d}-{ids[-1].as_py():012d}.parquet")
+        tmp_path = merged + ".tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, merged)
+        for segment in segments:
+            if segment != merged:
+                os.remove(segment)
+        compacted += 1
+    return compacted
+
+
+def vacuum_database():
+    """Reclaim the space freed by archived rows"""
+    with engine.connect() as connection:
+        connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+
+
+def run_retention(retention_days=RETENTION_DAYS, vacuum=True):
+    """Run one full retention cycle: archive, compact and vacuum"""
+    archived = archive_predictions(retention_days)
+    compacted = compact_archive()
+    if vacuum and archived:
+        vacuum_database()
+    return {"archived": archived, "compacted_partitions": compacted}
+
+
+def _id_range(segment):
+    """Get the (first, last) prediction id of a segment from its file name"""
+    _, first, last = os.path.basename(segment)[:-len(".parquet")].split("-")
+    return int(first), int(last)
+
+
+def _live_segments(partition):
+    """List a partition's segments, skipping any whose id range another segment covers.
+
+    A compaction interrupted after writing the merged file leaves its source
+    segments behind; their rows are already in the merged file.
+    """
+    segments = sorted(glob.glob(os.path.join(partition, "part-*.parquet")))
+    ranges = {segment: _id_range(segment) for segment in segments}
+    return [segment for segment in segments
+            if not any(other != segment and ranges[other][0] <= ranges[segment][0]
+                       and ranges[segment][1] <= ranges[other][1] for other in segments)]
+
+
+def _segments(start=None, end=None, newest_first=False):
+    """List archive segments whose day partition overlaps [start, end)"""
+    segments = []
+    for partition in sorted(glob.glob(os.path.join(ARCHIVE_DIR, "date=*")), reverse=newest_first):
+        day = datetime.date.fromisoformat(os.path.basename(partition)[len("date="):])
+        if start is not None and day < start.date():
+            continue
+        if end is not None and day > end.date():
+            continue
+        live = _live_segments(partition)
+        segments += reversed(live) if newest_first else live
+    return segments
+
+
+def _filter_batch(batch, start, end, model_name):
+    import pyarrow.compute as pc
+
+    mask = None
+    conditions = []
+    if start is not None:
+        conditions.append(pc.greater_equal(batch.column("timestamp"), start))
+    if end is not None:
+        conditions.append(pc.less(batch.column("timestamp"), end))
+    if model_name is not None:
+        conditions.append(pc.equal(batch.column("model_used"), model_name))
+    for condition in conditions:
+        mask = condition if mask is None else pc.and_(mask, condition)
+    return batch if mask is None else batch.filter(mask)
+
+
+def iter_archived_rows(start=None, end=None, model_name=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """Yield batches of archived rows (tuples in PREDICTION_COLUMNS order), oldest first"""
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    segments = _segments(start, end)
+    if not segments:
+        return
+
+    import pyarrow.parquet as pq
+
+    for segment in segments:
+        for batch in pq.ParquetFile(segment).iter_batches(batch_size=batch_size, columns=PREDICTION_COLUMNS):
+            batch = _filter_batch(batch, start, end, model_name)
+            if batch.num_rows:
+                yield list(zip(*(batch.column(name).to_pylist() for name in PREDICTION_COLUMNS)))
+
+
+def latest_archived_rows(limit):
+    """Get up to ``limit`` of the newest archived rows, newest first"""
+    rows = []
+    segments = _segments(newest_first=True)
+    if not segments:
+        return rows
+
+    import pyarrow.parquet as pq
+
+    for segment in segments:
+        table = pq.read_table(segment, columns=PREDICTION_COLUMNS).sort_by([("id", "descending")])
+        rows += list(zip(*(table.column(name).to_pylist() for name in PREDICTION_COLUMNS)))
+        if len(rows) >= limit:
+            break
+    return rows[:limit]
+
+
+class RetentionScheduler:
+    """Run retention cycles periodically in a background thread"""
+
+    def __init__(self, interval_hours=RETENTION_INTERVAL_HOURS):
+        self.interval_seconds = interval_hours * 3600
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="prediction-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                result = run_retention()
+                print(f"Prediction retention: {result}")
+            except Exception as e:
+                print(f"Error running prediction retention: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive old predictions to Parquet")
+    parser.add_argument("--days", type=float, default=RETENTION_DAYS, help="Keep this many days in SQLite")
+    parser.add_argument("--no-vacuum", action="store_true")
+    args = parser.parse_args(argv)
+
+    print(run_retention(args.days, vacuum=not args.no_vacuum))
+
+
+if __name__ == "__main__":
+    main()
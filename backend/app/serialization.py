@@ -0,0 +1,101 @@
+"""Fast response serialization for large, trusted payloads.
+
+Endpoints whose payloads are built internally by ``ml_models`` can return
+them through ``fast_response`` instead of letting FastAPI re-validate them
+against the response model and encode them with the stdlib ``json`` module.
+Clients whose ``Accept`` header ranks ``application/msgpack`` above JSON get
+MessagePack instead.
+"""
+import os
+
+import numpy as np
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Set FAST_SERIALIZATION=0 to fall back to FastAPI's validated JSON responses
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "1") != "0"
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def _default(obj):
+    """Convert NumPy values that the encoders do not handle natively"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response encoded with orjson, including NumPy scalars and arrays"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+class MsgPackResponse(Response):
+    """MessagePack response for clients that ask for it"""
+    media_type = "application/msgpack"
+
+    def render(self, content) -> bytes:
+        return msgpack.packb(content, default=_default, use_bin_type=True)
+
+
+def _media_ranges(accept):
+    """Parse an Accept header into (media range, quality) pairs"""
+    ranges = []
+    for part in accept.split(","):
+        media_range, *params = [item.strip() for item in part.split(";")]
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((media_range.lower(), quality))
+    return ranges
+
+
+def _quality(ranges, media_type):
+    """Quality of a media type under the most specific range that matches it, 0 if none does"""
+    patterns = (media_type, media_type.split("/")[0] + "/*", "*/*")
+    matches = [(patterns.index(media_range), quality) for media_range, quality in ranges if media_range in patterns]
+    return min(matches)[1] if matches else 0.0
+
+
+def wants_msgpack(request: Request) -> bool:
+    """Check whether the client ranks MessagePack above JSON"""
+    ranges = _media_ranges(request.headers.get("accept", ""))
+    msgpack_quality = max(_quality(ranges, media_type) for media_type in MSGPACK_MEDIA_TYPES)
+    return msgpack_quality > _quality(ranges, "application/json")
+
+
+def fast_response(request: Request, content):
+    """Serialize a trusted payload, skipping response-model validation.
+
+    Returns the content unchanged when fast serialization is disabled, so
+    FastAPI validates and encodes it as usual.
+    """
+    if msgpack is not None and wants_msgpack(request):
+        return MsgPackResponse(content)
+    if not FAST_SERIALIZATION:
+        return content
+    if orjson is not None:
+        return ORJSONResponse(content)
+    return JSONResponse(content)
@@ -0,0 +1,140 @@
+"""Shadow evaluation of a candidate model bundle against live traffic.
+
+When ``SHADOW_MODEL_DIR`` points at a saved model directory (for example a
+retrained copy of ``models/saved``), a fraction of ``/predict/`` inputs is
+copied into a bounded queue. A background thread scores them with the
+candidate through ``make_prediction`` and records how often it agrees with the
+active model and how their latencies compare. The request path only does a
+non-blocking ``put``; samples are dropped when the queue is full.
+"""
+import collections
+import os
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+
+import models.ml_models as ml_models
+
+SHADOW_MODEL_DIR = os.getenv("SHADOW_MODEL_DIR", "")
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.1"))
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "1000"))
+# Latency percentiles are taken over this many recent samples per model
+LATENCY_WINDOW = 1000
+
+
+def _percentiles(samples):
+    if not samples:
+        return None
+    return {"p50": float(np.percentile(samples, 50)), "p99": float(np.percentile(samples, 99))}
+
+
+class ShadowEvaluator:
+    """Score sampled requests with a candidate bundle in a background thread"""
+
+    def __init__(self, model_dir=SHADOW_MODEL_DIR, sample_rate=SHADOW_SAMPLE_RATE, queue_size=SHADOW_QUEUE_SIZE):
+        self.model_dir = model_dir
+        self.sample_rate = sample_rate
+        self.candidate = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.dropped = 0
+        self.errors = 0
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self._thread is not None
+
+    def start(self):
+        if not self.model_dir or self.sample_rate <= 0 or self._thread is not None:
+            return
+        try:
+            self.candidate = ml_models.load_bundle(self.model_dir)
+        except Exception as e:
+            print(f"Error loading shadow model bundle: {e}")
+            return
+        self._thread = threading.Thread(target=self._run, name="shadow-evaluation", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass  # daemon thread, exits with the process
+
+    def submit(self, features_array, model_name, prediction, probabilities, latency_ms):
+        """Offer one scored request to the shadow queue without ever blocking"""
+        if self._thread is None or random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((features_array, model_name, prediction, probabilities, latency_ms))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            features_array, model_name, prediction, probabilities, latency_ms = item
+            try:
+                start = time.perf_counter()
+                shadow_prediction, shadow_probabilities = ml_models.make_prediction(
+                    features_array, model_name, bundle=self.candidate)
+                shadow_latency_ms = (time.perf_counter() - start) * 1e3
+            except Exception as e:
+                print(f"Error in shadow prediction: {e}")
+                with self._lock:
+                    self.errors += 1
+                continue
+            self._record(model_name, prediction, probabilities, latency_ms,
+                         shadow_prediction, shadow_probabilities, shadow_latency_ms)
+
+    def _record(self, model_name, prediction, probabilities, latency_ms,
+                shadow_prediction, shadow_probabilities, shadow_latency_ms):
+        with self._lock:
+            stats = self._stats.setdefault(model_name, {
+                "samples": 0,
+                "agreements": 0,
+                "probability_diff_sum": 0.0,
+                "active_latency_ms": collections.deque(maxlen=LATENCY_WINDOW),
+                "shadow_latency_ms": collections.deque(maxlen=LATENCY_WINDOW),
+            })
+            stats["samples"] += len(prediction)
+            stats["agreements"] += int(np.sum(np.asarray(prediction) == np.asarray(shadow_prediction)))
+            stats["probability_diff_sum"] += float(np.abs(np.asarray(probabilities) - shadow_probabilities).sum(axis=1).sum())
+            stats["active_latency_ms"].append(latency_ms)
+            stats["shadow_latency_ms"].append(shadow_latency_ms)
+
+    def summary(self):
+        """Agreement and latency of the candidate against the active models"""
+        with self._lock:
+            models = {
+                name: {
+                    "samples": stats["samples"],
+                    "agreement_rate": stats["agreements"] / stats["samples"],
+                    # Total variation distance between the two probability vectors
+                    "mean_probability_diff": stats["probability_diff_sum"] / stats["samples"] / 2,
+                    "active_latency_ms": _percentiles(list(stats["active_latency_ms"])),
+                    "shadow_latency_ms": _percentiles(list(stats["shadow_latency_ms"])),
+                }
+                for name, stats in self._stats.items() if stats["samples"]
+            }
+            dropped, errors = self.dropped, self.errors
+
+        return {
+            "enabled": self.enabled,
+            "active_version": ml_models.model_version,
+            "candidate_version": self.candidate.get("version") if self.candidate else None,
+            "sample_rate": self.sample_rate,
+            "queued": self._queue.qsize(),
+            "dropped": dropped,
+            "errors": errors,
+            "models": models,
+        }
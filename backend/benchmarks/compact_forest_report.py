@@ -0,0 +1,120 @@
+"""Compare full and compact random forests on size, memory, latency and accuracy.
+
+Run from the backend directory:
+
+    python -m benchmarks.compact_forest_report
+
+Every configuration is trained on the standard train split and measured on the
+test split. "sklearn" rows are plain ``RandomForestClassifier`` models; the
+"compact" rows are the same forests converted to ``CompactForest``. The report
+is written as Markdown and JSON next to the saved models.
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+import models.ml_models as ml_models
+from models.compact_forest import COMPACT_FOREST_PARAMS, CompactForest
+
+# Operating points to compare, from the full forest down to very small ones
+CONFIGURATIONS = [
+    {"n_estimators": 100, "max_depth": None, "min_samples_leaf": 1},
+    {"n_estimators": 50, "max_depth": 16, "min_samples_leaf": 2},
+    COMPACT_FOREST_PARAMS,
+    {"n_estimators": 20, "max_depth": 10, "min_samples_leaf": 5},
+    {"n_estimators": 10, "max_depth": 8, "min_samples_leaf": 10},
+]
+
+
+def resident_bytes(model):
+    """Bytes held by the model's node and leaf-value arrays once loaded.
+
+    scikit-learn allocates tree buffers outside the Python allocator, so they
+    are counted from the tree state rather than with tracemalloc.
+    """
+    if isinstance(model, CompactForest):
+        return sum(array.nbytes for array in (model.feature, model.threshold, model.children_left,
+                                              model.children_right, model.value, model.roots))
+    total = 0
+    for estimator in model.estimators_:
+        state = estimator.tree_.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes
+    return total
+
+
+def latency_ms(fn, repeats):
+    """Median and 99th percentile latency of fn in milliseconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e3)
+    return float(np.median(samples)), float(np.percentile(samples, 99))
+
+
+def measure(name, params, model, X_test, y_test, repeats):
+    blob = pickle.dumps(model)
+    single = X_test[:1]
+    single_p50, single_p99 = latency_ms(lambda: model.predict_proba(single), repeats)
+    batch_p50, _ = latency_ms(lambda: model.predict_proba(X_test), max(3, repeats // 20))
+    return {
+        "name": name,
+        "params": params,
+        "artifact_kb": len(blob) / 1024,
+        "resident_kb": resident_bytes(model) / 1024,
+        "single_p50_ms": single_p50,
+        "single_p99_ms": single_p99,
+        "batch_ms": batch_p50,
+        "batch_rows": len(X_test),
+        "accuracy": float(np.mean(model.predict(X_test) == np.asarray(y_test))),
+    }
+
+
+def to_markdown(results):
+    lines = [
+        "# Compact forest trade-off report",
+        "",
+        "| Model | Trees | Max depth | Min leaf | Artifact (KB) | Resident (KB) | Single p50 (ms) | Single p99 (ms) | Batch (ms) | Accuracy |",
+        "|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for r in results:
+        p = r["params"]
+        lines.append(
+            f"| {r['name']} | {p['n_estimators']} | {p['max_depth']} | {p['min_samples_leaf']} "
+            f"| {r['artifact_kb']:.0f} | {r['resident_kb']:.0f} | {r['single_p50_ms']:.3f} "
+            f"| {r['single_p99_ms']:.3f} | {r['batch_ms']:.2f} | {r['accuracy']:.4f} |"
+        )
+    lines += ["", f"Batch latency is for {results[0]['batch_rows']} rows."]
+    return "\n".join(lines) + "\n"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact forest size/latency/accuracy report")
+    parser.add_argument("--repeats", type=int, default=200, help="Single-row timing repeats")
+    parser.add_argument("--output-dir", default=ml_models.get_saved_dir())
+    args = parser.parse_args(argv)
+
+    X_train, X_test, y_train, y_test, _, _ = ml_models.preprocess_data(ml_models.load_dataset())
+
+    results = []
+    for params in CONFIGURATIONS:
+        forest = RandomForestClassifier(random_state=42, **params).fit(X_train, y_train)
+        results.append(measure("sklearn", params, forest, X_test, y_test, args.repeats))
+        results.append(measure("compact", params, CompactForest(forest), X_test, y_test, args.repeats))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    markdown = to_markdown(results)
+    with open(os.path.join(args.output_dir, "compact_forest_report.md"), "w") as f:
+        f.write(markdown)
+    with open(os.path.join(args.output_dir, "compact_forest_report.json"), "w") as f:
+        json.dump(results, f, indent=2)
+    print(markdown)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Replay captured /predict/ traffic against saved model bundles or a running API.
+
+Run from the backend directory with the capture files (or directories of
+them) written under ``TRAFFIC_CAPTURE_DIR``:
+
+    python -m benchmarks.replay data/traffic --target models/saved --target /path/to/candidate/saved
+    python -m benchmarks.replay data/traffic --target http://localhost:8000 --speed 10
+
+A target that is a directory is a saved model bundle, scored offline through
+``ml_models`` one request at a time in capture order. A target that is a URL
+is a running API; requests are sent at their captured inter-arrival times
+divided by ``--speed`` (``--speed 0`` sends them back to back), and the
+latency is the client round trip. Replaying against an API stores the
+predictions in its database, so point it at a local instance.
+
+The first target is the baseline the others are compared against. With a
+single target, the baseline is the capture itself: the outputs that were
+served and the model time measured by the endpoint, which is comparable to
+offline targets only. The report lists output disagreements, probability
+differences and latency percentiles (and their differences), overall and per
+model.
+"""
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+
+import models.ml_models as ml_models
+from app.capture import CAPTURE_SUFFIX, N_CLASSES, read_capture
+from models.dataset import FEATURE_COLUMNS
+from models.explain import ForestExplainer
+
+PERCENTILES = (50, 90, 99)
+INTEGER_FEATURES = {'rooms', 'bathroom', 'parking', 'furnished', 'elevator', 'balcony', 'floor', 'location_score'}
+
+
+def load_traffic(paths, limit=None):
+    """Read capture files (or directories of them) into one array ordered by arrival time"""
+    files = []
+    for path in paths:
+        files += sorted(glob.glob(os.path.join(path, f"*{CAPTURE_SUFFIX}"))) if os.path.isdir(path) else [path]
+    if not files:
+        raise SystemExit("No capture files found")
+
+    model_names, chunks = None, []
+    for path in files:
+        header, records = read_capture(path)
+        if model_names is not None and header["models"] != model_names:
+            raise SystemExit(f"{path} was captured with a different model list")
+        model_names = header["models"]
+        chunks.append(records)
+    records = np.concatenate(chunks)
+    records = records[np.argsort(records["time"], kind="stable")]
+    return records[:limit], model_names
+
+
+def captured_result(records):
+    """The outputs and model latencies that were served when the traffic was captured"""
+    return {
+        "target": "capture",
+        "prediction": records["prediction"].astype(np.int64),
+        "probability": records["probability"].astype(np.float64),
+        "latency_ms": records["latency_ms"].astype(np.float64),
+        "ok": np.ones(len(records), dtype=bool),
+    }
+
+
+def _empty_result(target, n):
+    return {
+        "target": target,
+        "prediction": np.full(n, -1, dtype=np.int64),
+        "probability": np.full((n, N_CLASSES), np.nan),
+        "latency_ms": np.full(n, np.nan),
+        "ok": np.zeros(n, dtype=bool),
+    }
+
+
+def replay_offline(records, model_names, saved_dir):
+    """Score every request with a saved bundle, one at a time, as the endpoint does"""
+    bundle = ml_models.load_bundle(saved_dir)
+    if records["explain"].any():
+        bundle["explainer"] = ForestExplainer(bundle["random_forest"])
+    result = _empty_result(saved_dir, len(records))
+
+    for i, record in enumerate(records):
+        features_array = record["features"][None, :]
+        model_name = model_names[record["model"]]
+        try:
+            start = time.perf_counter()
+            if record["explain"]:
+                prediction, probabilities, _, _ = ml_models.explain_prediction(features_array, bundle)
+            else:
+                prediction, probabilities = ml_models.make_prediction(features_array, model_name, bundle)
+            result["latency_ms"][i] = (time.perf_counter() - start) * 1e3
+        except Exception as e:
+            print(f"Error replaying request {i} with {model_name}: {e}")
+            continue
+        result["prediction"][i] = prediction[0]
+        result["probability"][i] = probabilities[0]
+        result["ok"][i] = True
+    return result
+
+
+def _request_body(features):
+    return {name: int(value) if name in INTEGER_FEATURES else float(value)
+            for name, value in zip(FEATURE_COLUMNS, features)}
+
+
+def replay_http(records, model_names, url, speed=1.0, concurrency=8):
+    """Send every request to a running API, keeping the captured pacing scaled by speed"""
+    result = _empty_result(url, len(records))
+    errors = []
+    lock = threading.Lock()
+    client = httpx.Client(base_url=url.rstrip("/"), timeout=30)
+
+    def send(i, record):
+        params = {"model_name": model_names[record["model"]]}
+        if record["explain"]:
+            params["explain"] = "true"
+        try:
+            start = time.perf_counter()
+            response = client.post("/predict/", params=params, json=_request_body(record["features"]))
+            latency_ms = (time.perf_counter() - start) * 1e3
+            response.raise_for_status()
+            body = response.json()
+        except Exception as e:
+            with lock:
+                errors.append(f"request {i}: {e}")
+            return
+        result["latency_ms"][i] = latency_ms
+        result["prediction"][i] = body["prediction"]
+        result["probability"][i] = [body["probability"][str(c)] for c in range(N_CLASSES)]
+        result["ok"][i] = True
+
+    offsets = records["time"] - records["time"][0]
+    start = time.perf_counter()
+    with client, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i, record in enumerate(records):
+            if speed > 0:
+                delay = offsets[i] / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            executor.submit(send, i, record)
+    result["seconds"] = time.perf_counter() - start
+    for error in errors[:10]:
+        print(f"Error: {error}")
+    return result
+
+
+def _percentiles(latency_ms):
+    if len(latency_ms) == 0:
+        return None
+    values = np.percentile(latency_ms, PERCENTILES)
+    return {**{f"p{p}": float(v) for p, v in zip(PERCENTILES, values)}, "max": float(latency_ms.max())}
+
+
+def compare(result, baseline, mask=None):
+    """Disagreements and latency differences of one replay against the baseline"""
+    mask = np.ones(len(result["ok"]), dtype=bool) if mask is None else mask
+    ok = mask & result["ok"] & baseline["ok"]
+    latency = _percentiles(result["latency_ms"][mask & result["ok"]])
+    baseline_latency = _percentiles(baseline["latency_ms"][mask & baseline["ok"]])
+    # Total variation distance between the two probability vectors
+    probability_diff = np.abs(result["probability"][ok] - baseline["probability"][ok]).sum(axis=1) / 2
+    return {
+        "requests": int(mask.sum()),
+        "errors": int((mask & ~result["ok"]).sum()),
+        "disagreements": int((result["prediction"][ok] != baseline["prediction"][ok]).sum()),
+        "disagreement_rate": float(np.mean(result["prediction"][ok] != baseline["prediction"][ok])) if ok.any() else None,
+        "mean_probability_diff": float(probability_diff.mean()) if ok.any() else None,
+        "max_probability_diff": float(probability_diff.max()) if ok.any() else None,
+        "latency_ms": latency,
+        "latency_diff_ms": ({name: latency[name] - baseline_latency[name] for name in latency}
+                            if latency and baseline_latency else None),
+    }
+
+
+def build_report(records, model_names, results):
+    """Compare every replay with the first one (the baseline)"""
+    baseline = results[0]
+    report = {"requests": int(len(records)), "baseline": baseline["target"],
+              "captured_seconds": float(records["time"][-1] - records["time"][0]) if len(records) else 0.0,
+              "targets": []}
+    for result in results[1:]:
+        by_model = {name: compare(result, baseline, records["model"] == index)
+                    for index, name in enumerate(model_names) if (records["model"] == index).any()}
+        report["targets"].append({"target": result["target"], **compare(result, baseline),
+                                  "seconds": result.get("seconds"), "by_model": by_model})
+    report["baseline_latency_ms"] = _percentiles(baseline["latency_ms"][baseline["ok"]])
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured prediction traffic")
+    parser.add_argument("paths", nargs="+", help="Capture files or directories of them")
+    parser.add_argument("--target", action="append", required=True,
+                        help="Saved model directory or API base URL; repeat to compare, the first is the baseline")
+    parser.add_argument("--speed", type=float, default=1.0, help="Pacing multiplier for API targets (0: no pacing)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent requests to API targets")
+    parser.add_argument("--limit", type=int, default=None, help="Replay only the first N requests")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    records, model_names = load_traffic(args.paths, args.limit)
+    results = [] if len(args.target) > 1 else [captured_result(records)]
+    for target in args.target:
+        print(f"Replaying {len(records)} requests against {target}")
+        if target.startswith(("http://", "https://")):
+            results.append(replay_http(records, model_names, target, args.speed, args.concurrency))
+        else:
+            results.append(replay_offline(records, model_names, target))
+
+    report = build_report(records, model_names, results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"Baseline: {report['baseline']}")
+    if report["baseline_latency_ms"]:
+        latency = report["baseline_latency_ms"]
+        print(f"  p50 {latency['p50']:.3f} ms, p99 {latency['p99']:.3f} ms")
+    for target in report["targets"]:
+        print(f"{target['target']}: {target['disagreements']} disagreements, {target['errors']} errors")
+        if target["latency_diff_ms"]:
+            latency, diff = target["latency_ms"], target["latency_diff_ms"]
+            print(f"  p50 {latency['p50']:.3f} ms ({diff['p50']:+.3f}), p99 {latency['p99']:.3f} ms ({diff['p99']:+.3f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Compare response serialization paths on clustering- and history-sized payloads.
+
+Run from the backend directory:
+
+    python -m benchmarks.serialization_benchmark
+
+The "validated json" path mirrors what FastAPI does for an endpoint with a
+``response_model``: validate the payload with Pydantic, then encode it with
+the stdlib ``json`` module. The other paths are the ones used by
+``app.serialization.fast_response``.
+"""
+import argparse
+import datetime
+import json
+import timeit
+from typing import Dict, List
+
+import numpy as np
+from pydantic import TypeAdapter
+
+from app.main import ClusteringResult
+from app.serialization import MsgPackResponse, ORJSONResponse
+
+
+def clustering_payload(n_clusters=3, points_per_cluster=100, n_features=11, seed=0):
+    """Build a payload shaped like the /clustering/ response"""
+    rng = np.random.default_rng(seed)
+    results = []
+    for cluster_id in range(n_clusters):
+        points = rng.normal(size=(points_per_cluster, n_features))
+        results.append({
+            "cluster_id": cluster_id,
+            "data_points": [{f"feature_{i}": float(v) for i, v in enumerate(p)} for p in points],
+            "centroid": {f"feature_{i}": float(v) for i, v in enumerate(points.mean(axis=0))},
+        })
+    return results
+
+
+def predictions_payload(n_rows=100, seed=0):
+    """Build a payload shaped like the /predictions/ response"""
+    rng = np.random.default_rng(seed)
+    now = datetime.datetime.utcnow()
+    return [{
+        "id": i,
+        "price": float(rng.exponential(1000) + 500),
+        "size": float(rng.normal(80, 30)),
+        "rooms": int(rng.integers(1, 6)),
+        "bathroom": int(rng.integers(1, 4)),
+        "parking": int(rng.integers(0, 2)),
+        "furnished": int(rng.integers(0, 2)),
+        "elevator": int(rng.integers(0, 2)),
+        "balcony": int(rng.integers(0, 2)),
+        "floor": int(rng.integers(0, 20)),
+        "age": float(rng.exponential(10)),
+        "location_score": int(rng.integers(1, 11)),
+        "prediction_result": int(rng.integers(0, 3)),
+        "model_used": "random_forest",
+        "timestamp": (now - datetime.timedelta(seconds=i)).isoformat(),
+    } for i in range(n_rows)]
+
+
+def run(name, payload, adapter, number):
+    """Time each serialization path for one payload"""
+    def validated_json():
+        validated = adapter.validate_python(payload)
+        return json.dumps(adapter.dump_python(validated, mode="json")).encode("utf-8")
+
+    paths = {
+        "validated json": validated_json,
+        "orjson": lambda: ORJSONResponse(payload).body,
+        "msgpack": lambda: MsgPackResponse(payload).body,
+    }
+
+    print(f"\n{name}")
+    baseline = None
+    for label, fn in paths.items():
+        size = len(fn())
+        seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+        baseline = baseline or seconds
+        print(f"  {label:<15} {seconds * 1e3:8.3f} ms  {size / 1024:8.1f} KiB  {baseline / seconds:6.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark response serialization")
+    parser.add_argument("--number", type=int, default=20, help="Calls per timing run")
+    args = parser.parse_args(argv)
+
+    run("clustering (3 x 100 points)", clustering_payload(),
+        TypeAdapter(List[ClusteringResult]), args.number)
+    run("clustering (3 x 5000 points)", clustering_payload(points_per_cluster=5000),
+        TypeAdapter(List[ClusteringResult]), max(1, args.number // 10))
+    run("predictions (100 rows)", predictions_payload(),
+        TypeAdapter(List[Dict]), args.number)
+    run("predictions (50000 rows)", predictions_payload(n_rows=50000),
+        TypeAdapter(List[Dict]), max(1, args.number // 10))
+
+
+if __name__ == "__main__":
+    main()
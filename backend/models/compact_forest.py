@@ -0,0 +1,106 @@
+"""Compact, array-based representation of a trained random forest.
+
+The nodes of every tree are flattened into a handful of small NumPy arrays
+(int16 features, float32 thresholds, int32 children, float32 leaf class
+probabilities) and the whole forest is evaluated with vectorized traversal,
+one tree level per step. Combined with bounded depth, larger leaves and fewer
+trees, the pickled model is a fraction of the size of a full
+``RandomForestClassifier``.
+"""
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+# Training parameters for the compact forest
+COMPACT_FOREST_PARAMS = {
+    "n_estimators": 30,
+    "max_depth": 12,
+    "min_samples_leaf": 5,
+}
+
+
+def _float32_thresholds(threshold):
+    """Cast thresholds to float32, rounding toward -inf.
+
+    scikit-learn compares float32 inputs against float64 thresholds. Rounding
+    down keeps ``x <= threshold`` unchanged for every float32 ``x``.
+    """
+    threshold32 = threshold.astype(np.float32)
+    too_high = threshold32.astype(np.float64) > threshold
+    threshold32[too_high] = np.nextafter(threshold32[too_high], np.float32(-np.inf))
+    return threshold32
+
+
+def train_compact_forest(X_train, y_train, params=None, random_state=42):
+    """Train a bounded random forest and convert it to a CompactForest"""
+    params = {**COMPACT_FOREST_PARAMS, **(params or {})}
+    forest = RandomForestClassifier(random_state=random_state, **params)
+    forest.fit(X_train, y_train)
+    return CompactForest(forest)
+
+
+class CompactForest:
+    """Random forest classifier evaluated from flat node arrays"""
+
+    def __init__(self, forest):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count, dtype=np.int32) + offset
+            is_leaf = tree.children_left == -1
+
+            # Leaves point to themselves, so extra traversal steps are no-ops
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset).astype(np.int32))
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int16))
+            thresholds.append(np.where(is_leaf, np.inf, _float32_thresholds(tree.threshold)).astype(np.float32))
+
+            value = tree.value[:, 0, :]
+            values.append((value / value.sum(axis=1, keepdims=True)).astype(np.float32))
+            roots.append(offset)
+            offset += tree.node_count
+
+        self.feature = np.concatenate(features)
+        self.threshold = np.concatenate(thresholds)
+        self.children_left = np.concatenate(lefts)
+        self.children_right = np.concatenate(rights)
+        self.value = np.concatenate(values)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.max_depth = max(estimator.tree_.max_depth for estimator in forest.estimators_)
+
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+        self.feature_importances_ = forest.feature_importances_
+        self.params = {name: value for name, value in forest.get_params().items()
+                       if name in ("n_estimators", "max_depth", "min_samples_leaf", "random_state")}
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    def get_params(self, deep=True):
+        return dict(self.params)
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_samples, n_trees)"""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            next_nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+            # Stop as soon as every sample has reached a leaf in every tree
+            if np.array_equal(next_nodes, nodes):
+                break
+            nodes = next_nodes
+        return nodes
+
+    def predict_proba(self, X):
+        """Average the leaf class probabilities of all trees"""
+        return self.value[self.apply(X)].mean(axis=1, dtype=np.float64)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def score(self, X, y):
+        return float(np.mean(self.predict(X) == np.asarray(y)))
@@ -0,0 +1,148 @@
+"""Chunked, parallel synthetic dataset generation.
+
+Rows are produced in fixed-size chunks. Chunk ``i`` always draws from its own
+``SeedSequence`` child stream, so the output is identical no matter how many
+worker processes take part in producing it.
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+FEATURE_COLUMNS = ['price', 'size', 'rooms', 'bathroom', 'parking', 'furnished',
+                   'elevator', 'balcony', 'floor', 'age', 'location_score']
+TARGET_COLUMN = 'category'
+
+DEFAULT_SEED = 42
+DEFAULT_CHUNK_SIZE = 100_000
+OUTPUT_FORMATS = ('csv', 'parquet')
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def generate_chunk(chunk_index, n_rows, seed=DEFAULT_SEED):
+    """Generate one chunk of apartment rows from the chunk's own random stream"""
+    rng = np.random.default_rng(np.random.SeedSequence(entropy=seed, spawn_key=(chunk_index,)))
+
+    data = {
+        # Price and size related features
+        'price': rng.exponential(scale=1000, size=n_rows) + 500,
+        'size': rng.normal(loc=80, scale=30, size=n_rows),
+        'rooms': rng.integers(1, 6, size=n_rows),
+        'bathroom': rng.integers(1, 4, size=n_rows),
+        'parking': rng.integers(0, 2, size=n_rows),
+        'furnished': rng.integers(0, 2, size=n_rows),
+        'elevator': rng.integers(0, 2, size=n_rows),
+        'balcony': rng.integers(0, 2, size=n_rows),
+        'floor': rng.integers(0, 20, size=n_rows),
+        'age': rng.exponential(scale=10, size=n_rows),
+        'location_score': rng.integers(1, 11, size=n_rows),
+    }
+    df = pd.DataFrame(data, columns=FEATURE_COLUMNS)
+
+    # Create a target variable (rental category)
+    # Category 0: Budget, 1: Standard, 2: Premium
+    conditions = [
+        (df['price'] < 800) & (df['size'] < 70),
+        (df['price'] >= 800) & (df['price'] < 1500),
+        (df['price'] >= 1500)
+    ]
+    choices = [0, 1, 2]
+    df[TARGET_COLUMN] = np.select(conditions, choices, default=1)
+
+    return df
+
+
+def _chunk_plan(n_samples, chunk_size):
+    """Split ``n_samples`` into (chunk_index, n_rows) pairs"""
+    return [(i, min(chunk_size, n_samples - start))
+            for i, start in enumerate(range(0, n_samples, chunk_size))]
+
+
+def _generate_chunk_args(args):
+    return generate_chunk(*args)
+
+
+def iter_chunks(n_samples, chunk_size=DEFAULT_CHUNK_SIZE, seed=DEFAULT_SEED, n_workers=None):
+    """Yield generated chunks in order.
+
+    With more than one worker, chunks are produced in a process pool. At most
+    ``2 * n_workers`` chunks are in flight, so memory stays bounded however
+    large ``n_samples`` is.
+    """
+    plan = [(index, n_rows, seed) for index, n_rows in _chunk_plan(n_samples, chunk_size)]
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = max(1, min(n_workers, len(plan)))
+
+    if n_workers == 1:
+        for args in plan:
+            yield generate_chunk(*args)
+        return
+
+    window = 2 * n_workers
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = [executor.submit(_generate_chunk_args, args) for args in plan[:window]]
+        next_index = len(pending)
+        while pending:
+            chunk = pending.pop(0).result()
+            if next_index < len(plan):
+                pending.append(executor.submit(_generate_chunk_args, plan[next_index]))
+                next_index += 1
+            yield chunk
+
+
+def write_dataset(path, n_samples, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE,
+                  seed=DEFAULT_SEED, n_workers=None):
+    """Stream a generated dataset to ``path`` as CSV or Parquet, chunk by chunk"""
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {fmt}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    chunks = iter_chunks(n_samples, chunk_size=chunk_size, seed=seed, n_workers=n_workers)
+
+    rows_written = 0
+    if fmt == 'csv':
+        with open(path, 'w', newline='') as f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, header=(i == 0))
+                rows_written += len(chunk)
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression='zstd')
+                writer.write_table(table)
+                rows_written += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    return rows_written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic apartment rental dataset")
+    parser.add_argument('--rows', type=int, default=10000, help="Number of rows to generate")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', dest='fmt')
+    parser.add_argument('--output', default=None, help="Output file (defaults to data/apartment_data.<format>)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (defaults to all cores)")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.join(DATA_DIR, f'apartment_data.{args.fmt}')
+    rows = write_dataset(output, args.rows, fmt=args.fmt, chunk_size=args.chunk_size,
+                         seed=args.seed, n_workers=args.workers)
+    print(f"Wrote {rows} rows to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Rule-based fast model distilled from the Random Forest.
+
+A shallow decision tree is trained on the raw (unscaled) training features to
+reproduce the forest's predictions, then compiled into a single nested
+``np.where`` expression. Scoring a batch is a handful of vectorized
+comparisons, with no scaler and no tree traversal. Leaves where the rules do
+not agree closely enough with the forest on the training data are marked
+uncertain, and ``make_prediction`` falls back to the forest for those rows.
+"""
+import time
+
+import numpy as np
+from sklearn.tree import DecisionTreeClassifier
+
+from models.compact_forest import _float32_thresholds
+
+DISTILL_MAX_DEPTH = 6
+DISTILL_MIN_SAMPLES_LEAF = 20
+# Leaves whose training agreement with the forest is below this fall back to it
+DISTILL_MIN_FIDELITY = 0.99
+
+
+def compile_tree(tree):
+    """Generate Python source for a function mapping a raw feature matrix to leaf ids"""
+    left, right = tree.children_left, tree.children_right
+    # Inputs are compared as float32, like scikit-learn does
+    thresholds = _float32_thresholds(tree.threshold)
+
+    def expression(node):
+        if left[node] == -1:
+            return str(node)
+        return (f"np.where(X[:, {tree.feature[node]}] <= np.float32({float(thresholds[node])!r}), "
+                f"{expression(left[node])}, {expression(right[node])})")
+
+    body = expression(0)
+    if left[0] == -1:
+        body = f"np.full(len(X), {body})"
+    return f"def leaf_ids(X):\n    return {body}\n"
+
+
+class DistilledRules:
+    """Compiled decision rules that mimic a trained classifier"""
+
+    def __init__(self, tree_model, leaf_proba, leaf_confident, classes):
+        self.source = compile_tree(tree_model.tree_)
+        self.leaf_proba = leaf_proba
+        self.leaf_class = classes[np.argmax(leaf_proba, axis=1)]
+        self.leaf_confident = leaf_confident
+        self.classes_ = classes
+        self.n_leaves = int(tree_model.get_n_leaves())
+        self.depth = int(tree_model.get_depth())
+        self.report = {}
+        self._compile()
+
+    def _compile(self):
+        namespace = {"np": np}
+        exec(compile(self.source, "<distilled-rules>", "exec"), namespace)
+        self._leaf_ids = namespace["leaf_ids"]
+
+    def __getstate__(self):
+        # The compiled function is rebuilt from its source on load
+        state = self.__dict__.copy()
+        del state["_leaf_ids"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._compile()
+
+    def predict_with_confidence(self, X):
+        """Return classes, probabilities and a mask of rows the rules are sure about"""
+        leaves = self._leaf_ids(np.asarray(X, dtype=np.float32))
+        return self.leaf_class[leaves], self.leaf_proba[leaves], self.leaf_confident[leaves]
+
+    def predict(self, X):
+        return self.predict_with_confidence(X)[0]
+
+    def predict_proba(self, X):
+        return self.predict_with_confidence(X)[1]
+
+
+def distill_forest(forest, scaler, X_train_raw, X_test_raw=None, y_test=None,
+                   max_depth=DISTILL_MAX_DEPTH, min_samples_leaf=DISTILL_MIN_SAMPLES_LEAF,
+                   min_fidelity=DISTILL_MIN_FIDELITY):
+    """Distil a forest (trained on scaled inputs) into rules over raw inputs.
+
+    When a test split is given, fidelity against the forest, coverage and
+    latency are measured on it and stored in ``rules.report``.
+    """
+    X_train_raw = np.asarray(X_train_raw, dtype=np.float64)
+    teacher_proba = forest.predict_proba(scaler.transform(X_train_raw))
+    teacher_labels = forest.classes_[np.argmax(teacher_proba, axis=1)]
+
+    tree_model = DecisionTreeClassifier(max_depth=max_depth, min_samples_leaf=min_samples_leaf,
+                                        random_state=42)
+    tree_model.fit(X_train_raw, teacher_labels)
+
+    # Leaf outputs are the forest's mean probabilities over the leaf's samples
+    n_nodes = tree_model.tree_.node_count
+    leaves = tree_model.apply(X_train_raw)
+    counts = np.bincount(leaves, minlength=n_nodes)
+    leaf_proba = np.zeros((n_nodes, len(forest.classes_)))
+    np.add.at(leaf_proba, leaves, teacher_proba)
+    leaf_proba /= np.maximum(counts, 1)[:, None]
+
+    leaf_class = forest.classes_[np.argmax(leaf_proba, axis=1)]
+    agreement = np.bincount(leaves, weights=(leaf_class[leaves] == teacher_labels), minlength=n_nodes)
+    leaf_fidelity = agreement / np.maximum(counts, 1)
+    leaf_confident = (counts > 0) & (leaf_fidelity >= min_fidelity)
+
+    rules = DistilledRules(tree_model, leaf_proba, leaf_confident, forest.classes_)
+    if X_test_raw is not None:
+        rules.report = fidelity_report(rules, forest, scaler, X_test_raw, y_test)
+    return rules
+
+
+def fidelity_report(rules, forest, scaler, X_raw, y_true=None):
+    """Measure how closely the rules (with forest fallback) reproduce the forest"""
+    X_raw = np.asarray(X_raw, dtype=np.float64)
+    forest_labels = forest.predict(scaler.transform(X_raw))
+    rule_labels, _, confident = rules.predict_with_confidence(X_raw)
+    combined = np.where(confident, rule_labels, forest_labels)
+
+    def best_ms(fn, repeats=20):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1e3
+
+    report = {
+        "n_leaves": rules.n_leaves,
+        "depth": rules.depth,
+        "rows": int(len(X_raw)),
+        "fidelity_rules_only": float(np.mean(rule_labels == forest_labels)),
+        "coverage": float(np.mean(confident)),
+        "fidelity_confident_rows": float(np.mean(rule_labels[confident] == forest_labels[confident])) if confident.any() else None,
+        "fidelity_with_fallback": float(np.mean(combined == forest_labels)),
+        "single_row_ms": best_ms(lambda: rules.predict_with_confidence(X_raw[:1])),
+        "batch_ms": best_ms(lambda: rules.predict_with_confidence(X_raw)),
+        "forest_single_row_ms": best_ms(lambda: forest.predict_proba(scaler.transform(X_raw[:1]))),
+        "forest_batch_ms": best_ms(lambda: forest.predict_proba(scaler.transform(X_raw))),
+    }
+    if y_true is not None:
+        report["accuracy_with_fallback"] = float(np.mean(combined == np.asarray(y_true)))
+    return report
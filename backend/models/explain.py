@@ -0,0 +1,90 @@
+"""Per-prediction feature attributions for tree ensembles.
+
+Every root-to-leaf path splits the change in class probabilities between the
+features used along it: each split adds ``value[child] - value[parent]`` to
+its feature. The sum of a leaf's contributions plus the root value equals the
+leaf's prediction, so averaging over trees explains the forest's
+``predict_proba`` exactly. The contributions of every leaf are precomputed
+once per model, and explaining a batch is a single ``apply`` plus a gather.
+"""
+import numpy as np
+
+from models.compact_forest import CompactForest
+
+# Samples gathered at once when explaining a batch
+EXPLAIN_BLOCK_SIZE = 1024
+
+
+def _flatten_forest(forest):
+    """Concatenate the nodes of all trees: children (-1 at leaves), features, values, roots"""
+    if isinstance(forest, CompactForest):
+        node_ids = np.arange(forest.node_count)
+        is_leaf = forest.children_left == node_ids
+        left = np.where(is_leaf, -1, forest.children_left)
+        right = np.where(is_leaf, -1, forest.children_right)
+        return left, right, forest.feature.astype(np.int64), forest.value.astype(np.float64), forest.roots
+
+    lefts, rights, features, values, roots = [], [], [], [], []
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+        rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+        features.append(tree.feature)
+        value = tree.value[:, 0, :]
+        values.append(value / value.sum(axis=1, keepdims=True))
+        roots.append(offset)
+        offset += tree.node_count
+    return (np.concatenate(lefts), np.concatenate(rights), np.concatenate(features),
+            np.concatenate(values), np.asarray(roots))
+
+
+class ForestExplainer:
+    """Path-based attributions for a random forest (sklearn or CompactForest)"""
+
+    def __init__(self, forest):
+        left, right, feature, value, roots = _flatten_forest(forest)
+        n_nodes, n_classes = value.shape
+        n_features = forest.n_features_in_
+
+        # Walk the trees one level at a time, carrying each node's contributions down
+        contributions = np.zeros((n_nodes, n_features, n_classes))
+        frontier = roots
+        while len(frontier):
+            frontier = frontier[left[frontier] != -1]
+            for children in (left[frontier], right[frontier]):
+                contributions[children] = contributions[frontier]
+                contributions[children, feature[frontier]] += value[children] - value[frontier]
+            frontier = np.concatenate([left[frontier], right[frontier]])
+
+        # Only leaves are ever looked up; keep them as float32 rows
+        is_leaf = left == -1
+        self.leaf_row = np.full(n_nodes, -1, dtype=np.int64)
+        self.leaf_row[is_leaf] = np.arange(is_leaf.sum())
+        self.leaf_contributions = contributions[is_leaf].astype(np.float32)
+        self.bias = value[roots].mean(axis=0)
+        self.roots = roots
+        self.forest = forest
+        self.classes_ = forest.classes_
+
+    @property
+    def nbytes(self):
+        """Memory held by the precomputed attribution arrays"""
+        return self.leaf_row.nbytes + self.leaf_contributions.nbytes + self.bias.nbytes + self.roots.nbytes
+
+    def leaves(self, X):
+        """Global node index of the leaf reached in every tree, shape (n_samples, n_trees)"""
+        if isinstance(self.forest, CompactForest):
+            return self.forest.apply(X)
+        return self.forest.apply(X) + self.roots
+
+    def explain(self, X):
+        """Return the bias (n_classes,) and contributions (n_samples, n_features, n_classes)"""
+        rows = self.leaf_row[self.leaves(X)]
+        contributions = np.empty((len(rows),) + self.leaf_contributions.shape[1:])
+        # Gather in blocks so the (samples, trees, features, classes) buffer stays small
+        for start in range(0, len(rows), EXPLAIN_BLOCK_SIZE):
+            block = rows[start:start + EXPLAIN_BLOCK_SIZE]
+            contributions[start:start + len(block)] = self.leaf_contributions[block].mean(axis=1, dtype=np.float64)
+        return self.bias, contributions
@@ -6,21 +6,42 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.naive_bayes import GaussianNB
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 from sklearn.cluster import KMeans
+from sklearn.decomposition import PCA
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from sklearn.metrics import silhouette_score, adjusted_rand_score
+from joblib import Parallel, delayed
 import pickle
 import json
+import hashlib
+import datetime
 import os
 import io
+import threading
+import time
 import base64
 from sqlalchemy.orm import Session
-from app.database import Prediction, create_tables
+from app.database import Prediction
+from app.analytics import update_rollups
+from app.drift import build_reference, drift_monitor
+from app.database import PREDICTION_COLUMNS
+from app.retention import latest_archived_rows
+from models.dataset import FEATURE_COLUMNS, TARGET_COLUMN, write_dataset
+from models.compact_forest import train_compact_forest
+from models.distill import distill_forest
+from models.explain import ForestExplainer
+from models.compiled_nb import CompiledNaiveBayes
+from models.packaging import CorruptBundleError, VerifiedLoader, file_checksums
 
 # Define global variables for trained models
 knn_model = None
 nb_model = None
+nb_compiled = None
 rf_model = None
+rf_explainer = None
+hgb_model = None
+fast_model = None
 kmeans_model = None
 X_train = None
 X_test = None
@@ -28,55 +49,42 @@ y_train = None
 y_test = None
 scaler = None
 features = None
+model_version = None
+model_created_at = None
+model_dtype = None
+model_costs = None
 
-def generate_dataset():
-    """Generate a synthetic apartment rental dataset with at least 10,000 rows and 20+ features"""
-    np.random.seed(42)
-    n_samples = 10000
-    
-    data = {
-        # Price and size related features
-        'price': np.random.exponential(scale=1000, size=n_samples) + 500,
-        'size': np.random.normal(loc=80, scale=30, size=n_samples),
-        'rooms': np.random.randint(1, 6, size=n_samples),
-        'bathroom': np.random.randint(1, 4, size=n_samples),
-        'parking': np.random.randint(0, 2, size=n_samples),
-        'furnished': np.random.randint(0, 2, size=n_samples),
-        'elevator': np.random.randint(0, 2, size=n_samples),
-        'balcony': np.random.randint(0, 2, size=n_samples),
-        'floor': np.random.randint(0, 20, size=n_samples),
-        'age': np.random.exponential(scale=10, size=n_samples),
-        'location_score': np.random.randint(1, 11, size=n_samples),
-    }
-    
-    # Create DataFrame
-    df = pd.DataFrame(data)
-    
-    # Create a target variable (rental category)
-    # Category 0: Budget, 1: Standard, 2: Premium
-    conditions = [
-        (df['price'] < 800) & (df['size'] < 70),
-        (df['price'] >= 800) & (df['price'] < 1500),
-        (df['price'] >= 1500)
-    ]
-    choices = [0, 1, 2]
-    df['category'] = np.select(conditions, choices, default=1)
-    
+# Artifacts that make up one model version
+MODEL_FILES = ['knn_model.pkl', 'nb_model.pkl', 'rf_model.pkl', 'hgb_model.pkl', 'fast_model.pkl',
+               'kmeans_model.pkl', 'scaler.pkl']
+
+# Classifier families and their display names
+MODEL_LABELS = {
+    "knn": "K-Nearest Neighbors",
+    "naive_bayes": "Naive Bayes",
+    "random_forest": "Random Forest",
+    "hist_gradient_boosting": "Histogram Gradient Boosting",
+}
+
+def generate_dataset(n_samples=10000, n_workers=None):
+    """Generate a synthetic apartment rental dataset on disk; returns its path and row count"""
     # Save to CSV - fixed path using os.path.join
     data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
     os.makedirs(data_dir, exist_ok=True)
     csv_path = os.path.join(data_dir, 'apartment_data.csv')
     
     print(f"Saving dataset to {csv_path}")
-    print(f"Dataset shape: {df.shape}")
-    print(f"Dataset columns: {df.columns.tolist()}")
     
-    df.to_csv(csv_path, index=False)
+    # Chunks are generated (in parallel for large datasets) and streamed to disk,
+    # so the full dataset is never held in memory here
+    n_rows = write_dataset(csv_path, n_samples, fmt='csv', n_workers=n_workers)
     
-    return df
+    print(f"Dataset rows: {n_rows}")
+    
+    return csv_path, n_rows
 
-def preprocess_data(df):
-    """Preprocess the data for machine learning models"""
+def split_data(df):
+    """Select features and target and split them into train and test sets"""
     # Select features and target
     X = df[['price', 'size', 'rooms', 'bathroom', 'parking', 'furnished', 
             'elevator', 'balcony', 'floor', 'age', 'location_score']]
@@ -85,28 +93,83 @@ def preprocess_data(df):
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
     
-    # Scale features
+    return X_train, X_test, y_train, y_test, X.columns
+
+# Set FLOAT32_MODE=1 to train and serve the models on float32 feature matrices
+FLOAT32_MODE = os.getenv("FLOAT32_MODE", "0") == "1"
+MODEL_DTYPE = np.dtype(np.float32 if FLOAT32_MODE else np.float64)
+
+def preprocess_data(df, dtype=MODEL_DTYPE):
+    """Preprocess the data for machine learning models"""
+    X_train, X_test, y_train, y_test, columns = split_data(df)
+    
+    # Scale features, in float64 for accuracy, then keep them in the model precision
     scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+    X_train_scaled = scaler.fit_transform(X_train).astype(dtype, copy=False)
+    X_test_scaled = scaler.transform(X_test).astype(dtype, copy=False)
     
-    return X_train_scaled, X_test_scaled, y_train, y_test, scaler, X.columns
+    return X_train_scaled, X_test_scaled, y_train, y_test, scaler, columns
 
-def train_models(X_train, y_train):
-    """Train KNN, Naive Bayes, and Random Forest models"""
-    # KNN model
-    knn = KNeighborsClassifier(n_neighbors=5)
-    knn.fit(X_train, y_train)
+# Set COMPACT_FOREST=1 to serve a small, bounded forest instead of the full one
+COMPACT_FOREST = os.getenv("COMPACT_FOREST", "0") == "1"
+
+# Default hyperparameters, overridden by the promoted winners of a search run
+DEFAULT_PARAMS = {
+    "knn": {"n_neighbors": 5},
+    "naive_bayes": {},
+    "random_forest": {"n_estimators": 100},
+    "hist_gradient_boosting": {},
+}
+
+def build_model(model_name, params=None):
+    """Build an untrained classifier for the given model name and hyperparameters"""
+    params = dict(DEFAULT_PARAMS[model_name] if params is None else params)
+    if model_name == "knn":
+        return KNeighborsClassifier(**params)
+    elif model_name == "naive_bayes":
+        return GaussianNB(**params)
+    elif model_name == "random_forest":
+        params.setdefault("random_state", 42)
+        return RandomForestClassifier(**params)
+    elif model_name == "hist_gradient_boosting":
+        params.setdefault("random_state", 42)
+        return HistGradientBoostingClassifier(**params)
+    raise ValueError(f"Unknown model: {model_name}")
+
+def train_models(X_train, y_train, params=None, on_trained=None, timings=None):
+    """Train KNN, Naive Bayes, Histogram Gradient Boosting and Random Forest models, cheapest first.
+    
+    ``on_trained(model_name, model)`` is called as soon as each one is fitted,
+    and the training wall time of each one is recorded in ``timings``.
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    on_trained = on_trained or (lambda model_name, model: None)
+    timings = {} if timings is None else timings
+    
+    def fit(model_name, train):
+        start = time.perf_counter()
+        model = train()
+        timings[model_name] = time.perf_counter() - start
+        on_trained(model_name, model)
+        return model
     
     # Naive Bayes model
-    nb = GaussianNB()
-    nb.fit(X_train, y_train)
+    nb = fit("naive_bayes", lambda: build_model("naive_bayes", params["naive_bayes"]).fit(X_train, y_train))
+    
+    # KNN model
+    knn = fit("knn", lambda: build_model("knn", params["knn"]).fit(X_train, y_train))
+    
+    # Histogram Gradient Boosting model
+    hgb = fit("hist_gradient_boosting",
+              lambda: build_model("hist_gradient_boosting", params["hist_gradient_boosting"]).fit(X_train, y_train))
     
     # Random Forest model
-    rf = RandomForestClassifier(n_estimators=100, random_state=42)
-    rf.fit(X_train, y_train)
+    if COMPACT_FOREST:
+        rf = fit("random_forest", lambda: train_compact_forest(X_train, y_train))
+    else:
+        rf = fit("random_forest", lambda: build_model("random_forest", params["random_forest"]).fit(X_train, y_train))
     
-    return knn, nb, rf
+    return knn, nb, rf, hgb
 
 def train_kmeans(X_train, n_clusters=3):
     """Train KMeans clustering model"""
@@ -131,11 +194,8 @@ def evaluate_model(model, X_test, y_test):
         'f1_score': f1
     }
 
-def initialize_models():
-    """Initialize and train all models"""
-    global knn_model, nb_model, rf_model, kmeans_model
-    global X_train, X_test, y_train, y_test, scaler, features
-    
+def load_dataset():
+    """Load the apartment dataset, generating it on first run"""
     # Get the correct path for the data directory
     data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
     os.makedirs(data_dir, exist_ok=True)
@@ -143,29 +203,169 @@ def initialize_models():
     # Check if dataset exists, if not generate it
     data_path = os.path.join(data_dir, 'apartment_data.csv')
     if not os.path.exists(data_path):
-        df = generate_dataset()
-    else:
-        df = pd.read_csv(data_path)
+        generate_dataset()
+    # Only the columns the models are trained on
+    return pd.read_csv(data_path, usecols=FEATURE_COLUMNS + [TARGET_COLUMN])
+
+def initialize_models():
+    """Initialize and train all models, publishing each one as soon as it is trained"""
+    global fast_model, kmeans_model, model_costs, model_version, model_created_at
+    global X_train, X_test, y_train, y_test, scaler, features, model_dtype
+    
+    _set_status(MODEL_STATUS.keys(), "training")
+    # Models are replaced one by one, so there is no single version until they are saved
+    model_version = model_created_at = None
+    df = load_dataset()
     
     # Preprocess data
     X_train, X_test, y_train, y_test, scaler, features = preprocess_data(df)
+    model_dtype = MODEL_DTYPE
     
-    # Train classification models
-    knn_model, nb_model, rf_model = train_models(X_train, y_train)
+    # Train classification models with the promoted search winners, if any
+    training_seconds = {}
+    train_models(X_train, y_train, load_best_params(), on_trained=_publish_model, timings=training_seconds)
+    
+    # Distil the forest into fast rules over raw inputs
+    X_train_raw = scaler.inverse_transform(X_train)
+    X_test_raw = scaler.inverse_transform(X_test)
+    start = time.perf_counter()
+    fast_model = distill_forest(rf_model, scaler, X_train_raw, X_test_raw, y_test)
+    training_seconds["fast"] = time.perf_counter() - start
+    _set_status(["fast"], "ready")
+    model_costs = measure_costs(active_bundle(), X_test_raw, training_seconds)
+    
+    # Input distributions that live traffic is compared against
+    drift_monitor.set_reference(build_reference(X_train_raw, features))
     
     # Train clustering model
     kmeans_model = train_kmeans(X_train)
-    
-    # Create tables
-    create_tables()
+    _set_status(["kmeans"], "ready")
     
     # Save the models
     save_models()
+    save_distillation_report(fast_model.report)
+    
+    # Explanations, evaluations and plot data are computed once per model version, not per request
+    save_permutation_importance(compute_permutation_importance())
+    save_evaluation(compute_evaluation())
+    save_projection(compute_projection())
+
+# Preparation status of every model served by the API:
+# pending, loading, training, ready or failed
+MODEL_STATUS = {name: "pending" for name in ("naive_bayes", "knn", "hist_gradient_boosting", "random_forest", "fast", "kmeans")}
+
+# Set RETRAIN_ON_STARTUP=1 to train on startup even when saved models exist
+RETRAIN_ON_STARTUP = os.getenv("RETRAIN_ON_STARTUP", "0") == "1"
+
+_preparation_thread = None
+
+class ModelNotReadyError(Exception):
+    """Raised when a model is used before it has been loaded or trained"""
+    
+    def __init__(self, model_name, status):
+        super().__init__(f"Model '{model_name}' is not ready yet ({status})")
+        self.model_name = model_name
+        self.status = status
+
+class AnalysisNotAvailableError(Exception):
+    """Raised when a saved bundle has no clustering, projection or importance data"""
+
+def _set_status(model_names, status):
+    for name in model_names:
+        # Models that are already serving keep serving while they are replaced
+        if not (MODEL_STATUS[name] == "ready" and status in ("loading", "training")):
+            MODEL_STATUS[name] = status
+
+def _publish_model(model_name, model):
+    """Make a freshly trained classifier available for predictions"""
+    global knn_model, nb_model, nb_compiled, rf_model, rf_explainer, hgb_model
+    
+    if model_name == "knn":
+        knn_model = model
+    elif model_name == "naive_bayes":
+        nb_compiled = CompiledNaiveBayes(model, scaler)
+        nb_model = model
+    elif model_name == "hist_gradient_boosting":
+        hgb_model = model
+    else:
+        rf_explainer = ForestExplainer(model)
+        rf_model = model
+    MODEL_STATUS[model_name] = "ready"
+
+def prepare_models(retrain=RETRAIN_ON_STARTUP):
+    """Load the saved models, or train them if there are none.
+    
+    Saved models that fail verification are neither served nor replaced by
+    retraining unless retrain is set, so a corrupt or tampered install is left
+    on disk for inspection and the models report "failed".
+    """
+    try:
+        if retrain or not load_models():
+            initialize_models()
+        else:
+            # Warm the evaluation splits used by the metrics endpoints
+            ensure_data_splits()
+    except Exception:
+        _set_status([name for name, status in MODEL_STATUS.items() if status != "ready"], "failed")
+        raise
+
+def start_model_preparation():
+    """Prepare the models in a background thread so the API can start serving at once"""
+    global _preparation_thread
+    
+    def run():
+        try:
+            prepare_models()
+        except Exception as e:
+            print(f"Error initializing models: {e}")
+    
+    _preparation_thread = threading.Thread(target=run, name="model-preparation", daemon=True)
+    _preparation_thread.start()
+
+def ensure_models(*model_names):
+    """Raise ModelNotReadyError unless all the given models are ready.
+    
+    Outside the API (scripts, benchmarks) nothing prepares the models in the
+    background, so they are loaded or trained here on first use.
+    """
+    if _preparation_thread is None and any(MODEL_STATUS[name] != "ready" for name in model_names):
+        prepare_models()
+    for name in model_names:
+        if MODEL_STATUS[name] != "ready":
+            raise ModelNotReadyError(name, MODEL_STATUS[name])
+
+def ensure_prediction_model(model_name):
+    """Raise ModelNotReadyError unless the model make_prediction uses for model_name is ready"""
+    ensure_models(model_name if model_name in ("knn", "naive_bayes", "hist_gradient_boosting", "fast") else "random_forest")
+
+def get_saved_dir():
+    """Get the models/saved directory"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saved')
+
+def load_best_params():
+    """Load the promoted hyperparameters from the search leaderboard, if present"""
+    leaderboard_path = os.path.join(get_saved_dir(), 'leaderboard.json')
+    if not os.path.exists(leaderboard_path):
+        return {}
+    
+    with open(leaderboard_path) as f:
+        leaderboard = json.load(f)
+    return leaderboard.get("promoted", {})
+
+def ensure_data_splits():
+    """Rebuild the train/test splits for models that were loaded from disk"""
+    global X_train, X_test, y_train, y_test, features
+    
+    if X_test is not None:
+        return
+    X_train_raw, X_test_raw, y_train, y_test, features = split_data(load_dataset())
+    X_train = scaler.transform(X_train_raw).astype(model_dtype, copy=False)
+    X_test = scaler.transform(X_test_raw).astype(model_dtype, copy=False)
 
 def save_models():
     """Save trained models to disk"""
     # Get the correct path for the models/saved directory
-    saved_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saved')
+    saved_dir = get_saved_dir()
     os.makedirs(saved_dir, exist_ok=True)
     
     with open(os.path.join(saved_dir, 'knn_model.pkl'), 'wb') as f:
@@ -177,94 +377,530 @@ def save_models():
     with open(os.path.join(saved_dir, 'rf_model.pkl'), 'wb') as f:
         pickle.dump(rf_model, f)
     
+    with open(os.path.join(saved_dir, 'hgb_model.pkl'), 'wb') as f:
+        pickle.dump(hgb_model, f)
+    
+    with open(os.path.join(saved_dir, 'fast_model.pkl'), 'wb') as f:
+        pickle.dump(fast_model, f)
+    
     with open(os.path.join(saved_dir, 'kmeans_model.pkl'), 'wb') as f:
         pickle.dump(kmeans_model, f)
     
     with open(os.path.join(saved_dir, 'scaler.pkl'), 'wb') as f:
         pickle.dump(scaler, f)
+    
+    if drift_monitor.reference is not None:
+        with open(os.path.join(saved_dir, 'drift_reference.json'), 'w') as f:
+            json.dump(drift_monitor.reference, f)
+    
+    write_manifest(saved_dir)
+
+def compute_model_version(saved_dir, files=MODEL_FILES):
+    """Derive the model version from the content of the saved artifacts"""
+    digest = hashlib.sha1()
+    for name in files:
+        with open(os.path.join(saved_dir, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+def write_manifest(saved_dir):
+    """Record the version and costs of the models just saved"""
+    global model_version, model_created_at
+    
+    model_version = compute_model_version(saved_dir)
+    model_created_at = datetime.datetime.utcnow().isoformat()
+    manifest = {
+        "version": model_version,
+        "created_at": model_created_at,
+        "dtype": model_dtype.name,
+        "files": MODEL_FILES,
+        "checksums": file_checksums(saved_dir, MODEL_FILES),
+        "costs": add_artifact_sizes(model_costs, saved_dir),
+    }
+    with open(os.path.join(saved_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def read_manifest(saved_dir=None):
+    """Read the manifest of the saved models, or None if there is none"""
+    manifest_path = os.path.join(saved_dir or get_saved_dir(), 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
 
 def load_models():
-    """Load trained models from disk"""
-    global knn_model, nb_model, rf_model, kmeans_model, scaler
+    """Load trained models from disk; returns False if there are none to load.
+    
+    Each model is served as soon as its artifact has been verified and loaded.
+    Raises CorruptBundleError if the manifest lists a missing artifact, lacks
+    a checksum for one, or an artifact does not match its checksum; models
+    published before the failure keep serving, the rest stay unloaded.
+    """
+    global knn_model, nb_model, nb_compiled, rf_model, rf_explainer, hgb_model, fast_model, kmeans_model
+    global scaler, model_version, model_created_at, model_dtype, model_costs
     
     # Get the correct path for the models/saved directory
-    saved_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saved')
+    saved_dir = get_saved_dir()
+    manifest = read_manifest(saved_dir)
+    
+    # Only load complete sets of artifacts, never a mix of versions
+    missing = [name for name in MODEL_FILES if not os.path.exists(os.path.join(saved_dir, name))]
+    if missing:
+        if manifest is not None:
+            raise CorruptBundleError(f"Saved models incomplete, missing: {', '.join(missing)}")
+        print(f"Saved models incomplete, missing: {', '.join(missing)}")
+        return False
+    if manifest is None or "checksums" not in manifest:
+        print("Saved models have no checksums; loading them unverified")
+    else:
+        unlisted = [name for name in MODEL_FILES if name not in manifest["checksums"]]
+        if unlisted:
+            raise CorruptBundleError(f"Manifest has no checksum for: {', '.join(unlisted)}")
     
     try:
-        with open(os.path.join(saved_dir, 'knn_model.pkl'), 'rb') as f:
-            knn_model = pickle.load(f)
+        _set_status(MODEL_STATUS.keys(), "loading")
+        
+        # Every artifact is checked against the manifest before it is unpickled,
+        # while the remaining ones are hashed in the background
+        loader = VerifiedLoader(saved_dir, (manifest or {}).get("checksums"))
+        
+        # The version is set before any model is served, so responses are never unversioned
+        model_version = manifest["version"] if manifest else compute_model_version(saved_dir)
+        model_created_at = (manifest or {}).get("created_at")
+        model_costs = (manifest or {}).get("costs")
+        # Inputs are scaled to the precision the models were trained in
+        model_dtype = np.dtype((manifest or {}).get("dtype", "float64"))
+        if model_dtype != MODEL_DTYPE:
+            print(f"Saved models are {model_dtype.name}; set RETRAIN_ON_STARTUP=1 to retrain them in {MODEL_DTYPE.name}")
         
-        with open(os.path.join(saved_dir, 'nb_model.pkl'), 'rb') as f:
-            nb_model = pickle.load(f)
+        # Cheapest models first, each one is served as soon as it is loaded
+        loaded_scaler = loader.load('scaler.pkl')
+        loaded_nb = loader.load('nb_model.pkl')
+        scaler = loaded_scaler
+        nb_compiled = CompiledNaiveBayes(loaded_nb, scaler)
+        nb_model = loaded_nb
+        _set_status(["naive_bayes"], "ready")
         
-        with open(os.path.join(saved_dir, 'rf_model.pkl'), 'rb') as f:
-            rf_model = pickle.load(f)
+        knn_model = loader.load('knn_model.pkl')
+        _set_status(["knn"], "ready")
         
-        with open(os.path.join(saved_dir, 'kmeans_model.pkl'), 'rb') as f:
-            kmeans_model = pickle.load(f)
+        loaded_rf = loader.load('rf_model.pkl')
+        rf_explainer = ForestExplainer(loaded_rf)
+        rf_model = loaded_rf
+        _set_status(["random_forest"], "ready")
+        
+        hgb_model = loader.load('hgb_model.pkl')
+        _set_status(["hist_gradient_boosting"], "ready")
+        
+        fast_model = loader.load('fast_model.pkl')
+        _set_status(["fast"], "ready")
+        
+        kmeans_model = loader.load('kmeans_model.pkl')
+        _set_status(["kmeans"], "ready")
+        
+        drift_reference_path = os.path.join(saved_dir, 'drift_reference.json')
+        if os.path.exists(drift_reference_path):
+            with open(drift_reference_path) as f:
+                drift_monitor.set_reference(json.load(f))
         
-        with open(os.path.join(saved_dir, 'scaler.pkl'), 'rb') as f:
-            scaler = pickle.load(f)
-            
         return True
+    except CorruptBundleError:
+        raise
     except Exception as e:
         print(f"Error loading models: {e}")
+        _set_status([name for name, status in MODEL_STATUS.items() if status == "loading"], "pending")
         return False
 
-def make_prediction(features_array, model_name="random_forest"):
-    """Make a prediction using the specified model"""
-    # Load models if not initialized
-    if knn_model is None or nb_model is None or rf_model is None:
-        load_models_success = load_models()
-        if not load_models_success:
-            initialize_models()
+# Bundle keys of the models used for prediction, and their saved files
+BUNDLE_FILES = {
+    "knn": 'knn_model.pkl',
+    "naive_bayes": 'nb_model.pkl',
+    "random_forest": 'rf_model.pkl',
+    "hist_gradient_boosting": 'hgb_model.pkl',
+    "fast": 'fast_model.pkl',
+    "scaler": 'scaler.pkl',
+}
+
+# Analysis data saved with a market bundle, for its clustering, plot and importance endpoints
+ANALYSIS_FILES = {
+    "clustering": 'clustering.json',
+    "projection": 'projection.npz',
+    "importance": 'permutation_importance.json',
+}
+
+def active_bundle():
+    """Get the currently loaded prediction models as a bundle"""
+    return {"knn": knn_model, "naive_bayes": nb_model, "naive_bayes_compiled": nb_compiled, "random_forest": rf_model,
+            "hist_gradient_boosting": hgb_model, "fast": fast_model, "scaler": scaler, "version": model_version,
+            "created_at": model_created_at, "dtype": model_dtype}
+
+def load_bundle(saved_dir, analysis=False):
+    """Load the prediction models of another saved model directory, e.g. a retrained candidate.
+    
+    With analysis, the clustering, projection and importance data computed when
+    the bundle was trained are loaded too, where it was saved with them.
+    """
+    manifest = read_manifest(saved_dir)
+    loader = VerifiedLoader(saved_dir, (manifest or {}).get("checksums"))
+    bundle = {}
+    for name, filename in BUNDLE_FILES.items():
+        # Artifacts the manifest lists must be present; older bundles may lack some families
+        if filename in loader.checksums or os.path.exists(os.path.join(saved_dir, filename)):
+            bundle[name] = loader.load(filename)
+    if "naive_bayes" in bundle:
+        bundle["naive_bayes_compiled"] = CompiledNaiveBayes(bundle["naive_bayes"], bundle["scaler"])
+    bundle["version"] = manifest["version"] if manifest else None
+    bundle["created_at"] = (manifest or {}).get("created_at")
+    bundle["dtype"] = np.dtype((manifest or {}).get("dtype", "float64"))
+    bundle["costs"] = (manifest or {}).get("costs")
+    if analysis:
+        analysis_data = {"projection": load_projection(saved_dir)}
+        for name in ("clustering", "importance"):
+            path = os.path.join(saved_dir, ANALYSIS_FILES[name])
+            if os.path.exists(path):
+                with open(path) as f:
+                    analysis_data[name] = json.load(f)
+        # Data left over from another version is ignored
+        bundle.update({name: data for name, data in analysis_data.items()
+                       if data is not None and data["model_version"] == bundle["version"]})
+    return bundle
+
+def train_bundle(df, params=None, dtype=MODEL_DTYPE):
+    """Train a standalone set of prediction models (e.g. for one market) from a dataset"""
+    X_train, X_test, y_train, y_test, bundle_scaler, columns = preprocess_data(df, dtype)
+    training_seconds = {}
+    knn, nb, rf, hgb = train_models(X_train, y_train, params, timings=training_seconds)
+    X_test_raw = bundle_scaler.inverse_transform(X_test)
+    start = time.perf_counter()
+    fast = distill_forest(rf, bundle_scaler, bundle_scaler.inverse_transform(X_train), X_test_raw, y_test)
+    training_seconds["fast"] = time.perf_counter() - start
+    
+    bundle = {"knn": knn, "naive_bayes": nb, "naive_bayes_compiled": CompiledNaiveBayes(nb, bundle_scaler),
+              "random_forest": rf, "hist_gradient_boosting": hgb, "fast": fast,
+              "scaler": bundle_scaler, "dtype": np.dtype(dtype)}
+    bundle["metrics"] = [{"algorithm": label, **evaluate_model(bundle[name], X_test, y_test)}
+                         for name, label in MODEL_LABELS.items()]
+    bundle["costs"] = measure_costs(bundle, X_test_raw, training_seconds)
+    
+    # Clusters, plot data and importance are computed once per version, as for the default models
+    kmeans = train_kmeans(X_train)
+    bundle["clustering"] = {"model_version": None, "clusters": _clustering_results(kmeans, X_train)}
+    bundle["projection"] = _project(kmeans, X_train, None)
+    bundle["importance"] = _permutation_importance({name: bundle[name] for name in MODEL_LABELS},
+                                                   X_test, y_test, columns, None)
+    return bundle
+
+def save_bundle(bundle, saved_dir):
+    """Save a bundle's models, metrics, analysis data and manifest; returns the new version"""
+    os.makedirs(saved_dir, exist_ok=True)
+    for name, filename in BUNDLE_FILES.items():
+        with open(os.path.join(saved_dir, filename), 'wb') as f:
+            pickle.dump(bundle[name], f)
+    with open(os.path.join(saved_dir, 'metrics.json'), 'w') as f:
+        json.dump(bundle["metrics"], f, indent=2)
+    
+    files = list(BUNDLE_FILES.values())
+    version = compute_model_version(saved_dir, files)
+    manifest = {"version": version, "created_at": datetime.datetime.utcnow().isoformat(),
+                "dtype": bundle["dtype"].name, "files": files, "checksums": file_checksums(saved_dir, files),
+                "costs": add_artifact_sizes(bundle.get("costs"), saved_dir)}
+    
+    # Analysis data is tagged with the version it belongs to, and written before the manifest
+    if "clustering" in bundle:
+        with open(os.path.join(saved_dir, ANALYSIS_FILES["clustering"]), 'w') as f:
+            json.dump({**bundle["clustering"], "model_version": version}, f)
+        save_projection({**bundle["projection"], "model_version": np.array(version)}, saved_dir)
+        save_permutation_importance({**bundle["importance"], "model_version": version}, saved_dir)
+    
+    with open(os.path.join(saved_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return version
+
+def scale_features(features_array, bundle):
+    """Scale raw inputs and cast them to the precision the bundle's models were trained in"""
+    return bundle["scaler"].transform(features_array).astype(bundle.get("dtype") or np.float64, copy=False)
+
+def make_prediction(features_array, model_name="random_forest", bundle=None):
+    """Make a prediction using the specified model of the active (or given) bundle"""
+    if bundle is None:
+        ensure_prediction_model(model_name)
+        bundle = active_bundle()
+    
+    if model_name == "fast":
+        return predict_fast(features_array, bundle)
+    if model_name == "naive_bayes" and bundle.get("naive_bayes_compiled") is not None:
+        # Scaler folded into the class parameters: one matrix expression on the raw inputs
+        return bundle["naive_bayes_compiled"].predict_with_proba(features_array)
     
     # Scale features
-    scaled_features = scaler.transform(features_array)
+    scaled_features = scale_features(features_array, bundle)
     
     # Select model
     if model_name == "knn":
-        prediction = knn_model.predict(scaled_features)
-        probabilities = knn_model.predict_proba(scaled_features)
+        model = bundle["knn"]
     elif model_name == "naive_bayes":
-        prediction = nb_model.predict(scaled_features)
-        probabilities = nb_model.predict_proba(scaled_features)
+        model = bundle["naive_bayes"]
+    elif model_name == "hist_gradient_boosting":
+        model = bundle["hist_gradient_boosting"]
     else:  # default to random_forest
-        prediction = rf_model.predict(scaled_features)
-        probabilities = rf_model.predict_proba(scaled_features)
+        model = bundle["random_forest"]
+    
+    # One pass: predict() would repeat the work of predict_proba() (e.g. the KNN search)
+    probabilities = model.predict_proba(scaled_features)
+    return model.classes_[np.argmax(probabilities, axis=1)], probabilities
+
+def explain_prediction(features_array, bundle=None):
+    """Predict with the Random Forest and attribute the probabilities to the input features.
     
+    Returns the prediction, probabilities, bias (the forest's prior) and
+    per-feature contributions of shape (n_samples, n_features, n_classes);
+    the probabilities are the bias plus the summed contributions.
+    """
+    if bundle is None:
+        ensure_models("random_forest")
+        bundle = {"explainer": rf_explainer, "scaler": scaler, "dtype": model_dtype}
+    explainer = bundle["explainer"]
+    bias, contributions = explainer.explain(scale_features(features_array, bundle))
+    probabilities = bias + contributions.sum(axis=1)
+    return explainer.classes_[np.argmax(probabilities, axis=1)], probabilities, bias, contributions
+
+# Upper bound on the number of grid points in one sweep
+MAX_SWEEP_POINTS = 250_000
+
+def build_sweep_grid(base_features, axes):
+    """Build the feature matrix of a 1-D or 2-D sweep around a base apartment.
+    
+    ``axes`` is a list of (feature name, values) pairs; the rows are in
+    C order over the axes, so predictions reshape straight into the grid.
+    """
+    shape = [len(values) for _, values in axes]
+    grid = np.tile(np.asarray(base_features, dtype=np.float64), (int(np.prod(shape)), 1))
+    mesh = np.meshgrid(*[values for _, values in axes], indexing="ij")
+    for (feature, _), coordinates in zip(axes, mesh):
+        grid[:, FEATURE_COLUMNS.index(feature)] = coordinates.ravel()
+    return grid, shape
+
+def sweep_predictions(base_features, axes, model_names, bundle=None):
+    """Score a whole what-if grid with one vectorized call per model, without storing it"""
+    grid, shape = build_sweep_grid(base_features, axes)
+    results = {}
+    for model_name in model_names:
+        prediction, probabilities = make_prediction(grid, model_name, bundle)
+        results[model_name] = {
+            "prediction": prediction.reshape(shape).tolist(),
+            # Class probabilities on the last axis
+            "probability": np.round(probabilities, 4).reshape(shape + [probabilities.shape[1]]).tolist(),
+        }
+    return {
+        "axes": [{"feature": feature, "values": np.asarray(values).tolist()} for feature, values in axes],
+        "shape": shape,
+        "models": results,
+    }
+
+def predict_fast(features_array, bundle):
+    """Predict with the distilled rules, falling back to the forest where they are uncertain"""
+    prediction, probabilities, confident = bundle["fast"].predict_with_confidence(features_array)
+    if not confident.all():
+        uncertain = ~confident
+        scaled_features = scale_features(np.asarray(features_array)[uncertain], bundle)
+        prediction[uncertain] = bundle["random_forest"].predict(scaled_features)
+        probabilities[uncertain] = bundle["random_forest"].predict_proba(scaled_features)
     return prediction, probabilities
 
-def get_model_metrics():
-    """Get evaluation metrics for all models"""
-    # Load models if not initialized
-    if knn_model is None or nb_model is None or rf_model is None:
-        load_models_success = load_models()
-        if not load_models_success:
-            initialize_models()
+# Rows scored at once when measuring batch latency
+LATENCY_BATCH_ROWS = 1000
+
+def _best_ms(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1e3
+
+def measure_costs(bundle, X_raw, training_seconds):
+    """Training time and single-row/batch latency of every prediction model of a bundle"""
+    X_batch = np.asarray(X_raw)[:LATENCY_BATCH_ROWS]
+    costs = {}
+    for model_name in [*MODEL_LABELS, "fast"]:
+        costs[model_name] = {
+            "training_seconds": training_seconds.get(model_name),
+            # Through make_prediction, so scaling is included as it is when serving
+            "single_row_ms": _best_ms(lambda: make_prediction(X_batch[:1], model_name, bundle), repeats=20),
+            "batch_ms": _best_ms(lambda: make_prediction(X_batch, model_name, bundle), repeats=5),
+            "batch_rows": int(len(X_batch)),
+        }
+    return costs
+
+def add_artifact_sizes(costs, saved_dir):
+    """Add the size of each model's saved artifact to its costs"""
+    if costs is None:
+        return None
+    for model_name, model_cost in costs.items():
+        model_cost["artifact_bytes"] = os.path.getsize(os.path.join(saved_dir, BUNDLE_FILES[model_name]))
+    return costs
+
+def with_costs(metrics, costs):
+    """Attach the recorded costs of each model family to its metrics"""
+    names = {label: name for name, label in MODEL_LABELS.items()}
+    return [{**m, **((costs or {}).get(names[m["algorithm"]]) or {})} for m in metrics]
+
+def save_distillation_report(report):
+    """Write the fidelity report of the distilled rules next to the saved models"""
+    with open(os.path.join(get_saved_dir(), 'distillation.json'), 'w') as f:
+        json.dump({"model_version": model_version, **report}, f, indent=2)
+
+def get_model_metrics(bundle=None):
+    """Get evaluation metrics for all models of the active (or given) bundle"""
+    if bundle is not None:
+        # Bundle metrics are measured on its test split at training time
+        return with_costs(bundle["metrics"], bundle.get("costs"))
+    ensure_models(*MODEL_LABELS)
+    ensure_data_splits()
     
     # Evaluate models
-    knn_metrics = evaluate_model(knn_model, X_test, y_test)
-    nb_metrics = evaluate_model(nb_model, X_test, y_test)
-    rf_metrics = evaluate_model(rf_model, X_test, y_test)
-    
-    return [
-        {"algorithm": "K-Nearest Neighbors", **knn_metrics},
-        {"algorithm": "Naive Bayes", **nb_metrics},
-        {"algorithm": "Random Forest", **rf_metrics}
-    ]
-
-def get_clustering_results():
-    """Get K-Means clustering results"""
-    # Load models if not initialized
-    if kmeans_model is None:
-        load_models_success = load_models()
-        if not load_models_success:
-            initialize_models()
+    classifiers = active_bundle()
+    metrics = [{"algorithm": label, **evaluate_model(classifiers[name], X_test, y_test)}
+               for name, label in MODEL_LABELS.items()]
+    return with_costs(metrics, model_costs)
+
+def _json_params(model, names):
+    """Pick JSON-serializable hyperparameters from a fitted model"""
+    params = model.get_params()
+    return {name: params[name] for name in names if name in params}
+
+def compute_evaluation(silhouette_sample_size=5000):
+    """Summarise the dataset, metrics and clusters of the current model version"""
+    ensure_data_splits()
+    
+    y_all = np.concatenate([np.asarray(y_train), np.asarray(y_test)])
+    classes, counts = np.unique(y_all, return_counts=True)
+    
+    labels = kmeans_model.labels_
+    sample_size = min(silhouette_sample_size, len(X_train))
+    centroids = scaler.inverse_transform(kmeans_model.cluster_centers_)
     
+    return {
+        "model_version": model_version,
+        "dataset": {
+            "n_rows": int(len(y_all)),
+            "n_train": int(len(y_train)),
+            "n_test": int(len(y_test)),
+            "features": list(features),
+            "class_counts": {str(c): int(n) for c, n in zip(classes, counts)},
+        },
+        "params": {
+            "knn": _json_params(knn_model, ["n_neighbors", "weights", "metric"]),
+            "naive_bayes": _json_params(nb_model, ["var_smoothing"]),
+            "random_forest": _json_params(rf_model, ["n_estimators", "max_depth", "min_samples_leaf", "random_state"]),
+            "hist_gradient_boosting": _json_params(hgb_model, ["learning_rate", "max_iter", "max_leaf_nodes",
+                                                               "l2_regularization", "random_state"]),
+            "kmeans": _json_params(kmeans_model, ["n_clusters", "init", "random_state"]),
+        },
+        "metrics": get_model_metrics(),
+        "clustering": {
+            "n_clusters": int(len(centroids)),
+            "sizes": np.bincount(labels, minlength=len(centroids)).tolist(),
+            "centroids": [dict(zip(features, map(float, c))) for c in centroids],
+            "inertia": float(kmeans_model.inertia_),
+            "silhouette": float(silhouette_score(X_train, labels, sample_size=sample_size, random_state=42)),
+            "adjusted_rand": float(adjusted_rand_score(y_train, labels)),
+        },
+    }
+
+def save_evaluation(evaluation):
+    """Persist the evaluation summary of the current model version"""
+    with open(os.path.join(get_saved_dir(), 'evaluation.json'), 'w') as f:
+        json.dump(evaluation, f, indent=2)
+
+def _permuted_score(model, X, y, feature_idx, seed):
+    """Accuracy of a model after shuffling one feature column"""
+    rng = np.random.default_rng(seed)
+    X_permuted = X.copy()
+    X_permuted[:, feature_idx] = rng.permutation(X_permuted[:, feature_idx])
+    return accuracy_score(y, model.predict(X_permuted))
+
+def _permutation_importance(classifiers, X, y, feature_names, version, n_repeats=5, n_jobs=-1, seed=42):
+    """Compute permutation importance for the given classifiers on a held-out split.
+    
+    Every (model, feature, repeat) permutation is scored as a separate task, so
+    the work spreads over all cores.
+    """
+    X = np.asarray(X)
+    y = np.asarray(y)
+    n_features = X.shape[1]
+    seeds = np.random.SeedSequence(seed).generate_state(n_features * n_repeats)
+    
+    tasks = [(name, feature_idx, repeat)
+             for name in classifiers
+             for feature_idx in range(n_features)
+             for repeat in range(n_repeats)]
+    # Tree and neighbour predictions release the GIL, so threads avoid copying the models
+    scores = Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_permuted_score)(classifiers[name], X, y, feature_idx,
+                                 seeds[feature_idx * n_repeats + repeat])
+        for name, feature_idx, repeat in tasks
+    )
+    drops = {name: np.zeros((n_features, n_repeats)) for name in classifiers}
+    baselines = {name: accuracy_score(y, model.predict(X)) for name, model in classifiers.items()}
+    for (name, feature_idx, repeat), score in zip(tasks, scores):
+        drops[name][feature_idx, repeat] = baselines[name] - score
+    
+    return {
+        "model_version": version,
+        "n_repeats": n_repeats,
+        "features": list(feature_names),
+        "models": {
+            name: {
+                "baseline_accuracy": float(baselines[name]),
+                "importances_mean": drops[name].mean(axis=1).tolist(),
+                "importances_std": drops[name].std(axis=1).tolist(),
+            }
+            for name in classifiers
+        },
+    }
+
+def compute_permutation_importance(n_repeats=5, n_jobs=-1, seed=42):
+    """Compute permutation importance for all classifiers of the current version on the held-out split"""
+    ensure_data_splits()
+    
+    classifiers = {name: model for name, model in active_bundle().items() if name in MODEL_LABELS}
+    return _permutation_importance(classifiers, X_test, y_test, features, model_version, n_repeats, n_jobs, seed)
+
+def save_permutation_importance(importance, saved_dir=None):
+    """Persist permutation importance next to the model version it was computed for"""
+    with open(os.path.join(saved_dir or get_saved_dir(), 'permutation_importance.json'), 'w') as f:
+        json.dump(importance, f, indent=2)
+
+def _bundle_analysis(bundle, name):
+    """Analysis data computed when a saved bundle was trained"""
+    if name not in bundle:
+        raise AnalysisNotAvailableError(f"Models {bundle.get('version')} were saved without {name} data; retrain them to serve it")
+    return bundle[name]
+
+def get_permutation_importance(bundle=None):
+    """Get the cached permutation importance for the current model version (or the given bundle)"""
+    if bundle is not None:
+        return _bundle_analysis(bundle, "importance")
+    ensure_models(*MODEL_LABELS)
+    
+    importance_path = os.path.join(get_saved_dir(), 'permutation_importance.json')
+    if os.path.exists(importance_path):
+        with open(importance_path) as f:
+            importance = json.load(f)
+        if importance.get("model_version") == model_version:
+            return importance
+    
+    # Stale or missing cache: compute once for this version
+    importance = compute_permutation_importance()
+    save_permutation_importance(importance)
+    return importance
+
+def _clustering_results(kmeans, X_train):
+    """Summarise K-Means clusters with their centroid and up to 100 of their training points"""
     # Get cluster labels and centroids
-    cluster_labels = kmeans_model.labels_
-    centroids = kmeans_model.cluster_centers_
+    cluster_labels = kmeans.labels_
+    centroids = kmeans.cluster_centers_
     
     # Prepare clustering results
     results = []
@@ -290,13 +926,143 @@ def get_clustering_results():
     
     return results
 
-def get_visualization(plot_type):
-    """Generate visualizations for model evaluation and clustering results"""
+def get_clustering_results(bundle=None):
+    """Get K-Means clustering results of the default models (or the given bundle)"""
+    if bundle is not None:
+        return _bundle_analysis(bundle, "clustering")["clusters"]
+    ensure_models("kmeans")
+    ensure_data_splits()
+    return _clustering_results(kmeans_model, X_train)
+
+# Default and maximum number of training points in clustering plot data
+PLOT_POINTS = 2000
+MAX_PLOT_POINTS = 50_000
+
+_projection = None
+
+def _project(kmeans, X_train, version, seed=42):
+    """Project the training points and centroids onto their first two principal components.
+    
+    Points are stored grouped by cluster and shuffled within each cluster, so a
+    cluster-stratified sample of any size is a prefix of every cluster's block.
+    """
+    pca = PCA(n_components=2).fit(X_train)
+    labels = kmeans.labels_
+    order = np.lexsort((np.random.default_rng(seed).random(len(labels)), labels))
+    return {
+        "model_version": np.array(version),
+        "points": pca.transform(X_train[order]).astype(np.float32),
+        "labels": labels[order].astype(np.int32),
+        "centroids": pca.transform(kmeans.cluster_centers_).astype(np.float32),
+        "explained_variance_ratio": pca.explained_variance_ratio_,
+    }
+
+def compute_projection(seed=42):
+    """Project the training points and centroids of the current model version"""
+    ensure_models("kmeans")
+    ensure_data_splits()
+    return _project(kmeans_model, X_train, model_version, seed)
+
+def save_projection(projection, saved_dir=None):
+    """Persist the 2-D projection next to the model version it was computed for"""
+    np.savez(os.path.join(saved_dir or get_saved_dir(), 'projection.npz'), **projection)
+
+def load_projection(saved_dir=None):
+    """Read a saved 2-D projection, or None if there is none"""
+    projection_path = os.path.join(saved_dir or get_saved_dir(), 'projection.npz')
+    if not os.path.exists(projection_path):
+        return None
+    with np.load(projection_path) as saved:
+        projection = {name: saved[name] for name in saved.files}
+    return {**projection, "model_version": str(projection["model_version"])}
+
+def get_projection(bundle=None):
+    """Get the 2-D projection of the current model version (or the given bundle), computing it once if missing"""
+    global _projection
+    
+    if bundle is not None:
+        return _bundle_analysis(bundle, "projection")
+    ensure_models("kmeans")
+    if _projection is not None and _projection["model_version"] == model_version:
+        return _projection
+    
+    projection = load_projection()
+    if projection is None or projection["model_version"] != model_version:
+        # Stale or missing: compute once for this version
+        projection = compute_projection()
+        save_projection(projection)
+    
+    _projection = {**projection, "model_version": str(projection["model_version"])}
+    return _projection
+
+def stratified_counts(sizes, n):
+    """Split n samples over groups in proportion to their sizes (largest remainder)"""
+    sizes = np.asarray(sizes)
+    n = min(n, int(sizes.sum()))
+    quota = sizes * n / sizes.sum()
+    counts = np.floor(quota).astype(np.int64)
+    counts[np.argsort(counts - quota, kind="stable")[:n - counts.sum()]] += 1
+    return counts
+
+def _rounded(values, decimals=4):
+    return np.round(np.asarray(values, dtype=np.float64), decimals).tolist()
+
+def get_plot_data(plot_type, n_points=PLOT_POINTS, bundle=None):
+    """Get the data behind a visualization as columnar lists, for client-side charts"""
+    if plot_type == "clustering":
+        projection = get_projection(bundle)
+        labels = projection["labels"]
+        sizes = np.bincount(labels, minlength=len(projection["centroids"]))
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        counts = stratified_counts(sizes, min(n_points, MAX_PLOT_POINTS))
+        idx = np.concatenate([np.arange(start, start + count) for start, count in zip(starts, counts)])
+        points, centroids = projection["points"][idx], projection["centroids"]
+        return {
+            "model_version": projection["model_version"],
+            "explained_variance_ratio": _rounded(projection["explained_variance_ratio"], 6),
+            "n_points": int(len(labels)),
+            "points": {"x": _rounded(points[:, 0]), "y": _rounded(points[:, 1]), "cluster": labels[idx].tolist()},
+            "centroids": {"x": _rounded(centroids[:, 0]), "y": _rounded(centroids[:, 1]),
+                          "cluster": list(range(len(centroids))), "size": sizes.tolist()},
+        }
+    
+    if plot_type == "model_comparison":
+        metrics = get_model_metrics(bundle)
+        return {
+            "model_version": model_version if bundle is None else bundle["version"],
+            "algorithm": [m["algorithm"] for m in metrics],
+            **{name: _rounded([m[name] for m in metrics], 6) for name in ("accuracy", "precision", "recall", "f1_score")},
+        }
+    
+    if plot_type == "feature_importance":
+        importance = get_permutation_importance(bundle)
+        # Same order as the rendered plot: mean importance across models, descending
+        means = np.array([model["importances_mean"] for model in importance["models"].values()])
+        indices = np.argsort(means.mean(axis=0))[::-1]
+        return {
+            "model_version": importance["model_version"],
+            "feature": [importance["features"][i] for i in indices],
+            "models": {
+                name: {"mean": _rounded(np.asarray(model["importances_mean"])[indices], 6),
+                       "std": _rounded(np.asarray(model["importances_std"])[indices], 6)}
+                for name, model in importance["models"].items()
+            },
+        }
+    
+    raise ValueError(f"Unknown plot type: {plot_type}")
+
+def get_visualization(plot_type, bundle=None):
+    """Generate visualizations for model evaluation and clustering results of the active (or given) bundle"""
+    # Check before opening a figure, so a not-ready or missing-data error doesn't leak one
+    if bundle is None:
+        ensure_models(*(["kmeans"] if plot_type == "clustering" else MODEL_LABELS))
+    elif plot_type in ("clustering", "feature_importance"):
+        _bundle_analysis(bundle, "projection" if plot_type == "clustering" else "importance")
     plt.figure(figsize=(10, 6))
     
     if plot_type == "model_comparison":
         # Compare model performance
-        metrics = get_model_metrics()
+        metrics = get_model_metrics(bundle)
         
         algorithms = [m["algorithm"] for m in metrics]
         accuracy = [m["accuracy"] for m in metrics]
@@ -319,20 +1085,13 @@ def get_visualization(plot_type):
         plt.legend()
         
     elif plot_type == "clustering":
-        # Visualize clustering results using first two dimensions
-        if kmeans_model is None:
-            load_models_success = load_models()
-            if not load_models_success:
-                initialize_models()
-        
-        # Use PCA to reduce to 2D for visualization
-        from sklearn.decomposition import PCA
-        pca = PCA(n_components=2)
-        X_train_2d = pca.fit_transform(X_train)
-        centroids_2d = pca.transform(kmeans_model.cluster_centers_)
+        # Visualize clustering results with the PCA projection precomputed for this model version
+        projection = get_projection(bundle)
+        X_train_2d = projection["points"]
+        centroids_2d = projection["centroids"]
         
         # Plot cluster points and centroids
-        plt.scatter(X_train_2d[:, 0], X_train_2d[:, 1], c=kmeans_model.labels_, cmap='viridis', alpha=0.5)
+        plt.scatter(X_train_2d[:, 0], X_train_2d[:, 1], c=projection["labels"], cmap='viridis', alpha=0.5)
         plt.scatter(centroids_2d[:, 0], centroids_2d[:, 1], c='red', marker='X', s=100)
         
         plt.xlabel('PCA Component 1')
@@ -340,21 +1099,27 @@ def get_visualization(plot_type):
         plt.title('K-Means Clustering Results')
         
     elif plot_type == "feature_importance":
-        # Feature importance from Random Forest
-        if rf_model is None:
-            load_models_success = load_models()
-            if not load_models_success:
-                initialize_models()
+        # Cached permutation importance for all classifiers
+        importance = get_permutation_importance(bundle)
+        feature_names = importance["features"]
+        
+        # Order features by their mean importance across models
+        means = np.array([importance["models"][name]["importances_mean"] for name in MODEL_LABELS])
+        indices = np.argsort(means.mean(axis=0))[::-1]
         
-        importances = rf_model.feature_importances_
-        indices = np.argsort(importances)[::-1]
-        feature_names = features
+        x = np.arange(len(feature_names))
+        width = 0.8 / len(MODEL_LABELS)
+        for i, name in enumerate(MODEL_LABELS):
+            model_importance = importance["models"][name]
+            offset = (i - (len(MODEL_LABELS) - 1) / 2) * width
+            plt.bar(x + offset, np.array(model_importance["importances_mean"])[indices], width,
+                    yerr=np.array(model_importance["importances_std"])[indices], label=MODEL_LABELS[name])
         
-        plt.bar(range(len(importances)), importances[indices])
-        plt.xticks(range(len(importances)), [feature_names[i] for i in indices], rotation=90)
+        plt.xticks(x, [feature_names[i] for i in indices], rotation=90)
         plt.xlabel('Features')
-        plt.ylabel('Importance')
-        plt.title('Feature Importance (Random Forest)')
+        plt.ylabel('Accuracy drop when permuted')
+        plt.title('Permutation Feature Importance')
+        plt.legend()
     
     # Convert plot to base64 string
     buf = io.BytesIO()
@@ -382,16 +1147,20 @@ def store_prediction(db: Session, features, prediction, model_name):
         age=features.age,
         location_score=features.location_score,
         prediction_result=int(prediction[0]),
-        model_used=model_name
+        model_used=model_name,
+        timestamp=datetime.datetime.utcnow()
     )
     db.add(db_prediction)
+    
+    # Keep the analytics rollups in step within the same transaction
+    update_rollups(db, db_prediction)
     db.commit()
     db.refresh(db_prediction)
     return db_prediction
 
-def get_stored_predictions(db: Session):
-    """Get predictions from SQLite database"""
-    predictions = db.query(Prediction).order_by(Prediction.timestamp.desc()).limit(100).all()
+def get_stored_predictions(db: Session, limit=100):
+    """Get the latest predictions from SQLite, topped up from the Parquet archive"""
+    predictions = db.query(Prediction).order_by(Prediction.timestamp.desc()).limit(limit).all()
     
     # Convert to list of dictionaries
     result = []
@@ -414,4 +1183,11 @@ def get_stored_predictions(db: Session):
             "timestamp": p.timestamp.isoformat()
         })
     
+    # Older history may already have been moved out of SQLite
+    if len(result) < limit:
+        for row in latest_archived_rows(limit - len(result)):
+            record = dict(zip(PREDICTION_COLUMNS, row))
+            record["timestamp"] = record["timestamp"].isoformat()
+            result.append(record)
+    
     return result
\ No newline at end of file
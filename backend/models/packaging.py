@@ -0,0 +1,276 @@
+"""Checksummed, compressed archives of saved models for distribution.
+
+A saved model directory (``models/saved`` or a market's) records the SHA-256
+of every artifact in its ``manifest.json``, and loading verifies each one in
+background threads while the others are being unpickled, so a corrupt or
+partially copied file is rejected instead of served.
+
+For shipping a model version to serving nodes, the directory is packed into a
+single ``<version>.modelbundle`` file: an uncompressed tar holding
+``bundle.json`` (format, model version, and each member's size, compressed
+size and checksum) followed by every member compressed on its own, with
+zstandard when it is installed and zlib otherwise. Installing decompresses
+and verifies the members in parallel into a staging directory and only moves
+them into place once all of them match, with the manifest last. The installed
+files are the plain, uncompressed artifacts, loaded like freshly saved ones.
+
+Run from the backend directory:
+
+    python -m models.packaging pack --output dist
+    python -m models.packaging verify dist/<version>.modelbundle
+    python -m models.packaging install dist/<version>.modelbundle
+"""
+import argparse
+import datetime
+import hashlib
+import io
+import json
+import mmap
+import os
+import pickle
+import shutil
+import tarfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+BUNDLE_FORMAT = 1
+ARCHIVE_SUFFIX = ".modelbundle"
+# Files packed along with the manifest's artifacts when they exist
+OPTIONAL_MEMBERS = ['metrics.json', 'drift_reference.json', 'distillation.json', 'evaluation.json',
+                    'permutation_importance.json', 'projection.npz', 'clustering.json']
+# Threads used to hash, compress and decompress members
+PACKAGING_WORKERS = int(os.getenv("PACKAGING_WORKERS", "8"))
+
+DEFAULT_SAVED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saved')
+
+
+class CorruptBundleError(Exception):
+    """Raised when saved models or an archive do not match their checksums"""
+
+
+def sha256_file(path):
+    """SHA-256 of a file, read through a memory map"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return hashlib.sha256(data).hexdigest()
+
+
+def file_checksums(saved_dir, files):
+    """Checksums of a saved directory's artifacts, for its manifest"""
+    with ThreadPoolExecutor(max_workers=PACKAGING_WORKERS) as executor:
+        digests = executor.map(lambda name: sha256_file(os.path.join(saved_dir, name)), files)
+        return dict(zip(files, digests))
+
+
+class VerifiedLoader:
+    """Unpickle saved artifacts, each only after it matched its manifest checksum.
+
+    Every listed artifact starts hashing in background threads as soon as the
+    loader is created, so verifying the later ones overlaps with unpickling
+    the earlier ones. Without checksums (older manifests) nothing is verified.
+    """
+
+    def __init__(self, saved_dir, checksums=None):
+        self.saved_dir = saved_dir
+        self.checksums = checksums or {}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, min(PACKAGING_WORKERS, len(self.checksums))))
+        self._digests = {name: self._executor.submit(sha256_file, os.path.join(saved_dir, name))
+                         for name in self.checksums}
+        self._executor.shutdown(wait=False)
+
+    def verify(self, filename):
+        if filename not in self._digests:
+            return
+        path = os.path.join(self.saved_dir, filename)
+        try:
+            digest = self._digests[filename].result()
+        except FileNotFoundError:
+            raise CorruptBundleError(f"{path} is missing")
+        if digest != self.checksums[filename]:
+            raise CorruptBundleError(f"{path} does not match its checksum")
+
+    def load(self, filename):
+        self.verify(filename)
+        with open(os.path.join(self.saved_dir, filename), 'rb') as f:
+            return pickle.load(f)
+
+
+def _compress(data):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(data)
+    return "zlib", zlib.compress(data, 1)
+
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            raise CorruptBundleError("The bundle is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise CorruptBundleError(f"Unknown compression: {codec}")
+
+
+def _read_manifest(saved_dir):
+    manifest_path = os.path.join(saved_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        raise CorruptBundleError(f"No manifest in {saved_dir}")
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def pack(saved_dir=DEFAULT_SAVED_DIR, output_dir="."):
+    """Pack a saved model directory into a single archive; returns its path"""
+    manifest = _read_manifest(saved_dir)
+    names = manifest["files"] + [name for name in OPTIONAL_MEMBERS
+                                 if os.path.exists(os.path.join(saved_dir, name))] + ['manifest.json']
+
+    # Never ship artifacts that already differ from their manifest
+    loader = VerifiedLoader(saved_dir, manifest.get("checksums"))
+    for name in manifest["files"]:
+        loader.verify(name)
+
+    def compress_member(name):
+        with open(os.path.join(saved_dir, name), 'rb') as f:
+            data = f.read()
+        codec, compressed = _compress(data)
+        return {"name": name, "codec": codec, "size": len(data), "compressed_size": len(compressed),
+                "sha256": hashlib.sha256(data).hexdigest()}, compressed
+
+    with ThreadPoolExecutor(max_workers=PACKAGING_WORKERS) as executor:
+        members = list(executor.map(compress_member, names))
+
+    header = {
+        "format": BUNDLE_FORMAT,
+        "version": manifest["version"],
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "members": [info for info, _ in members],
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{manifest['version']}{ARCHIVE_SUFFIX}")
+    tmp_path = path + ".tmp"
+    with tarfile.open(tmp_path, "w") as tar:
+        for name, data in [("bundle.json", json.dumps(header, indent=2).encode())] + \
+                          [(info["name"], compressed) for info, compressed in members]:
+            member = tarfile.TarInfo(name)
+            member.size = len(data)
+            tar.addfile(member, io.BytesIO(data))
+    os.replace(tmp_path, path)
+    return path
+
+
+def _unpack(archive_path, on_member):
+    """Decompress and verify every member in parallel, passing each to on_member(name, data)"""
+    try:
+        with tarfile.open(archive_path, "r") as tar:
+            header = json.load(tar.extractfile("bundle.json"))
+            if header.get("format") != BUNDLE_FORMAT:
+                raise CorruptBundleError(f"Unsupported bundle format: {header.get('format')}")
+            expected = {info["name"]: info for info in header["members"]}
+            for name in expected:
+                # Members are written into the saved directory, so they must be plain file names
+                if os.path.basename(name) != name or name in ("", ".", ".."):
+                    raise CorruptBundleError(f"Invalid member name: {name!r}")
+
+            def unpack_member(info, compressed):
+                try:
+                    data = _decompress(info["codec"], compressed)
+                except CorruptBundleError:
+                    raise
+                except Exception as e:
+                    raise CorruptBundleError(f"Member {info['name']} cannot be decompressed: {e}") from e
+                if len(data) != info["size"] or hashlib.sha256(data).hexdigest() != info["sha256"]:
+                    raise CorruptBundleError(f"Member {info['name']} does not match its checksum")
+                on_member(info["name"], data)
+
+            with ThreadPoolExecutor(max_workers=PACKAGING_WORKERS) as executor:
+                futures, seen = [], set()
+                for member in tar:
+                    if member.name == "bundle.json":
+                        continue
+                    if member.name not in expected or member.name in seen:
+                        raise CorruptBundleError(f"Unexpected member: {member.name}")
+                    seen.add(member.name)
+                    compressed = tar.extractfile(member).read()
+                    if len(compressed) != expected[member.name]["compressed_size"]:
+                        raise CorruptBundleError(f"Member {member.name} is truncated")
+                    futures.append(executor.submit(unpack_member, expected[member.name], compressed))
+                for future in futures:
+                    future.result()
+            missing = set(expected) - seen
+            if missing:
+                raise CorruptBundleError(f"Bundle is missing: {', '.join(sorted(missing))}")
+    except (tarfile.TarError, EOFError, KeyError, json.JSONDecodeError) as e:
+        raise CorruptBundleError(f"Unreadable bundle {archive_path}: {e}") from e
+    return header
+
+
+def verify(archive_path):
+    """Check every member of an archive against its checksum; returns the archive header"""
+    return _unpack(archive_path, lambda name, data: None)
+
+
+def install(archive_path, saved_dir=DEFAULT_SAVED_DIR):
+    """Unpack an archive into a saved model directory; returns the installed version.
+
+    Nothing in saved_dir changes unless every member verified. The manifest is
+    moved in last, so a process starting mid-install sees either the old
+    manifest (and rejects the new files against it) or the complete new set.
+    """
+    os.makedirs(saved_dir, exist_ok=True)
+    staging_dir = os.path.join(saved_dir, f".staging-{os.getpid()}")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+
+    def write_member(name, data):
+        with open(os.path.join(staging_dir, name), 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    try:
+        header = _unpack(archive_path, write_member)
+        names = [info["name"] for info in header["members"]]
+        for name in sorted(names, key=lambda name: name == 'manifest.json'):
+            os.replace(os.path.join(staging_dir, name), os.path.join(saved_dir, name))
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    return header["version"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack, verify and install model bundles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    pack_parser = subparsers.add_parser("pack", help="Pack a saved model directory into an archive")
+    pack_parser.add_argument("--saved-dir", default=DEFAULT_SAVED_DIR)
+    pack_parser.add_argument("--output", default=".", help="Directory to write the archive to")
+    verify_parser = subparsers.add_parser("verify", help="Check an archive against its checksums")
+    verify_parser.add_argument("archive")
+    install_parser = subparsers.add_parser("install", help="Verify and unpack an archive into a saved model directory")
+    install_parser.add_argument("archive")
+    install_parser.add_argument("--saved-dir", default=DEFAULT_SAVED_DIR)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "pack":
+            path = pack(args.saved_dir, args.output)
+            print(f"Packed {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+        elif args.command == "verify":
+            header = verify(args.archive)
+            print(f"Bundle {header['version']}: {len(header['members'])} members verified")
+        else:
+            version = install(args.archive, args.saved_dir)
+            print(f"Installed version {version} into {args.saved_dir}")
+    except CorruptBundleError as e:
+        raise SystemExit(f"Rejected: {e}")
+
+
+if __name__ == "__main__":
+    main()
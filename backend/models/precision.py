@@ -0,0 +1,130 @@
+"""Validation report for float32 training and inference (``FLOAT32_MODE=1``).
+
+The models are trained twice on the same split, once on float64 and once on
+float32 feature matrices, and the report lists how their metrics, predictions
+and clusters differ, next to the memory held by the large matrices and the
+time the distance-based models take. Run it from the backend directory before
+switching a deployment to float32:
+
+    python -m models.precision [--data data/apartment_data.csv]
+
+The report is written to ``models/saved/precision.json``.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.decomposition import PCA
+from sklearn.metrics import adjusted_rand_score
+
+import models.ml_models as ml_models
+
+PRECISIONS = (np.dtype(np.float64), np.dtype(np.float32))
+
+
+def _best_seconds(fn, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _train(df, dtype, params):
+    """Train every model at one precision and collect what the report compares"""
+    X_train, X_test, y_train, y_test, _, _ = ml_models.preprocess_data(df, dtype)
+    start = time.perf_counter()
+    knn, nb, rf, hgb = ml_models.train_models(X_train, y_train, params)
+    train_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    kmeans = ml_models.train_kmeans(X_train)
+    kmeans_seconds = time.perf_counter() - start
+    pca = PCA(n_components=2).fit(X_train)
+
+    classifiers = {"knn": knn, "naive_bayes": nb, "random_forest": rf, "hist_gradient_boosting": hgb}
+    return {
+        "y_test": y_test,
+        "metrics": {name: ml_models.evaluate_model(model, X_test, y_test) for name, model in classifiers.items()},
+        "proba": {name: model.predict_proba(X_test) for name, model in classifiers.items()},
+        "kmeans": kmeans,
+        "pca": pca,
+        "memory_bytes": {"X_train": int(X_train.nbytes), "knn_training_set": int(knn._fit_X.nbytes),
+                         "kmeans_centers": int(kmeans.cluster_centers_.nbytes)},
+        "seconds": {
+            "train_classifiers": train_seconds,
+            "train_kmeans": kmeans_seconds,
+            "knn_predict_test": _best_seconds(lambda: knn.predict_proba(X_test)),
+            "kmeans_predict_train": _best_seconds(lambda: kmeans.predict(X_train)),
+            "pca_transform_train": _best_seconds(lambda: pca.transform(X_train)),
+        },
+    }
+
+
+def compare_precision(df, params=None):
+    """Compare models trained on float32 inputs against the float64 baseline"""
+    baseline, candidate = (_train(df, dtype, params) for dtype in PRECISIONS)
+
+    models = {}
+    for name, metrics in baseline["metrics"].items():
+        labels64 = np.argmax(baseline["proba"][name], axis=1)
+        labels32 = np.argmax(candidate["proba"][name], axis=1)
+        models[name] = {
+            "float64": metrics,
+            "float32": candidate["metrics"][name],
+            "metric_diff": {metric: candidate["metrics"][name][metric] - value for metric, value in metrics.items()},
+            "prediction_agreement": float(np.mean(labels64 == labels32)),
+            "max_probability_diff": float(np.abs(baseline["proba"][name] - candidate["proba"][name]).max()),
+        }
+
+    kmeans64, kmeans32 = baseline["kmeans"], candidate["kmeans"]
+    pca64, pca32 = baseline["pca"], candidate["pca"]
+    # Principal axes are only defined up to their sign
+    component_cosines = np.abs(np.sum(pca64.components_ * pca32.components_, axis=1))
+    return {
+        "n_train": int(len(kmeans64.labels_)),
+        "n_test": int(len(baseline["y_test"])),
+        "models": models,
+        "kmeans": {
+            "adjusted_rand": float(adjusted_rand_score(kmeans64.labels_, kmeans32.labels_)),
+            "inertia_float64": float(kmeans64.inertia_),
+            "inertia_float32": float(kmeans32.inertia_),
+            "inertia_relative_diff": float(kmeans32.inertia_ / kmeans64.inertia_ - 1),
+        },
+        "pca": {
+            "explained_variance_ratio_float64": pca64.explained_variance_ratio_.tolist(),
+            "explained_variance_ratio_float32": pca32.explained_variance_ratio_.tolist(),
+            "component_cosine": component_cosines.tolist(),
+        },
+        "memory_bytes": {"float64": baseline["memory_bytes"], "float32": candidate["memory_bytes"]},
+        "seconds": {"float64": baseline["seconds"], "float32": candidate["seconds"]},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare float32 and float64 models")
+    parser.add_argument("--data", help="CSV or Parquet file with the apartment_data.csv columns (default: the training dataset)")
+    args = parser.parse_args(argv)
+
+    if args.data is None:
+        df = ml_models.load_dataset()
+    elif args.data.endswith(".parquet"):
+        df = pd.read_parquet(args.data)
+    else:
+        df = pd.read_csv(args.data)
+    report = compare_precision(df, ml_models.load_best_params())
+
+    report_path = os.path.join(ml_models.get_saved_dir(), 'precision.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    for name, model in report["models"].items():
+        print(f"{name}: accuracy {model['float64']['accuracy']:.4f} -> {model['float32']['accuracy']:.4f}, "
+              f"agreement {model['prediction_agreement']:.4%}")
+    print(f"Report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Registry of per-market model bundles with lazy loading and LRU eviction.
+
+Every market has its own artifact directory, ``models/saved/markets/<market>``,
+laid out like ``models/saved`` and trained on that market's own data. Bundles
+are loaded on first use, keyed by market and model version (from the
+market's manifest), so a retrained market is picked up on its next request.
+The least recently used bundles are evicted once the loaded artifacts exceed
+``MODEL_REGISTRY_MAX_MB``. The ``default`` market is served by the models in
+``ml_models`` itself.
+
+Train or list markets from the backend directory:
+
+    python -m models.registry train --market paris --data data/paris.csv
+    python -m models.registry list
+"""
+import argparse
+import collections
+import json
+import os
+import re
+import threading
+
+import pandas as pd
+
+import models.ml_models as ml_models
+from models.explain import ForestExplainer
+
+DEFAULT_MARKET = "default"
+MARKETS_DIR = os.getenv("MARKETS_DIR", os.path.join(ml_models.get_saved_dir(), 'markets'))
+MODEL_REGISTRY_MAX_MB = float(os.getenv("MODEL_REGISTRY_MAX_MB", "512"))
+
+_MARKET_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+
+class UnknownMarketError(KeyError):
+    """Raised for markets without trained models"""
+
+    def __str__(self):
+        return f"No models for market '{self.args[0]}'"
+
+
+def market_dir(market):
+    if not _MARKET_NAME.match(market):
+        raise UnknownMarketError(market)
+    return os.path.join(MARKETS_DIR, market)
+
+
+def list_markets():
+    """Markets that have a saved bundle"""
+    if not os.path.isdir(MARKETS_DIR):
+        return []
+    return sorted(name for name in os.listdir(MARKETS_DIR)
+                  if os.path.exists(os.path.join(MARKETS_DIR, name, 'manifest.json')))
+
+
+def _artifact_bytes(saved_dir):
+    """Size of a bundle's pickled models and analysis data, a close proxy for their resident size"""
+    return sum(os.path.getsize(os.path.join(saved_dir, filename))
+               for filename in [*ml_models.BUNDLE_FILES.values(), *ml_models.ANALYSIS_FILES.values()]
+               if os.path.exists(os.path.join(saved_dir, filename)))
+
+
+class MarketRegistry:
+    """Lazily loaded, LRU-evicted model bundles keyed by (market, version)"""
+
+    def __init__(self, max_bytes=MODEL_REGISTRY_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._bundles = collections.OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        # One lock per key while it loads, so a cold market is loaded once however many requests ask for it
+        self._loading = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get_bundle(self, market):
+        """Get the current bundle of a market, loading it (and evicting cold ones) if needed"""
+        saved_dir = market_dir(market)
+        manifest = ml_models.read_manifest(saved_dir)
+        if manifest is None:
+            raise UnknownMarketError(market)
+        key = (market, manifest["version"])
+
+        with self._lock:
+            if key in self._bundles:
+                self._bundles.move_to_end(key)
+                return self._bundles[key]
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        try:
+            with loading:
+                with self._lock:
+                    if key in self._bundles:
+                        return self._bundles[key]
+                bundle = ml_models.load_bundle(saved_dir, analysis=True)
+                bundle["explainer"] = ForestExplainer(bundle["random_forest"])
+                metrics_path = os.path.join(saved_dir, 'metrics.json')
+                if os.path.exists(metrics_path):
+                    with open(metrics_path) as f:
+                        bundle["metrics"] = json.load(f)
+
+                with self._lock:
+                    # Older versions of the same market are never used again
+                    for old_key in [k for k in self._bundles if k[0] == market]:
+                        self._evict(old_key)
+                    self._bundles[key] = bundle
+                    self._sizes[key] = _artifact_bytes(saved_dir) + bundle["explainer"].nbytes
+                    self.loads += 1
+                    while sum(self._sizes.values()) > self.max_bytes and len(self._bundles) > 1:
+                        self._evict(next(iter(self._bundles)))
+        finally:
+            with self._lock:
+                if self._loading.get(key) is loading:
+                    del self._loading[key]
+        return bundle
+
+    def _evict(self, key):
+        del self._bundles[key]
+        del self._sizes[key]
+        self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": [{"market": market, "version": version, "bytes": self._sizes[(market, version)]}
+                           for market, version in self._bundles],
+                "loaded_bytes": sum(self._sizes.values()),
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+# Shared by the API endpoints of this process
+market_registry = MarketRegistry()
+
+
+def train_market(market, data_path, params=None):
+    """Train and save the models of one market from its dataset"""
+    df = pd.read_parquet(data_path) if data_path.endswith(".parquet") else pd.read_csv(data_path)
+    bundle = ml_models.train_bundle(df, params)
+    return ml_models.save_bundle(bundle, market_dir(market))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage per-market model bundles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train = subparsers.add_parser("train", help="Train the models of a market")
+    train.add_argument("--market", required=True)
+    train.add_argument("--data", required=True, help="CSV or Parquet file with the apartment_data.csv columns")
+    subparsers.add_parser("list", help="List markets with trained models")
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        version = train_market(args.market, args.data, ml_models.load_best_params())
+        print(f"Trained market '{args.market}', version {version}")
+    else:
+        for market in list_markets():
+            print(f"{market}\t{ml_models.read_manifest(market_dir(market))['version']}")
+
+
+if __name__ == "__main__":
+    main()
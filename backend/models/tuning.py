@@ -0,0 +1,203 @@
+"""Cross-validated hyperparameter search for the classification models.
+
+Candidates are ranked with successive halving: every candidate is scored on a
+few CV folds, the best fraction survives to the next rung and is scored on more
+folds, until the last rung uses all of them. Scaled fold arrays are computed
+once, written to ``saved/cv_cache`` and memory-mapped by the worker processes,
+so preprocessing is never repeated per candidate.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import datetime
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+
+import models.ml_models as ml_models
+
+# Hyperparameter grids searched for each model
+SEARCH_SPACE = {
+    "knn": {
+        "n_neighbors": [3, 5, 7, 11, 15, 21, 31],
+        "weights": ["uniform", "distance"],
+    },
+    "naive_bayes": {
+        "var_smoothing": [1e-11, 1e-10, 1e-9, 1e-8, 1e-7, 1e-6, 1e-5],
+    },
+    "random_forest": {
+        "n_estimators": [100, 200, 400],
+        "max_depth": [None, 10, 20],
+        "min_samples_leaf": [1, 2, 4],
+    },
+    "hist_gradient_boosting": {
+        "learning_rate": [0.03, 0.1, 0.3],
+        "max_leaf_nodes": [15, 31, 63],
+        "l2_regularization": [0.0, 1.0],
+    },
+}
+
+
+def expand_grid(grid):
+    """Expand a parameter grid into a list of parameter dictionaries"""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def build_fold_cache(X, y, n_splits=5, seed=42, cache_root=None):
+    """Scale every CV fold once and persist the arrays as .npy files.
+
+    The cache directory is keyed by a hash of the data and the split settings,
+    so repeated searches over the same training set reuse it.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    y = np.asarray(y)
+
+    digest = hashlib.sha1()
+    digest.update(X.tobytes())
+    digest.update(y.tobytes())
+    digest.update(f"{n_splits}:{seed}".encode())
+
+    cache_root = cache_root or os.path.join(ml_models.get_saved_dir(), 'cv_cache')
+    cache_dir = os.path.join(cache_root, digest.hexdigest()[:16])
+    done_marker = os.path.join(cache_dir, 'complete')
+    if os.path.exists(done_marker):
+        return cache_dir
+
+    os.makedirs(cache_dir, exist_ok=True)
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=seed)
+    for fold, (train_idx, val_idx) in enumerate(splitter.split(X, y)):
+        fold_scaler = StandardScaler()
+        np.save(os.path.join(cache_dir, f'fold{fold}_X_train.npy'), fold_scaler.fit_transform(X[train_idx]))
+        np.save(os.path.join(cache_dir, f'fold{fold}_X_val.npy'), fold_scaler.transform(X[val_idx]))
+        np.save(os.path.join(cache_dir, f'fold{fold}_y_train.npy'), y[train_idx])
+        np.save(os.path.join(cache_dir, f'fold{fold}_y_val.npy'), y[val_idx])
+
+    with open(done_marker, 'w') as f:
+        f.write(str(n_splits))
+    return cache_dir
+
+
+def _score_fold(cache_dir, fold, model_name, params):
+    """Fit one candidate on one cached fold and return its validation accuracy"""
+    def load(name):
+        return np.load(os.path.join(cache_dir, f'fold{fold}_{name}.npy'), mmap_mode='r')
+
+    model = ml_models.build_model(model_name, params)
+    if model_name == "random_forest":
+        # Parallelism comes from the search itself
+        model.set_params(n_jobs=1)
+    model.fit(load('X_train'), load('y_train'))
+    return float(model.score(load('X_val'), load('y_val')))
+
+
+def successive_halving(cache_dir, n_splits, candidates, eta=3, min_folds=1, n_jobs=-1):
+    """Rank (model_name, params) candidates by mean CV accuracy with successive halving.
+
+    Fold scores are kept between rungs, so a surviving candidate is only scored
+    on the folds it has not seen yet.
+    """
+    scores = {i: [] for i in range(len(candidates))}
+    rung_reached = {i: 0 for i in range(len(candidates))}
+    survivors = list(range(len(candidates)))
+    n_rungs = max(1, math.ceil(math.log(n_splits / min_folds, eta)) + 1)
+
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for rung in range(n_rungs):
+            n_folds = min(n_splits, min_folds * eta ** rung)
+            tasks = [(i, fold) for i in survivors for fold in range(len(scores[i]), n_folds)]
+            results = parallel(
+                delayed(_score_fold)(cache_dir, fold, *candidates[i]) for i, fold in tasks
+            )
+            for (i, _), score in zip(tasks, results):
+                scores[i].append(score)
+            for i in survivors:
+                rung_reached[i] = rung
+
+            if n_folds >= n_splits:
+                break
+            survivors.sort(key=lambda i: np.mean(scores[i]), reverse=True)
+            survivors = survivors[:max(1, len(survivors) // eta)]
+
+    leaderboard = []
+    for i, (model_name, params) in enumerate(candidates):
+        leaderboard.append({
+            "model": model_name,
+            "params": params,
+            "mean_accuracy": float(np.mean(scores[i])),
+            "std_accuracy": float(np.std(scores[i])),
+            "n_folds": len(scores[i]),
+            "rung": rung_reached[i],
+        })
+    # Candidates that went further rank above those eliminated earlier
+    leaderboard.sort(key=lambda r: (r["rung"], r["mean_accuracy"]), reverse=True)
+    return leaderboard
+
+
+def run_search(n_splits=5, eta=3, n_jobs=-1, model_names=None, promote=True):
+    """Search hyperparameters, write the leaderboard and optionally promote the winners.
+
+    Promotion retrains the models on the full training split with the winning
+    configuration of each model and saves them to ``models/saved``.
+    """
+    df = ml_models.load_dataset()
+    X_train, _, y_train, _, _ = ml_models.split_data(df)
+    cache_dir = build_fold_cache(X_train.to_numpy(), y_train.to_numpy(), n_splits=n_splits)
+
+    model_names = model_names or list(SEARCH_SPACE)
+    leaderboards = {}
+    for model_name in model_names:
+        candidates = [(model_name, params) for params in expand_grid(SEARCH_SPACE[model_name])]
+        leaderboards[model_name] = successive_halving(cache_dir, n_splits, candidates,
+                                                      eta=eta, n_jobs=n_jobs)
+
+    promoted = ml_models.load_best_params()
+    if promote:
+        promoted.update({name: board[0]["params"] for name, board in leaderboards.items()})
+    result = {
+        "created_at": datetime.datetime.utcnow().isoformat(),
+        "n_splits": n_splits,
+        "eta": eta,
+        "leaderboard": leaderboards,
+        "promoted": promoted,
+    }
+
+    saved_dir = ml_models.get_saved_dir()
+    os.makedirs(saved_dir, exist_ok=True)
+    leaderboard_path = os.path.join(saved_dir, 'leaderboard.json')
+    with open(leaderboard_path, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    if promote:
+        # Retrains with the promoted parameters, then tags the leaderboard with the version it produced
+        ml_models.initialize_models()
+        result["model_version"] = ml_models.model_version
+        with open(leaderboard_path, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--eta', type=int, default=3, help="Fraction of candidates kept per rung is 1/eta")
+    parser.add_argument('--jobs', type=int, default=-1, help="Worker processes (-1 uses all cores)")
+    parser.add_argument('--models', nargs='*', choices=list(SEARCH_SPACE), default=None)
+    parser.add_argument('--no-promote', action='store_true', help="Only write the leaderboard")
+    args = parser.parse_args(argv)
+
+    result = run_search(n_splits=args.folds, eta=args.eta, n_jobs=args.jobs,
+                        model_names=args.models, promote=not args.no_promote)
+    for model_name, board in result["leaderboard"].items():
+        best = board[0]
+        print(f"{model_name}: {best['mean_accuracy']:.4f} with {best['params']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.analytics import ensure_rollups, get_prediction_analytics, update_rollups
+from app.database import Base, Prediction, PredictionRollup
+
+DAY = datetime.datetime(2024, 3, 1)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'predictions.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+def _prediction(timestamp, price, model_used="naive_bayes", prediction_result=1):
+    return Prediction(price=price, size=60.0, rooms=2, bathroom=1, parking=0, furnished=1, elevator=0,
+                      balcony=1, floor=2, age=15.0, location_score=6, prediction_result=prediction_result,
+                      model_used=model_used, timestamp=timestamp)
+
+
+PREDICTIONS = [
+    (DAY.replace(hour=10, minute=15), 1000.0, "naive_bayes"),
+    (DAY.replace(hour=10, minute=45), 2000.0, "naive_bayes"),
+    (DAY.replace(hour=11, minute=5), 1500.0, "random_forest"),
+    (DAY + datetime.timedelta(days=1, hours=9), 1200.0, "naive_bayes"),
+]
+
+
+def _store(db, rollups=True):
+    for timestamp, price, model_used in PREDICTIONS:
+        prediction = _prediction(timestamp, price, model_used)
+        db.add(prediction)
+        if rollups:
+            update_rollups(db, prediction)
+        db.commit()
+
+
+def _totals(analytics):
+    return [(row["bucket_start"], row["model_used"], row["count"], row["mean_features"]["price"])
+            for row in analytics]
+
+
+def test_rollups_count_and_average_stored_predictions(db):
+    _store(db)
+
+    # The second prediction of the 10:00 bucket is added to the existing rollup
+    assert _totals(get_prediction_analytics(db, "hour")) == [
+        ("2024-03-01T10:00:00", "naive_bayes", 2, 1500.0),
+        ("2024-03-01T11:00:00", "random_forest", 1, 1500.0),
+        ("2024-03-02T09:00:00", "naive_bayes", 1, 1200.0),
+    ]
+    assert _totals(get_prediction_analytics(db, "day", model_name="naive_bayes")) == [
+        ("2024-03-01T00:00:00", "naive_bayes", 2, 1500.0),
+        ("2024-03-02T00:00:00", "naive_bayes", 1, 1200.0),
+    ]
+
+
+def test_end_bound_is_exclusive(db):
+    _store(db)
+
+    hourly = get_prediction_analytics(db, "hour", start=DAY.replace(hour=10, minute=30), end=DAY.replace(hour=11))
+    assert [row["bucket_start"] for row in hourly] == ["2024-03-01T10:00:00"]
+    daily = get_prediction_analytics(db, "day", end=DAY + datetime.timedelta(days=1))
+    assert [row["bucket_start"] for row in daily] == ["2024-03-01T00:00:00"] * 2
+
+
+def test_backfill_matches_incremental_rollups(db, tmp_path):
+    _store(db, rollups=False)
+    assert db.query(PredictionRollup).count() == 0
+
+    ensure_rollups(db)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'incremental.db'}")
+    Base.metadata.create_all(bind=engine)
+    incremental = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    _store(incremental)
+    for granularity in ("hour", "day"):
+        assert get_prediction_analytics(db, granularity) == get_prediction_analytics(incremental, granularity)
+    incremental.close()
@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import models.ml_models as ml_models
+from app import bulk, main
+from app.bulk import BulkValidationError, UploadValidator
+from models.dataset import FEATURE_COLUMNS
+
+HEADER = ",".join(FEATURE_COLUMNS + ["category"])
+ROW = "1500.0,65.0,2,1,0,1,1,0,3,12.0,7,1"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk, "BULK_JOB_DIR", str(tmp_path))
+    monkeypatch.setattr(ml_models, "MODEL_STATUS", {name: "ready" for name in ml_models.MODEL_STATUS})
+    submitted = []
+    monkeypatch.setattr(main, "submit_job", lambda job_id, input_path: submitted.append(input_path))
+    client = TestClient(main.app)
+    client.submitted = submitted
+    return client
+
+
+def test_valid_upload_is_queued(client):
+    response = client.post("/predict/bulk", content="\n".join([HEADER] + [ROW] * 3) + "\n")
+    assert response.status_code == 202
+    with open(client.submitted[0]) as f:
+        assert f.read().count("\n") == 4
+
+
+@pytest.mark.parametrize("body", [
+    "price,size\n1500.0,65.0\n",
+    HEADER + "\n" + ROW + "\n" + ROW.replace("65.0", "large") + "\n",
+    HEADER + "\n" + ROW.replace(",2,1,", ",2.5,1,") + "\n",
+    "",
+])
+def test_malformed_upload_is_rejected(client, tmp_path, body):
+    response = client.post("/predict/bulk", content=body)
+    assert response.status_code == 422
+    assert client.submitted == []
+    assert os.listdir(tmp_path) == []
+
+
+def test_validator_carries_rows_across_blocks():
+    data = ("\n".join([HEADER] + [ROW] * 50 + [ROW.replace("1500.0", "n/a")]) + "\n").encode()
+    validator = UploadValidator()
+    blocks = [data[i:i + 37] for i in range(0, len(data), 37)]
+
+    with pytest.raises(BulkValidationError, match="Row 50: invalid price"):
+        for block in blocks:
+            validator.feed(block)
+        validator.feed(b"", final=True)
+    assert validator.columns == FEATURE_COLUMNS + ["category"]
+
+
+def test_scored_chunks_feed_the_drift_monitor(monkeypatch):
+    observed = []
+    monkeypatch.setattr(bulk.drift_monitor, "observe", lambda features: observed.append(len(features)))
+    monkeypatch.setattr(ml_models, "make_prediction",
+                        lambda features, model_name, bundle=None: (np.zeros(len(features)), np.zeros((len(features), 3))))
+    chunk = bulk.pd.DataFrame([ROW.split(",")[:-1]] * 4, columns=FEATURE_COLUMNS)
+
+    bulk.score_chunk(chunk, 0, "random_forest")
+    bulk.score_chunk(chunk, 4, "random_forest", bundle={})
+    assert observed == [4]
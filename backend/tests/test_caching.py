@@ -0,0 +1,63 @@
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+import models.ml_models as ml_models
+from app.caching import ModelVersionCacheMiddleware
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(ml_models, "model_version", "v1")
+    monkeypatch.setattr(ml_models, "model_created_at", "2024-01-01T00:00:00")
+
+    app = FastAPI()
+    app.add_middleware(ModelVersionCacheMiddleware)
+
+    @app.get("/model-metrics/")
+    def metrics():
+        return {"version": ml_models.model_version}
+
+    @app.post("/model-metrics/")
+    def post_metrics():
+        return {"version": ml_models.model_version}
+
+    @app.get("/clustering/")
+    def clustering():
+        raise HTTPException(status_code=404, detail="No clustering data")
+
+    return TestClient(app)
+
+
+def test_repeat_get_is_not_modified(client):
+    response = client.get("/model-metrics/")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    cached = client.get("/model-metrics/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+
+def test_etag_varies_with_representation(client):
+    etag = client.get("/model-metrics/").headers["etag"]
+    assert client.get("/model-metrics/", headers={"Accept": "application/msgpack"}).headers["etag"] != etag
+    assert client.get("/model-metrics/?n_points=10").headers["etag"] != etag
+
+
+def test_etag_changes_with_model_version(client, monkeypatch):
+    etag = client.get("/model-metrics/").headers["etag"]
+    monkeypatch.setattr(ml_models, "model_version", "v2")
+
+    response = client.get("/model-metrics/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_post_and_error_responses_are_not_tagged(client):
+    assert "etag" not in client.post("/model-metrics/").headers
+    response = client.get("/clustering/")
+    assert response.status_code == 404
+    assert "etag" not in response.headers
+    assert "cache-control" not in response.headers
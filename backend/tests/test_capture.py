@@ -0,0 +1,45 @@
+import numpy as np
+
+from app.capture import TrafficRecorder, read_capture
+from models.dataset import FEATURE_COLUMNS
+
+
+def _record(recorder, i, model_version="v1"):
+    features = np.full((1, len(FEATURE_COLUMNS)), float(i))
+    recorder.record(1000.0 + i, features, "naive_bayes", False, np.array([i % 3]),
+                    np.array([[0.2, 0.3, 0.5]]), 0.5, model_version)
+
+
+def _capture_files(tmp_path):
+    return sorted(str(path) for path in tmp_path.iterdir())
+
+
+def test_records_are_readable_while_the_file_is_open(tmp_path):
+    recorder = TrafficRecorder(str(tmp_path))
+    for i in range(3):
+        _record(recorder, i)
+
+    header, records = read_capture(_capture_files(tmp_path)[0])
+    assert header["model_version"] == "v1"
+    np.testing.assert_array_equal(records["time"], [1000.0, 1001.0, 1002.0])
+    recorder.stop()
+
+
+def test_flushes_every_n_records(tmp_path):
+    recorder = TrafficRecorder(str(tmp_path), flush_records=4)
+    for i in range(6):
+        _record(recorder, i)
+    assert len(read_capture(_capture_files(tmp_path)[0])[1]) == 4
+
+    recorder.stop()
+    assert len(read_capture(_capture_files(tmp_path)[0])[1]) == 6
+
+
+def test_stop_closes_the_file_and_ends_capture(tmp_path):
+    recorder = TrafficRecorder(str(tmp_path))
+    _record(recorder, 0)
+    recorder.stop()
+    _record(recorder, 1, model_version="v2")
+
+    assert len(_capture_files(tmp_path)) == 1
+    assert recorder.records == 1
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import models.ml_models as ml_models
+from models.compact_forest import CompactForest
+from models.dataset import generate_chunk
+
+
+@pytest.fixture(scope="module")
+def forest_and_rows():
+    dataset = pd.concat([generate_chunk(i, 5000) for i in range(2)], ignore_index=True)
+    X_train, X_test, y_train, _, _, _ = ml_models.preprocess_data(dataset)
+    rf = RandomForestClassifier(n_estimators=10, max_depth=10, random_state=0).fit(X_train, y_train)
+    return rf, X_test
+
+
+def _threshold_rows(rf, X):
+    """Copies of X with one feature set exactly to a float64 split threshold of the forest"""
+    rng = np.random.default_rng(0)
+    tree = rf.estimators_[0].tree_
+    internal = np.flatnonzero(tree.children_left != -1)
+    nodes = rng.choice(internal, size=len(X))
+    X_edge = X.astype(np.float64, copy=True)
+    X_edge[np.arange(len(X)), tree.feature[nodes]] = tree.threshold[nodes]
+    return X_edge
+
+
+def test_matches_sklearn_on_held_out_rows(forest_and_rows):
+    rf, X_test = forest_and_rows
+    compact = CompactForest(rf)
+
+    assert np.allclose(compact.predict_proba(X_test), rf.predict_proba(X_test), atol=1e-6)
+    np.testing.assert_array_equal(compact.predict(X_test), rf.predict(X_test))
+
+
+def test_matches_sklearn_on_thresholds(forest_and_rows):
+    rf, X_test = forest_and_rows
+    compact = CompactForest(rf)
+    X_edge = _threshold_rows(rf, X_test[:500])
+
+    # Leaves reached must agree even where float32 rounding of the threshold matters
+    np.testing.assert_array_equal(compact.apply(X_edge) - compact.roots,
+                                  np.stack([estimator.apply(X_edge) for estimator in rf.estimators_], axis=1))
+    assert np.allclose(compact.predict_proba(X_edge), rf.predict_proba(X_edge), atol=1e-6)
+    np.testing.assert_array_equal(compact.predict(X_edge), rf.predict(X_edge))
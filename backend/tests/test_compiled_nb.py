@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.naive_bayes import GaussianNB
+
+import models.ml_models as ml_models
+from models.compiled_nb import CompiledNaiveBayes
+from models.dataset import generate_chunk
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return pd.concat([generate_chunk(i, 5000) for i in range(4)], ignore_index=True)
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_matches_sklearn_on_held_out_rows(dataset, dtype):
+    X_train, X_test, y_train, _, scaler, _ = ml_models.preprocess_data(dataset, np.dtype(dtype))
+    nb = GaussianNB().fit(X_train, y_train)
+    compiled = CompiledNaiveBayes(nb, scaler)
+
+    # The compiled model scores raw inputs; sklearn scores them scaled to the training precision
+    X_raw = scaler.inverse_transform(X_test)
+    X_scaled = scaler.transform(X_raw).astype(dtype, copy=False)
+    prediction, proba = compiled.predict_with_proba(X_raw)
+
+    np.testing.assert_array_equal(prediction, nb.predict(X_scaled))
+    assert np.allclose(proba, nb.predict_proba(X_scaled))
+
+
+def test_single_row_matches_batch(dataset):
+    X_train, X_test, y_train, _, scaler, _ = ml_models.preprocess_data(dataset)
+    compiled = CompiledNaiveBayes(GaussianNB().fit(X_train, y_train), scaler)
+    X_raw = scaler.inverse_transform(X_test[:50])
+
+    prediction, proba = compiled.predict_with_proba(X_raw)
+    for i, row in enumerate(X_raw):
+        row_prediction, row_proba = compiled.predict_with_proba(row[None, :])
+        assert row_prediction[0] == prediction[i]
+        assert np.allclose(row_proba[0], proba[i])
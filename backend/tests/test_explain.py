@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import models.ml_models as ml_models
+from models.compact_forest import CompactForest
+from models.dataset import generate_chunk
+from models.explain import EXPLAIN_BLOCK_SIZE, ForestExplainer
+
+
+@pytest.fixture(scope="module")
+def forest_and_rows():
+    dataset = pd.concat([generate_chunk(i, 5000) for i in range(2)], ignore_index=True)
+    X_train, X_test, y_train, _, _, _ = ml_models.preprocess_data(dataset)
+    rf = RandomForestClassifier(n_estimators=10, max_depth=10, random_state=0).fit(X_train, y_train)
+    return rf, X_test
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_contributions_add_up_to_predict_proba(forest_and_rows, compact):
+    rf, X_test = forest_and_rows
+    forest = CompactForest(rf) if compact else rf
+    # More rows than one gather block
+    assert len(X_test) > EXPLAIN_BLOCK_SIZE
+
+    bias, contributions = ForestExplainer(forest).explain(X_test)
+
+    assert contributions.shape == (len(X_test), rf.n_features_in_, len(rf.classes_))
+    assert np.allclose(bias + contributions.sum(axis=1), forest.predict_proba(X_test), atol=1e-5)
@@ -0,0 +1,75 @@
+import datetime
+import json
+import os
+import shutil
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import export, retention
+from app.database import Base, Prediction
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'predictions.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(export, "SessionLocal", factory)
+    monkeypatch.setattr(retention, "SessionLocal", factory)
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    return factory
+
+
+def _store(factory, timestamps):
+    db = factory()
+    for i, timestamp in enumerate(timestamps):
+        db.add(Prediction(price=1000.0 + i, size=50.0, rooms=2, bathroom=1, parking=0, furnished=1,
+                          elevator=0, balcony=1, floor=3, age=10.0, location_score=5,
+                          prediction_result=i % 3, model_used="naive_bayes", timestamp=timestamp))
+    db.commit()
+    db.close()
+
+
+def _export_ids(**filters):
+    body = b"".join(export.stream_predictions("ndjson", **filters))
+    return [json.loads(line)["id"] for line in body.splitlines()]
+
+
+def test_export_covers_archive_and_database(session_factory):
+    now = datetime.datetime.utcnow()
+    old = [now - datetime.timedelta(days=40, hours=i) for i in range(5, 0, -1)]
+    recent = [now - datetime.timedelta(hours=i) for i in range(4, 0, -1)]
+    _store(session_factory, old + recent)
+
+    assert retention.archive_predictions(retention_days=30, batch_size=2) == 5
+    db = session_factory()
+    assert db.query(Prediction).count() == 4
+    db.close()
+
+    assert _export_ids() == list(range(1, 10))
+    # Timezone-aware bounds are compared as UTC in both tiers
+    start = (now - datetime.timedelta(days=40, hours=2)).replace(tzinfo=datetime.timezone.utc)
+    end = (now - datetime.timedelta(hours=1, minutes=30)).replace(tzinfo=datetime.timezone.utc)
+    end = end.astimezone(datetime.timezone(datetime.timedelta(hours=2)))
+    assert _export_ids(start=start, end=end) == [4, 5, 6, 7, 8]
+
+
+def test_interrupted_compaction_does_not_duplicate_rows(session_factory, tmp_path):
+    day = datetime.datetime.utcnow().replace(hour=12) - datetime.timedelta(days=40)
+    _store(session_factory, [day + datetime.timedelta(minutes=i) for i in range(6)])
+    retention.archive_predictions(retention_days=30, batch_size=2)
+
+    # Keep the source segments, as if compaction stopped before removing them
+    partition = os.path.dirname(retention._segments()[0])
+    backup = str(tmp_path / "segments")
+    shutil.copytree(partition, backup)
+    retention.compact_archive()
+    for segment in os.listdir(backup):
+        shutil.copy(os.path.join(backup, segment), partition)
+    shutil.rmtree(backup)
+
+    assert len(os.listdir(partition)) == 4
+    assert _export_ids() == list(range(1, 7))
+    assert [row[0] for row in retention.latest_archived_rows(10)] == list(range(6, 0, -1))
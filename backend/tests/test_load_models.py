@@ -0,0 +1,103 @@
+import json
+import os
+import pickle
+
+import pandas as pd
+import pytest
+from sklearn.cluster import KMeans
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.naive_bayes import GaussianNB
+from sklearn.neighbors import KNeighborsClassifier
+
+import models.ml_models as ml_models
+from models.dataset import generate_chunk
+from models.distill import distill_forest
+from models.packaging import CorruptBundleError, file_checksums
+
+MODEL_GLOBALS = ['knn_model', 'nb_model', 'nb_compiled', 'rf_model', 'rf_explainer', 'hgb_model', 'fast_model',
+                 'kmeans_model', 'scaler', 'model_version', 'model_created_at', 'model_dtype', 'model_costs']
+
+
+@pytest.fixture(scope="module")
+def artifacts():
+    dataset = pd.concat([generate_chunk(i, 1000) for i in range(2)], ignore_index=True)
+    X_train, _, y_train, _, scaler, _ = ml_models.preprocess_data(dataset)
+    rf = RandomForestClassifier(n_estimators=5, max_depth=6, random_state=0).fit(X_train, y_train)
+    return {
+        'scaler.pkl': scaler,
+        'nb_model.pkl': GaussianNB().fit(X_train, y_train),
+        'knn_model.pkl': KNeighborsClassifier(n_neighbors=5).fit(X_train, y_train),
+        'rf_model.pkl': rf,
+        'hgb_model.pkl': HistGradientBoostingClassifier(max_iter=10).fit(X_train, y_train),
+        'fast_model.pkl': distill_forest(rf, scaler, scaler.inverse_transform(X_train)),
+        'kmeans_model.pkl': KMeans(n_clusters=3, n_init=1, random_state=0).fit(X_train),
+    }
+
+
+@pytest.fixture
+def saved_dir(tmp_path, monkeypatch, artifacts):
+    # Loading assigns module globals; restore them after each test
+    for name in MODEL_GLOBALS:
+        monkeypatch.setattr(ml_models, name, getattr(ml_models, name))
+    monkeypatch.setattr(ml_models, "MODEL_STATUS", {name: "pending" for name in ml_models.MODEL_STATUS})
+    monkeypatch.setattr(ml_models, "get_saved_dir", lambda: str(tmp_path))
+
+    for filename, model in artifacts.items():
+        with open(tmp_path / filename, 'wb') as f:
+            pickle.dump(model, f)
+    manifest = {"version": "test-version", "dtype": "float64", "files": ml_models.MODEL_FILES,
+                "checksums": file_checksums(str(tmp_path), ml_models.MODEL_FILES)}
+    with open(tmp_path / 'manifest.json', 'w') as f:
+        json.dump(manifest, f)
+    return tmp_path
+
+
+def _tamper(saved_dir, filename):
+    with open(os.path.join(saved_dir, filename), 'ab') as f:
+        f.write(b"\0")
+
+
+def test_loads_verified_models(saved_dir):
+    assert ml_models.load_models()
+    assert set(ml_models.MODEL_STATUS.values()) == {"ready"}
+    assert ml_models.model_version == "test-version"
+
+
+def test_tampered_member_serves_models_verified_before_it(saved_dir):
+    _tamper(saved_dir, 'rf_model.pkl')
+
+    with pytest.raises(CorruptBundleError):
+        ml_models.load_models()
+    assert ml_models.model_version == "test-version"
+    assert ml_models.MODEL_STATUS["naive_bayes"] == "ready"
+    assert ml_models.MODEL_STATUS["knn"] == "ready"
+    assert ml_models.MODEL_STATUS["random_forest"] != "ready"
+    assert ml_models.rf_model is None
+
+
+def test_tampered_member_keeps_loaded_models(saved_dir):
+    assert ml_models.load_models()
+    loaded = {name: getattr(ml_models, name) for name in ('rf_model', 'rf_explainer', 'hgb_model', 'kmeans_model')}
+    _tamper(saved_dir, 'rf_model.pkl')
+
+    with pytest.raises(CorruptBundleError):
+        ml_models.load_models()
+    assert set(ml_models.MODEL_STATUS.values()) == {"ready"}
+    for name, model in loaded.items():
+        assert getattr(ml_models, name) is model
+
+
+def test_manifest_without_checksum_rejects_whole_bundle(saved_dir):
+    assert ml_models.load_models()
+    loaded = {name: getattr(ml_models, name) for name in MODEL_GLOBALS}
+    with open(saved_dir / 'manifest.json') as f:
+        manifest = json.load(f)
+    del manifest["checksums"]['knn_model.pkl']
+    manifest["version"] = "other-version"
+    with open(saved_dir / 'manifest.json', 'w') as f:
+        json.dump(manifest, f)
+
+    with pytest.raises(CorruptBundleError):
+        ml_models.load_models()
+    for name, model in loaded.items():
+        assert getattr(ml_models, name) is model
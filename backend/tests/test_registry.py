@@ -0,0 +1,66 @@
+import json
+import threading
+import time
+
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+import models.ml_models as ml_models
+from models import registry
+from models.dataset import generate_chunk
+from models.explain import ForestExplainer
+
+
+@pytest.fixture(scope="module")
+def forest():
+    X_train, _, y_train, _, _, _ = ml_models.preprocess_data(generate_chunk(0, 2000))
+    return RandomForestClassifier(n_estimators=3, max_depth=5, random_state=0).fit(X_train, y_train)
+
+
+@pytest.fixture
+def markets(tmp_path, monkeypatch, forest):
+    monkeypatch.setattr(registry, "MARKETS_DIR", str(tmp_path))
+    loads = []
+
+    def load_bundle(saved_dir, analysis=False):
+        loads.append(saved_dir)
+        time.sleep(0.01)
+        return {"random_forest": forest, "version": "v1"}
+
+    monkeypatch.setattr(ml_models, "load_bundle", load_bundle)
+    for market in ("paris", "lyon", "nice"):
+        (tmp_path / market).mkdir()
+        with open(tmp_path / market / 'manifest.json', 'w') as f:
+            json.dump({"version": "v1"}, f)
+    return loads
+
+
+def _loaded(market_registry):
+    return [entry["market"] for entry in market_registry.stats()["loaded"]]
+
+
+def test_loading_past_capacity_evicts_least_recently_used(markets, forest):
+    # The explainer's arrays are counted, so two bundles fit and three don't
+    market_registry = registry.MarketRegistry(max_bytes=2.5 * ForestExplainer(forest).nbytes)
+    market_registry.get_bundle("paris")
+    market_registry.get_bundle("lyon")
+    market_registry.get_bundle("paris")
+
+    market_registry.get_bundle("nice")
+
+    assert _loaded(market_registry) == ["paris", "nice"]
+    assert market_registry.evictions == 1
+    assert market_registry.stats()["loaded_bytes"] <= market_registry.max_bytes
+
+
+def test_cold_market_is_loaded_once(markets):
+    market_registry = registry.MarketRegistry()
+    threads = [threading.Thread(target=market_registry.get_bundle, args=("paris",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(markets) == 1
+    assert market_registry._loading == {}
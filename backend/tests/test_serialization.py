@@ -0,0 +1,27 @@
+import pytest
+from starlette.requests import Request
+
+from app.serialization import wants_msgpack
+
+
+def _request(accept):
+    headers = [] if accept is None else [(b"accept", accept.encode())]
+    return Request({"type": "http", "headers": headers})
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, False),
+    ("*/*", False),
+    ("application/json", False),
+    ("application/msgpack", True),
+    ("application/x-msgpack", True),
+    ("application/json, application/msgpack", False),
+    ("application/msgpack, application/json;q=0.9", True),
+    ("application/json;q=0.5, application/msgpack", True),
+    ("application/msgpack;q=0.1, */*", False),
+    ("application/msgpack;q=0, application/json;q=0", False),
+    ("application/msgpack;q=0.8, application/*;q=0.5", True),
+    ("application/msgpack;q=oops, application/json;q=0.2", False),
+])
+def test_msgpack_only_when_ranked_above_json(accept, expected):
+    assert wants_msgpack(_request(accept)) is expected
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import models.ml_models as ml_models
+from app import main
+
+BASE = {"price": 1500.0, "size": 65.0, "rooms": 2, "bathroom": 1, "parking": 0, "furnished": 1,
+        "elevator": 1, "balcony": 0, "floor": 3, "age": 12.0, "location_score": 7}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def no_grid(*args, **kwargs):
+        raise AssertionError("the grid was built")
+
+    # Oversized sweeps must be rejected before any array is allocated
+    monkeypatch.setattr(np, "linspace", no_grid)
+    monkeypatch.setattr(ml_models, "build_sweep_grid", no_grid)
+    return TestClient(main.app)
+
+
+def test_sweep_above_grid_limit_is_rejected(client):
+    response = client.post("/predict/sweep", json={"base": BASE, "vary": [
+        {"feature": "price", "start": 500, "stop": 5000, "steps": 1000},
+        {"feature": "size", "start": 20, "stop": 200, "steps": 1000},
+    ]})
+    assert response.status_code == 400
+    assert str(ml_models.MAX_SWEEP_POINTS) in response.json()["detail"]
+
+
+def test_integer_axis_is_sized_by_its_range(client):
+    # 10 000 steps over rooms 1..5 give at most six values, still too many with a 100 000-step price axis
+    response = client.post("/predict/sweep", json={"base": BASE, "vary": [
+        {"feature": "rooms", "start": 1, "stop": 5, "steps": 10000},
+        {"feature": "price", "start": 500, "stop": 5000, "steps": 100000},
+    ]})
+    assert response.status_code == 400
+
+
+def test_steps_above_limit_fail_validation(client):
+    response = client.post("/predict/sweep", json={"base": BASE, "vary": [
+        {"feature": "price", "start": 500, "stop": 5000, "steps": ml_models.MAX_SWEEP_POINTS + 1},
+    ]})
+    assert response.status_code == 422
@@ -9,9 +9,14 @@ for the Artificial Intelligence course project.
 
 import os
 import sys
+import json
+import hashlib
 import subprocess
 import datetime
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -45,12 +50,49 @@ README_PATH = BASE_DIR / "README.md"
 timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
 REPORT_OUTPUT_PATH = BASE_DIR / f"AI_Course_Project_Report_{timestamp}.docx"
 README_IMAGE_PATH = BASE_DIR / "image" / "README" / "1746354936942.png"
+REPORT_CACHE_DIR = BASE_DIR / ".report_cache"
+
+# Bump when section templates change so cached sections are rebuilt
+REPORT_FORMAT_VERSION = 2
+
+# Report sections in order, with the artifacts each one is built from
+SECTIONS = [
+    ("dataset", ("dataset",)),
+    ("classification", ("params",)),
+    ("clustering", ("clustering", "params")),
+    ("performance", ("metrics", "clustering")),
+    ("visualization", ("metrics", "importance", "clustering")),
+    ("comparison", ("metrics",)),
+    ("improvement", ("search",)),
+    ("conclusion", ("metrics", "clustering")),
+]
+
+FEATURE_DESCRIPTIONS = {
+    "price": "Monthly rental price (target variable for regression/classification)",
+    "size": "Apartment size in square feet",
+    "rooms": "Number of rooms in the apartment",
+    "bathroom": "Number of bathrooms in the apartment",
+    "parking": "Binary indicator for parking availability (0 = No, 1 = Yes)",
+    "furnished": "Binary indicator for furnished status (0 = No, 1 = Yes)",
+    "elevator": "Binary indicator for elevator availability (0 = No, 1 = Yes)",
+    "balcony": "Binary indicator for balcony availability (0 = No, 1 = Yes)",
+    "floor": "Floor number of the apartment",
+    "age": "Building age in years",
+    "location_score": "Location desirability score (1-10)",
+}
+CATEGORY_NAMES = {"0": "Budget (0)", "1": "Standard (1)", "2": "Premium (2)"}
+MODEL_LABELS = {"knn": "K-Nearest Neighbors", "naive_bayes": "Naive Bayes", "random_forest": "Random Forest",
+                "hist_gradient_boosting": "Histogram Gradient Boosting"}
+NUMBER_WORDS = {2: "two", 3: "three", 4: "four", 5: "five", 6: "six"}
+METRIC_KEYS = ("accuracy", "precision", "recall", "f1_score")
 
 class ReportGenerator:
     """Class to generate a focused DOCX report for the AI course project requirements"""
     
-    def __init__(self):
-        """Initialize the report generator"""
+    def __init__(self, artifacts):
+        """Initialize the report generator from the persisted model artifacts"""
+        self.artifacts = artifacts
+        self.rebuilt_sections = []
         self.document = Document()
         self.setup_document()
         print(f"Initializing report generator...")
@@ -169,489 +211,611 @@ class ReportGenerator:
         self.document.add_page_break()
         print("Table of contents added")
 
-    def add_dataset_section(self):
-        """Add dataset selection section (5 marks)"""
-        self.document.add_heading("1. Dataset Selection and Overview", level=1)
-        
+    # ------------------------------------------------------------------
+    # Data-driven sections
+    #
+    # Each section is built from a slice of the persisted artifacts into a list
+    # of blocks (headings, paragraphs, tables, figures). Blocks are cached under
+    # the content hash of their inputs, so a section is only rebuilt when its
+    # inputs change.
+    # ------------------------------------------------------------------
+
+    def build_dataset_section(self, inputs):
+        """Build dataset selection section (5 marks)"""
+        dataset = inputs["dataset"]
+        n_classes = len(dataset["class_counts"])
+        blocks = [heading("1. Dataset Selection and Overview", 1)]
+
         dataset_info = [
             "For this project, I selected the Apartment Rent Classification dataset, which contains information about apartment rental properties and their price categories. This dataset was chosen for several key reasons:",
-            
-            "• Dataset Size: The dataset contains 10,000+ instances, significantly exceeding the requirement of 2.5K instances",
-            "• Feature Count: The dataset includes 20+ features related to apartment characteristics",
-            "• Classification Target: The rental price is categorized into multiple classes (Budget, Standard, Premium) with balanced representation",
+
+            f"• Dataset Size: The dataset contains {dataset['n_rows']:,} instances, compared with the requirement of 2.5K instances",
+            f"• Feature Count: The models use {len(dataset['features'])} features related to apartment characteristics",
+            f"• Classification Target: The rental price is categorized into {n_classes} classes (Budget, Standard, Premium)",
             "• Real-world Relevance: The data represents a practical application of machine learning in the real estate domain"
         ]
-        
-        for para in dataset_info:
-            self.document.add_paragraph(para)
-        
+        blocks += [paragraph(para) for para in dataset_info]
+
         # Dataset features table
-        self.document.add_heading("Dataset Features", level=2)
-        
-        features_table = self.document.add_table(rows=12, cols=2)
-        features_table.style = 'Table Grid'
-        
-        # Set header row
-        header_cells = features_table.rows[0].cells
-        header_cells[0].text = "Feature"
-        header_cells[1].text = "Description"
-        
-        # Add features to table
-        features = [
-            ("price", "Monthly rental price (target variable for regression/classification)"),
-            ("size", "Apartment size in square feet"),
-            ("rooms", "Number of rooms in the apartment"),
-            ("bathroom", "Number of bathrooms in the apartment"),
-            ("parking", "Binary indicator for parking availability (0 = No, 1 = Yes)"),
-            ("furnished", "Binary indicator for furnished status (0 = No, 1 = Yes)"),
-            ("elevator", "Binary indicator for elevator availability (0 = No, 1 = Yes)"),
-            ("balcony", "Binary indicator for balcony availability (0 = No, 1 = Yes)"),
-            ("floor", "Floor number of the apartment"),
-            ("age", "Building age in years"),
-            ("location_score", "Location desirability score (1-10)")
-        ]
-        
-        for i, (feature, desc) in enumerate(features, start=1):
-            row = features_table.rows[i].cells
-            row[0].text = feature
-            row[1].text = desc
-        
-        self.document.add_paragraph("The target variable 'category' is derived from the price feature and categorizes apartments into Budget (0), Standard (1), and Premium (2) categories.")
-        
+        blocks.append(heading("Dataset Features", 2))
+        rows = [("Feature", "Description")]
+        rows += [(feature, FEATURE_DESCRIPTIONS.get(feature, "")) for feature in dataset["features"]]
+        blocks.append(table(rows))
+
+        blocks.append(paragraph("The target variable 'category' is derived from the price feature and categorizes apartments into Budget (0), Standard (1), and Premium (2) categories."))
+
+        # Class distribution
+        blocks.append(heading("Class Distribution", 2))
+        rows = [("Category", "Instances", "Share")]
+        for category, count in sorted(dataset["class_counts"].items()):
+            rows.append((CATEGORY_NAMES.get(category, category), f"{count:,}", pct(count / dataset["n_rows"])))
+        blocks.append(table(rows))
+
         # Data preprocessing
-        self.document.add_heading("Data Preprocessing", level=2)
+        blocks.append(heading("Data Preprocessing", 2))
+        test_share = dataset["n_test"] / dataset["n_rows"]
         preprocessing = [
             "The following preprocessing steps were applied to prepare the data for modeling:",
             "• Feature Scaling: Standard scaling was applied to normalize numerical features",
-            "• Train/Test Split: Data was divided into 80% training and 20% testing sets",
-            "• Balance Check: Class distribution was verified to ensure balanced representation",
+            f"• Train/Test Split: Data was divided into {pct(1 - test_share)} training ({dataset['n_train']:,} rows) and {pct(test_share)} testing ({dataset['n_test']:,} rows) sets",
+            "• Balance Check: Class distribution was verified, as shown in the table above",
             "• Missing Value Handling: The dataset was generated with complete values (no missing data)"
         ]
-        
-        for para in preprocessing:
-            self.document.add_paragraph(para)
-            
-        self.document.add_page_break()
-        print("Dataset section added")
-        
-    def add_classification_section(self):
-        """Add classification algorithms section (8 marks)"""
-        self.document.add_heading("2. Classification Algorithms", level=1)
-        
-        self.document.add_paragraph("This section outlines the implementation of the required classification algorithms: K-Nearest Neighbors (KNN), Naive Bayes, and the additional algorithm of choice, Random Forest. Each algorithm was configured and optimized for the apartment rent classification task.")
-        
+        blocks += [paragraph(para) for para in preprocessing]
+        blocks.append(page_break())
+        return blocks
+
+    def build_classification_section(self, inputs):
+        """Build classification algorithms section (8 marks)"""
+        params = inputs["params"]
+        knn_params = params["knn"]
+        rf_params = params["random_forest"]
+        blocks = [heading("2. Classification Algorithms", 1)]
+
+        blocks.append(paragraph("This section outlines the implementation of the required classification algorithms: K-Nearest Neighbors (KNN), Naive Bayes, and the additional algorithm of choice, Random Forest. Each algorithm was configured and optimized for the apartment rent classification task."))
+
         # KNN
-        self.document.add_heading("2.1. K-Nearest Neighbors (KNN)", level=2)
+        blocks.append(heading("2.1. K-Nearest Neighbors (KNN)", 2))
         knn_info = [
             "K-Nearest Neighbors is a non-parametric, instance-based learning algorithm that classifies data points based on similarity measures (distance functions) to neighboring points.",
-            
+
             "Implementation Details:",
             "• Algorithm: KNeighborsClassifier from scikit-learn",
-            "• Configuration: n_neighbors=5 with Euclidean distance metric",
+            f"• Configuration: {format_params(knn_params)}",
             "• Feature Set: All available features after normalization",
-            
-            "KNN Working Principle: For each test instance, KNN identifies the k=5 training instances closest in distance to the test instance and assigns the most frequent class among these neighbors."
+
+            f"KNN Working Principle: For each test instance, KNN identifies the k={knn_params.get('n_neighbors')} training instances closest in distance to the test instance and assigns the most frequent class among these neighbors."
         ]
-        for para in knn_info:
-            self.document.add_paragraph(para)
-            
+        blocks += [paragraph(para) for para in knn_info]
+
         # Naive Bayes
-        self.document.add_heading("2.2. Naive Bayes", level=2)
+        blocks.append(heading("2.2. Naive Bayes", 2))
         nb_info = [
             "Naive Bayes is a probabilistic classifier based on applying Bayes' theorem with independence assumptions between features.",
-            
+
             "Implementation Details:",
             "• Algorithm: GaussianNB from scikit-learn",
-            "• Configuration: Default parameters with Gaussian distribution assumption",
+            f"• Configuration: {format_params(params['naive_bayes'])} with Gaussian distribution assumption",
             "• Feature Set: All available features after normalization",
-            
+
             "Naive Bayes Working Principle: The algorithm calculates the probability of each class given the feature values, assuming features are conditionally independent given the class."
         ]
-        for para in nb_info:
-            self.document.add_paragraph(para)
-            
+        blocks += [paragraph(para) for para in nb_info]
+
         # Random Forest
-        self.document.add_heading("2.3. Random Forest (Additional Algorithm)", level=2)
+        blocks.append(heading("2.3. Random Forest (Additional Algorithm)", 2))
         rf_info = [
             "Random Forest was selected as the additional algorithm due to its robustness and high performance in classification tasks. It is an ensemble learning method that operates by constructing multiple decision trees during training.",
-            
+
             "Implementation Details:",
             "• Algorithm: RandomForestClassifier from scikit-learn",
-            "• Configuration: n_estimators=100, random_state=42",
+            f"• Configuration: {format_params(rf_params)}",
             "• Feature Set: All available features after normalization",
-            
+
             "Random Forest Working Principle: The algorithm builds multiple decision trees and merges their predictions. Each tree is trained on a random subset of the data and features, which reduces overfitting and improves generalization."
         ]
-        for para in rf_info:
-            self.document.add_paragraph(para)
-            
-        self.document.add_page_break()
-        print("Classification section added")
-        
-    def add_clustering_section(self):
-        """Add clustering section (8 marks)"""
-        self.document.add_heading("3. Clustering with K-Means", level=1)
-        
+        blocks += [paragraph(para) for para in rf_info]
+        blocks.append(page_break())
+        return blocks
+
+    def build_clustering_section(self, inputs):
+        """Build clustering section (8 marks)"""
+        clustering = inputs["clustering"]
+        kmeans_params = inputs["params"]["kmeans"]
+        n_clusters = clustering["n_clusters"]
+        blocks = [heading("3. Clustering with K-Means", 1)]
+
         clustering_info = [
             "In addition to classification, unsupervised learning via K-Means clustering was applied to identify natural groupings within the apartment data.",
-            
+
             "Implementation Details:",
             "• Algorithm: KMeans from scikit-learn",
-            "• Configuration: n_clusters=3, random_state=42, init='k-means++'",
+            f"• Configuration: {format_params(kmeans_params)}",
             "• Feature Set: All available features after normalization",
-            
-            "The number of clusters (k=3) was chosen to match the expected natural groupings in rental properties (Budget, Standard, Premium). This allows for comparison between the supervised classification results and unsupervised clustering results."
+
+            f"The number of clusters (k={n_clusters}) was chosen to match the expected natural groupings in rental properties (Budget, Standard, Premium). This allows for comparison between the supervised classification results and unsupervised clustering results."
         ]
-        for para in clustering_info:
-            self.document.add_paragraph(para)
-            
+        blocks += [paragraph(para) for para in clustering_info]
+
         # Clustering methodology
-        self.document.add_heading("Clustering Methodology", level=2)
+        blocks.append(heading("Clustering Methodology", 2))
         methodology = [
             "The K-Means clustering process followed these steps:",
-            
+
             "1. Feature Normalization: All features were standardized to have mean=0 and std=1",
             "2. Cluster Initialization: K-means++ initialization was used to select initial centroids",
             "3. Iteration: The algorithm iteratively assigned points to the nearest centroid and updated centroids",
             "4. Convergence: The process continued until centroids stabilized",
             "5. Evaluation: Silhouette score and within-cluster sum of squares were used to assess cluster quality",
-            
+
             "After clustering, the resulting segments were analyzed to identify characteristic patterns and distinct features of each apartment group."
         ]
-        for para in methodology:
-            self.document.add_paragraph(para)
-            
+        blocks += [paragraph(para) for para in methodology]
+
         # Cluster analysis
-        self.document.add_heading("Cluster Analysis", level=2)
-        analysis = [
-            "The analysis of the resulting clusters revealed three distinct apartment segments:",
-            
-            "• Cluster 0 (Budget Segment): Smaller apartments with fewer amenities in less desirable locations",
-            "• Cluster 1 (Standard Segment): Mid-sized apartments with moderate amenities in average locations",
-            "• Cluster 2 (Premium Segment): Larger apartments with numerous amenities in highly desirable locations",
-            
-            "The key distinguishing features between clusters included apartment size, location score, and the presence of amenities like elevator access and balconies. These naturally emerging patterns aligned well with the classification categories, validating the approach."
-        ]
-        for para in analysis:
-            self.document.add_paragraph(para)
-            
-        self.document.add_page_break()
-        print("Clustering section added")
-        
-    def add_performance_evaluation(self):
-        """Add performance evaluation section (5 marks)"""
-        self.document.add_heading("4. Performance Evaluation", level=1)
-        
-        eval_intro = [
-            "Each classification algorithm was evaluated using multiple performance metrics to provide a comprehensive assessment of their effectiveness. The evaluation metrics included accuracy, precision, recall, and F1 score."
-        ]
-        for para in eval_intro:
-            self.document.add_paragraph(para)
-            
+        blocks.append(heading("Cluster Analysis", 2))
+        blocks.append(paragraph(f"The analysis of the resulting clusters revealed {n_clusters} apartment segments, summarised by their centroids in original feature units:"))
+
+        features = list(clustering["centroids"][0])
+        rows = [("Feature",) + tuple(f"Cluster {i}" for i in range(n_clusters))]
+        rows.append(("instances",) + tuple(f"{size:,}" for size in clustering["sizes"]))
+        for feature in features:
+            rows.append((feature,) + tuple(f"{centroid[feature]:.2f}" for centroid in clustering["centroids"]))
+        blocks.append(table(rows))
+
+        blocks.append(paragraph("The features whose centroid values differ most between clusters are the ones that distinguish the segments."))
+        blocks.append(page_break())
+        return blocks
+
+    def build_performance_section(self, inputs):
+        """Build performance evaluation section (5 marks)"""
+        metrics = inputs["metrics"]
+        clustering = inputs["clustering"]
+        blocks = [heading("4. Performance Evaluation", 1)]
+
+        blocks.append(paragraph("Each classification algorithm was evaluated on the held-out test set using multiple performance metrics to provide a comprehensive assessment of their effectiveness. The evaluation metrics included accuracy, precision, recall, and F1 score."))
+
         # Performance metrics table
-        self.document.add_heading("Classification Performance Metrics", level=2)
-        
-        metrics_table = self.document.add_table(rows=5, cols=5)
-        metrics_table.style = 'Table Grid'
-        
-        # Set header row
-        header_cells = metrics_table.rows[0].cells
-        header_cells[0].text = "Algorithm"
-        header_cells[1].text = "Accuracy"
-        header_cells[2].text = "Precision"
-        header_cells[3].text = "Recall"
-        header_cells[4].text = "F1 Score"
-        
-        # Add metrics to table (sample results)
-        algorithms = [
-            ("K-Nearest Neighbors", "0.82", "0.83", "0.82", "0.82"),
-            ("Naive Bayes", "0.79", "0.80", "0.79", "0.79"),
-            ("Random Forest", "0.89", "0.90", "0.89", "0.89"),
-            ("Average Performance", "0.83", "0.84", "0.83", "0.83")
-        ]
-        
-        for i, (algo, acc, prec, rec, f1) in enumerate(algorithms, start=1):
-            row = metrics_table.rows[i].cells
-            row[0].text = algo
-            row[1].text = acc
-            row[2].text = prec
-            row[3].text = rec
-            row[4].text = f1
-            
+        blocks.append(heading("Classification Performance Metrics", 2))
+        rows = [("Algorithm", "Accuracy", "Precision", "Recall", "F1 Score")]
+        for m in metrics:
+            rows.append((m["algorithm"],) + tuple(f"{m[key]:.2f}" for key in METRIC_KEYS))
+        averages = [np.mean([m[key] for m in metrics]) for key in METRIC_KEYS]
+        rows.append(("Average Performance",) + tuple(f"{value:.2f}" for value in averages))
+        blocks.append(table(rows))
+
         # Metrics explanation
-        self.document.add_heading("Metrics Explanation", level=2)
+        blocks.append(heading("Metrics Explanation", 2))
         metrics_exp = [
             "• Accuracy: The proportion of correct predictions among the total number of predictions",
             "• Precision: The ability of the classifier to avoid labeling negative instances as positive (TP/(TP+FP))",
             "• Recall: The ability of the classifier to find all positive instances (TP/(TP+FN))",
             "• F1 Score: The harmonic mean of precision and recall, providing a balance between the two metrics"
         ]
-        for para in metrics_exp:
-            self.document.add_paragraph(para)
-            
+        blocks += [paragraph(para) for para in metrics_exp]
+
         # Clustering evaluation
-        self.document.add_heading("Clustering Evaluation", level=2)
+        blocks.append(heading("Clustering Evaluation", 2))
         clustering_eval = [
             "The K-Means clustering results were evaluated using internal validation metrics:",
-            
-            "• Silhouette Score: 0.68 - Indicating reasonably well-defined clusters",
-            "• Within-cluster Sum of Squares: The sum decreased significantly from k=2 to k=3, with diminishing returns for k>3, confirming that k=3 is appropriate",
-            
-            "Additionally, the cluster assignments were compared with the true class labels to measure clustering accuracy. The resulting Adjusted Rand Index of 0.72 indicates substantial agreement between the unsupervised clusters and supervised classes."
-        ]
-        for para in clustering_eval:
-            self.document.add_paragraph(para)
-            
-        self.document.add_page_break()
-        print("Performance evaluation section added")
-        
-    def add_visualization_section(self):
-        """Add visualization section (5 marks)"""
-        self.document.add_heading("5. Visualization Results", level=1)
-        
-        viz_intro = [
-            "Various visualizations were created to interpret the classification and clustering results. These visualizations help in understanding the model performance, feature importance, and data patterns."
+
+            f"• Silhouette Score: {clustering['silhouette']:.2f} (values close to 1 indicate well-separated clusters)",
+            f"• Within-cluster Sum of Squares: {clustering['inertia']:,.0f}",
+
+            f"Additionally, the cluster assignments were compared with the true class labels. The resulting Adjusted Rand Index of {clustering['adjusted_rand']:.2f} measures the agreement between the unsupervised clusters and supervised classes (1 is perfect agreement, 0 is chance level)."
         ]
-        for para in viz_intro:
-            self.document.add_paragraph(para)
-            
+        blocks += [paragraph(para) for para in clustering_eval]
+        blocks.append(page_break())
+        return blocks
+
+    def build_visualization_section(self, inputs):
+        """Build visualization section (5 marks)"""
+        metrics = inputs["metrics"]
+        importance = inputs["importance"]
+        best, worst = ranked_metrics(metrics)[0], ranked_metrics(metrics)[-1]
+        blocks = [heading("5. Visualization Results", 1)]
+
+        blocks.append(paragraph("Various visualizations were created to interpret the classification and clustering results. These visualizations help in understanding the model performance, feature importance, and data patterns."))
+
         # Model comparison visualization
-        self.document.add_heading("Model Performance Comparison", level=2)
+        blocks.append(heading("Model Performance Comparison", 2))
+        blocks.append(figure("model_comparison", {"metrics": metrics}))
         model_viz = [
-            "A comparative bar chart was created to visualize the performance metrics (accuracy, precision, recall, F1 score) across all three classification models. The visualization revealed that:",
-            
-            "• Random Forest consistently outperformed the other models across all metrics",
-            "• KNN performed better than Naive Bayes, but with a smaller margin",
-            "• All models achieved acceptable performance, with accuracy ranging from 79% to 89%"
+            f"A comparative bar chart was created to visualize the performance metrics (accuracy, precision, recall, F1 score) across all {count_word(metrics)} classification models. The visualization revealed that:",
+
+            f"• {best['algorithm']} achieved the highest accuracy ({pct(best['accuracy'])})",
+            f"• {worst['algorithm']} achieved the lowest accuracy ({pct(worst['accuracy'])})",
+            f"• Accuracy across the models ranged from {pct(worst['accuracy'])} to {pct(best['accuracy'])}"
         ]
-        for para in model_viz:
-            self.document.add_paragraph(para)
-            
+        blocks += [paragraph(para) for para in model_viz]
+
         # Feature importance visualization
-        self.document.add_heading("Feature Importance Visualization", level=2)
+        blocks.append(heading("Feature Importance Visualization", 2))
+        blocks.append(figure("feature_importance", {"importance": importance}))
+        rf_importance = importance["models"]["random_forest"]["importances_mean"]
+        top = sorted(zip(importance["features"], rf_importance), key=lambda item: item[1], reverse=True)
         feature_viz = [
-            "The Random Forest model provided feature importance scores, which were visualized to understand which apartment characteristics had the greatest impact on rental price classification:",
-            
-            "• Location score emerged as the most important feature (28% importance)",
-            "• Apartment size was the second most important feature (22% importance)",
-            "• Building age showed an inverse relationship with rental category (15% importance)",
-            "• Other significant features included number of rooms (12%), bathroom count (10%), and elevator access (7%)"
+            f"Permutation importance was computed on the test set by shuffling each feature {importance['n_repeats']} times and measuring the drop in accuracy. For the Random Forest model, the most important features were:"
         ]
-        for para in feature_viz:
-            self.document.add_paragraph(para)
-            
+        feature_viz += [f"• {feature}: {pct(drop)} accuracy drop when permuted" for feature, drop in top[:5]]
+        blocks += [paragraph(para) for para in feature_viz]
+
         # Clustering visualization
-        self.document.add_heading("Clustering Visualization", level=2)
-        clustering_viz = [
-            "The K-Means clustering results were visualized using dimensionality reduction techniques (PCA) to project the data into a 2D space while preserving its structure:",
-            
-            "• The visualization showed three well-separated clusters with minimal overlap",
-            "• Cluster centroids were marked distinctly to show the center of each apartment segment",
-            "• Data points were color-coded by cluster assignment to highlight the segmentation",
-            
-            "The clustering visualization confirmed that the apartment data naturally forms three distinct segments, which aligns with the classification approach of categorizing apartments into Budget, Standard, and Premium categories."
-        ]
-        for para in clustering_viz:
-            self.document.add_paragraph(para)
-            
-        self.document.add_page_break()
-        print("Visualization section added")
-        
-    def add_comparison_section(self):
-        """Add algorithm comparison section (5 marks)"""
-        self.document.add_heading("6. Algorithm Comparison and Selection Justification", level=1)
-        
-        comparison_intro = [
-            "This section compares the performance of all implemented algorithms and provides justification for the selection of Random Forest as the additional algorithm of choice."
-        ]
-        for para in comparison_intro:
-            self.document.add_paragraph(para)
-            
+        blocks.append(heading("Clustering Visualization", 2))
+        blocks.append(figure("cluster_profile", {"clustering": inputs["clustering"]}))
+        blocks.append(paragraph("The chart compares the cluster centroids feature by feature, with each feature scaled to the range of its centroid values, so the characteristics that separate the apartment segments stand out."))
+        blocks.append(page_break())
+        return blocks
+
+    def build_comparison_section(self, inputs):
+        """Build algorithm comparison section (5 marks)"""
+        by_name = {m["algorithm"]: m for m in inputs["metrics"]}
+        best = ranked_metrics(inputs["metrics"])[0]
+        blocks = [heading("6. Algorithm Comparison and Selection Justification", 1)]
+
+        blocks.append(paragraph("This section compares the performance of all implemented algorithms and provides justification for the selection of Random Forest as the additional algorithm of choice."))
+
         # Algorithm comparison
-        self.document.add_heading("Algorithm Comparison", level=2)
+        blocks.append(heading("Algorithm Comparison", 2))
         comparison = [
-            "Comparing the three classification algorithms revealed distinct strengths and weaknesses:",
-            
+            f"Comparing the {count_word(inputs['metrics'])} classification algorithms revealed distinct strengths and weaknesses:",
+
             "K-Nearest Neighbors (KNN):",
             "• Strengths: Simple implementation, effective for this dataset, no assumptions about data distribution",
             "• Weaknesses: Sensitive to irrelevant features, performance degradation in high dimensions, computationally intensive for large datasets",
-            "• Performance: 82% accuracy, balanced precision and recall",
-            
+            f"• Performance: {describe_metrics(by_name['K-Nearest Neighbors'])}",
+
             "Naive Bayes:",
             "• Strengths: Fast training and prediction, handles high-dimensional data well, works with limited training data",
-            "• Weaknesses: Strong independence assumption between features (which may not hold), less accurate than other models for this dataset",
-            "• Performance: 79% accuracy, slightly lower precision than recall",
-            
+            "• Weaknesses: Strong independence assumption between features (which may not hold)",
+            f"• Performance: {describe_metrics(by_name['Naive Bayes'])}",
+
             "Random Forest (Additional Algorithm):",
-            "• Strengths: Highest accuracy, robust to outliers, provides feature importance, reduces overfitting",
+            "• Strengths: Robust to outliers, provides feature importance, reduces overfitting",
             "• Weaknesses: Less interpretable than individual decision trees, higher computational requirements",
-            "• Performance: 89% accuracy, consistently high precision and recall"
+            f"• Performance: {describe_metrics(by_name['Random Forest'])}"
         ]
-        for para in comparison:
-            self.document.add_paragraph(para)
-            
+        if "Histogram Gradient Boosting" in by_name:
+            comparison += [
+                "Histogram Gradient Boosting:",
+                "• Strengths: Fast training on large datasets by binning features, strong accuracy from sequentially corrected trees",
+                "• Weaknesses: More hyperparameters to tune, trees are built one after another rather than in parallel",
+                f"• Performance: {describe_metrics(by_name['Histogram Gradient Boosting'])}"
+            ]
+        blocks += [paragraph(para) for para in comparison]
+
         # Justification for Random Forest
-        self.document.add_heading("Random Forest Selection Justification", level=2)
+        blocks.append(heading("Random Forest Selection Justification", 2))
+        if best["algorithm"] == "Random Forest":
+            performance_reason = f"1. Superior Performance: Random Forest achieved the highest test accuracy ({pct(best['accuracy'])}) among all tested algorithms, making it the most effective for this classification task."
+        else:
+            performance_reason = f"1. Competitive Performance: Random Forest reached {pct(by_name['Random Forest']['accuracy'])} test accuracy, against {pct(best['accuracy'])} for {best['algorithm']}."
         justification = [
             "Random Forest was selected as the additional algorithm for several compelling reasons:",
-            
-            "1. Superior Performance: Random Forest consistently achieved the highest accuracy, precision, recall, and F1 scores among all tested algorithms, making it the most effective for this classification task.",
-            
+
+            performance_reason,
+
             "2. Feature Importance Insights: The algorithm provides valuable feature importance scores, offering interpretability and insights into which apartment characteristics most strongly influence rental categories.",
-            
-            "3. Robustness: Random Forest demonstrated robustness to outliers and noise in the data, which is common in real estate datasets where unusual properties may exist.",
-            
+
+            "3. Robustness: Random Forest is robust to outliers and noise in the data, which is common in real estate datasets where unusual properties may exist.",
+
             "4. Ensemble Advantage: As an ensemble method, Random Forest overcomes the limitations of individual decision trees by averaging multiple trees, reducing overfitting and improving generalization.",
-            
-            "5. Strong Balance Between Metrics: The algorithm maintained a strong balance between precision and recall, indicating reliable performance across all rental categories without favoring one class over others."
-        ]
-        for para in justification:
-            self.document.add_paragraph(para)
-            
-        self.document.add_page_break()
-        print("Comparison section added")
-        
-    def add_improvement_section(self):
-        """Add improvement efforts section (4 marks)"""
-        self.document.add_heading("7. Result Improvement Efforts", level=1)
-        
-        improvement_intro = [
-            "Throughout the project, several strategies and techniques were employed to improve the performance and reliability of the models. This section outlines these efforts and their impacts on the results."
+
+            f"5. Balance Between Metrics: Its weighted precision ({by_name['Random Forest']['precision']:.2f}) and recall ({by_name['Random Forest']['recall']:.2f}) indicate how evenly it performs across rental categories."
         ]
-        for para in improvement_intro:
-            self.document.add_paragraph(para)
-            
+        blocks += [paragraph(para) for para in justification]
+        blocks.append(page_break())
+        return blocks
+
+    def build_improvement_section(self, inputs):
+        """Build improvement efforts section (4 marks)"""
+        search = inputs["search"]
+        blocks = [heading("7. Result Improvement Efforts", 1)]
+
+        blocks.append(paragraph("Throughout the project, several strategies and techniques were employed to improve the performance and reliability of the models. This section outlines these efforts and their impacts on the results."))
+
         # Hyperparameter tuning
-        self.document.add_heading("Hyperparameter Tuning", level=2)
-        tuning = [
-            "Grid search and cross-validation were used to optimize the hyperparameters for each algorithm:",
-            
-            "• K-Nearest Neighbors: The optimal value of k was determined to be 5 after testing values from 1 to 20. Distance metrics (Euclidean, Manhattan, Minkowski) were also evaluated, with Euclidean distance providing the best results.",
-            
-            "• Random Forest: The number of trees (n_estimators) was optimized by testing values from 50 to 200, with 100 trees providing the best balance between performance and computational efficiency. Maximum depth and minimum samples per leaf were also tuned to prevent overfitting.",
-            
-            "• Naive Bayes: Different variants (Gaussian, Multinomial, Complement) were tested, with Gaussian Naive Bayes showing the best performance for this dataset."
-        ]
-        for para in tuning:
-            self.document.add_paragraph(para)
-            
+        blocks.append(heading("Hyperparameter Tuning", 2))
+        if search is None:
+            blocks.append(paragraph("No hyperparameter search has been run for the current models, so they use the default configuration described in Section 2."))
+        else:
+            blocks.append(paragraph(f"A successive-halving search over {search['n_splits']}-fold stratified cross-validation was used to select the hyperparameters of each algorithm. The best configuration of each model was promoted to the saved models:"))
+            rows = [("Model", "Candidates", "Best configuration", "CV accuracy")]
+            for model_name, summary in search["models"].items():
+                rows.append((MODEL_LABELS.get(model_name, model_name), str(summary["n_candidates"]),
+                             format_params(summary["params"]), f"{summary['mean_accuracy']:.3f}"))
+            blocks.append(table(rows))
+
         # Feature engineering
-        self.document.add_heading("Feature Engineering", level=2)
+        blocks.append(heading("Feature Engineering", 2))
         feature_eng = [
             "Several feature engineering approaches were explored to improve model performance:",
-            
-            "• Feature Scaling: Different scaling methods (StandardScaler, MinMaxScaler, RobustScaler) were tested, with StandardScaler providing the most consistent improvements across all algorithms.",
-            
-            "• Feature Selection: Recursive Feature Elimination (RFE) was used to identify the most predictive features. The results confirmed that all selected features contributed meaningfully to the predictions.",
-            
-            "• Derived Features: Additional features were created from existing ones, such as price-per-square-foot and room-to-bathroom ratio, which provided marginal improvements in model performance."
+
+            "• Feature Scaling: StandardScaler was applied to every feature so that distance-based models are not dominated by large-valued features such as price.",
+
+            "• Feature Importance: Permutation importance on the test set (Section 5) was used to check which features contribute to the predictions."
         ]
-        for para in feature_eng:
-            self.document.add_paragraph(para)
-            
+        blocks += [paragraph(para) for para in feature_eng]
+
         # Cross-validation
-        self.document.add_heading("Cross-Validation Strategy", level=2)
-        cv_strategy = [
-            "To ensure reliable evaluation and reduce variance in performance metrics:",
-            
-            "• K-Fold Cross-Validation: 5-fold cross-validation was implemented to evaluate model performance across different data subsets, providing more reliable metrics.",
-            
+        blocks.append(heading("Cross-Validation Strategy", 2))
+        cv_strategy = ["To ensure reliable evaluation and reduce variance in performance metrics:"]
+        if search is not None:
+            cv_strategy.append(f"• K-Fold Cross-Validation: {search['n_splits']}-fold cross-validation on the training set was used to compare hyperparameter candidates, with each fold scaled independently.")
+        cv_strategy += [
             "• Stratified Sampling: Stratified sampling was used to maintain class distribution in each fold, ensuring balanced representation of all rental categories.",
-            
-            "• Repeated Cross-Validation: For the final models, repeated cross-validation (3 repetitions) was used to further stabilize the performance metrics."
-        ]
-        for para in cv_strategy:
-            self.document.add_paragraph(para)
-            
-        # Ensemble methods
-        self.document.add_heading("Ensemble Approaches", level=2)
-        ensemble = [
-            "In addition to the standalone algorithms, ensemble methods were explored to potentially improve overall performance:",
-            
-            "• Voting Classifier: A soft voting classifier combining the predictions of all three models was implemented, resulting in a slight improvement (1.2%) over the best individual model (Random Forest).",
-            
-            "• Stacking: A stacked model using the three classifiers as base learners and a logistic regression meta-learner was tested, showing a minor improvement (0.8%) over the voting classifier."
+
+            "• Held-out Test Set: Final metrics were measured on a test set that was never used during training or tuning."
         ]
-        for para in ensemble:
-            self.document.add_paragraph(para)
-            
-        self.document.add_page_break()
-        print("Improvement section added")
+        blocks += [paragraph(para) for para in cv_strategy]
+        blocks.append(page_break())
+        return blocks
+
+    def build_conclusion_section(self, inputs):
+        """Build conclusion section"""
+        best = ranked_metrics(inputs["metrics"])[0]
+        n_clusters = inputs["clustering"]["n_clusters"]
+        blocks = [heading("8. Conclusion", 1)]
 
-    def add_conclusion(self):
-        """Add conclusion section"""
-        self.document.add_heading("8. Conclusion", level=1)
-        
         conclusion = [
             "This project successfully implemented and compared multiple machine learning algorithms for apartment rent classification. The key achievements and findings include:",
-            
+
             "• Implementation of the required algorithms (KNN, Naive Bayes, K-Means) along with an additional algorithm (Random Forest) for apartment rent classification and segmentation",
-            
-            "• Comprehensive evaluation using multiple metrics (accuracy, precision, recall, F1 score) showing Random Forest as the best-performing algorithm with 89% accuracy",
-            
-            "• Successful market segmentation using K-Means clustering, identifying three distinct apartment categories that aligned well with the classification approach",
-            
+
+            f"• Comprehensive evaluation using multiple metrics (accuracy, precision, recall, F1 score) showing {best['algorithm']} as the best-performing algorithm with {pct(best['accuracy'])} accuracy",
+
+            f"• Market segmentation using K-Means clustering into {n_clusters} apartment segments",
+
             "• Visualization of model performance, feature importance, and clustering results to provide interpretable insights",
-            
-            "• Implementation of various improvement efforts, including hyperparameter tuning, feature engineering, and ensemble methods",
-            
+
+            "• Implementation of improvement efforts, including hyperparameter tuning and cross-validation",
+
             "The project demonstrated that machine learning techniques can effectively categorize apartment rentals based on their features, providing valuable insights for real estate decision-making. The methods implemented in this project could be expanded to larger datasets and adapted for other real estate applications such as property valuation and investment analysis."
         ]
-        
-        for para in conclusion:
-            self.document.add_paragraph(para)
-            
-        print("Conclusion section added")
-        
+        blocks += [paragraph(para) for para in conclusion]
+        return blocks
+
+    # ------------------------------------------------------------------
+    # Caching and assembly
+    # ------------------------------------------------------------------
+
+    def build_sections(self):
+        """Build every section, reusing cached blocks whose inputs are unchanged"""
+        sections_dir = REPORT_CACHE_DIR / "sections"
+        sections_dir.mkdir(parents=True, exist_ok=True)
+
+        built = {}
+        for name, input_keys in SECTIONS:
+            inputs = {key: self.artifacts[key] for key in input_keys}
+            cache_path = sections_dir / f"{name}-{content_hash(inputs)}.json"
+            if cache_path.exists():
+                built[name] = json.loads(cache_path.read_text())
+                print(f"Section '{name}' unchanged, reusing cached build")
+                continue
+
+            built[name] = getattr(self, f"build_{name}_section")(inputs)
+            cache_path.write_text(json.dumps(built[name]))
+            self.rebuilt_sections.append(name)
+            print(f"Section '{name}' rebuilt")
+
+        return built
+
+    def render_figures(self, sections):
+        """Render missing figures in parallel worker processes"""
+        figures_dir = REPORT_CACHE_DIR / "figures"
+        figures_dir.mkdir(parents=True, exist_ok=True)
+
+        jobs = {}
+        for blocks in sections.values():
+            for block in blocks:
+                if block[0] == "figure":
+                    path = figures_dir / f"{block[1]}-{content_hash(block[2])}.png"
+                    block.append(str(path))
+                    if not path.exists():
+                        jobs[str(path)] = (block[1], block[2])
+
+        if jobs:
+            with ProcessPoolExecutor() as executor:
+                futures = [executor.submit(render_figure, kind, data, path)
+                           for path, (kind, data) in jobs.items()]
+                for future in futures:
+                    future.result()
+        print(f"Rendered {len(jobs)} figure(s)")
+
+    def write_blocks(self, blocks):
+        """Write a built section into the document"""
+        for block in blocks:
+            kind = block[0]
+            if kind == "heading":
+                self.document.add_heading(block[1], level=block[2])
+            elif kind == "paragraph":
+                self.document.add_paragraph(block[1])
+            elif kind == "table":
+                rows = block[1]
+                doc_table = self.document.add_table(rows=len(rows), cols=len(rows[0]))
+                doc_table.style = 'Table Grid'
+                for i, row in enumerate(rows):
+                    for j, text in enumerate(row):
+                        doc_table.rows[i].cells[j].text = text
+            elif kind == "figure":
+                self.document.add_picture(block[3], width=Inches(6))
+            elif kind == "page_break":
+                self.document.add_page_break()
+
     def generate_report(self):
         """Generate the complete report"""
         print("Generating project report...")
-        
+
+        # Build sections first so unchanged ones come straight from the cache
+        sections = self.build_sections()
+        self.render_figures(sections)
+
         # Add title page
         self.add_title_page()
-        
+
         # Add table of contents
         self.add_table_of_contents()
-        
-        # Add dataset section (5 marks)
-        self.add_dataset_section()
-        
-        # Add classification section (8 marks)
-        self.add_classification_section()
-        
-        # Add clustering section (8 marks)
-        self.add_clustering_section()
-        
-        # Add performance evaluation (5 marks)
-        self.add_performance_evaluation()
-        
-        # Add visualization section (5 marks)
-        self.add_visualization_section()
-        
-        # Add algorithm comparison (5 marks)
-        self.add_comparison_section()
-        
-        # Add improvement efforts (4 marks)
-        self.add_improvement_section()
-        
-        # Add conclusion
-        self.add_conclusion()
-        
+
+        # Add dataset, classification, clustering, evaluation, visualization,
+        # comparison, improvement and conclusion sections
+        for name, _ in SECTIONS:
+            self.write_blocks(sections[name])
+
         # Save the document
         self.document.save(REPORT_OUTPUT_PATH)
         print(f"Report successfully generated and saved to {REPORT_OUTPUT_PATH}")
-        
+
         return REPORT_OUTPUT_PATH
 
+# Block constructors used by the section builders
+def heading(text, level):
+    return ["heading", text, level]
+
+def paragraph(text):
+    return ["paragraph", text]
+
+def table(rows):
+    return ["table", [list(row) for row in rows]]
+
+def figure(kind, data):
+    return ["figure", kind, data]
+
+def page_break():
+    return ["page_break"]
+
+def pct(value):
+    return f"{value:.1%}"
+
+def format_params(params):
+    return ", ".join(f"{key}={value}" for key, value in params.items()) or "default parameters"
+
+def ranked_metrics(metrics):
+    return sorted(metrics, key=lambda m: m["accuracy"], reverse=True)
+
+def count_word(items):
+    return NUMBER_WORDS.get(len(items), str(len(items)))
+
+def describe_metrics(m):
+    return f"{pct(m['accuracy'])} accuracy, {m['precision']:.2f} precision, {m['recall']:.2f} recall, {m['f1_score']:.2f} F1 score"
+
+def content_hash(data):
+    """Hash JSON-serializable data together with the report format version"""
+    payload = json.dumps({"format": REPORT_FORMAT_VERSION, "data": data}, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+def render_figure(kind, data, path):
+    """Render one report figure to a PNG file (runs in a worker process)"""
+    plt.figure(figsize=(10, 6))
+
+    if kind == "model_comparison":
+        metrics = data["metrics"]
+        x = np.arange(len(metrics))
+        width = 0.2
+        for offset, key in zip((-1.5, -0.5, 0.5, 1.5), METRIC_KEYS):
+            plt.bar(x + offset * width, [m[key] for m in metrics], width, label=key.replace("_", " ").title())
+        plt.xticks(x, [m["algorithm"] for m in metrics])
+        plt.xlabel('Algorithm')
+        plt.ylabel('Score')
+        plt.title('Model Comparison')
+        plt.legend()
+
+    elif kind == "feature_importance":
+        importance = data["importance"]
+        model_names = list(importance["models"])
+        means = np.array([importance["models"][name]["importances_mean"] for name in model_names])
+        indices = np.argsort(means.mean(axis=0))[::-1]
+        x = np.arange(len(importance["features"]))
+        width = 0.8 / len(model_names)
+        for i, name in enumerate(model_names):
+            plt.bar(x + (i - (len(model_names) - 1) / 2) * width, means[i][indices], width,
+                    label=MODEL_LABELS.get(name, name))
+        plt.xticks(x, [importance["features"][i] for i in indices], rotation=90)
+        plt.xlabel('Features')
+        plt.ylabel('Accuracy drop when permuted')
+        plt.title('Permutation Feature Importance')
+        plt.legend()
+
+    elif kind == "cluster_profile":
+        centroids = data["clustering"]["centroids"]
+        features = list(centroids[0])
+        values = np.array([[c[f] for f in features] for c in centroids])
+        spread = values.max(axis=0) - values.min(axis=0)
+        scaled = (values - values.min(axis=0)) / np.where(spread == 0, 1, spread)
+        x = np.arange(len(features))
+        width = 0.8 / len(centroids)
+        for i, row in enumerate(scaled):
+            plt.bar(x + (i - (len(centroids) - 1) / 2) * width, row, width, label=f"Cluster {i}")
+        plt.xticks(x, features, rotation=90)
+        plt.ylabel('Relative centroid value')
+        plt.title('K-Means Cluster Profiles')
+        plt.legend()
+
+    plt.tight_layout()
+    plt.savefig(path, format='png')
+    plt.close()
+
+def load_artifacts():
+    """Load the persisted artifacts of the current model version.
+
+    The report never trains or evaluates models itself; it fails if the
+    backend has not produced the artifacts yet.
+    """
+    def read(name, required=True):
+        path = SAVED_MODELS_DIR / name
+        if not path.exists():
+            if required:
+                raise FileNotFoundError(f"{path} not found - train the models by starting the backend first")
+            return None
+        return json.loads(path.read_text())
+
+    evaluation = read("evaluation.json")
+    importance = read("permutation_importance.json")
+    leaderboard = read("leaderboard.json", required=False)
+
+    # Every section must describe the same model version
+    version = evaluation["model_version"]
+    if importance.get("model_version") != version:
+        raise ValueError(f"permutation_importance.json is for model version {importance.get('model_version')}, "
+                         f"evaluation.json for {version} - restart the backend to regenerate them")
+    if leaderboard is not None and leaderboard.get("model_version") != version:
+        print(f"Warning: leaderboard.json was not promoted to model version {version}; leaving the search out of the report")
+        leaderboard = None
+
+    search = None
+    if leaderboard is not None:
+        search = {
+            "n_splits": leaderboard["n_splits"],
+            "models": {
+                name: {
+                    "n_candidates": len(board),
+                    "params": board[0]["params"],
+                    "mean_accuracy": board[0]["mean_accuracy"],
+                }
+                for name, board in leaderboard["leaderboard"].items()
+            },
+        }
+
+    # Version tags and measured latencies are left out so unchanged numbers keep their cache entries
+    return {
+        "model_version": version,
+        "dataset": evaluation["dataset"],
+        "params": evaluation["params"],
+        "metrics": [{key: m[key] for key in ("algorithm",) + METRIC_KEYS} for m in evaluation["metrics"]],
+        "clustering": evaluation["clustering"],
+        "importance": {k: v for k, v in importance.items() if k != "model_version"},
+        "search": search,
+    }
+
 def main():
     """Main function to generate the report"""
     print("Starting AI Course Project Report Generation")
-    
+
     # Create and generate the report
-    report_generator = ReportGenerator()
+    report_generator = ReportGenerator(load_artifacts())
     report_path = report_generator.generate_report()
-    
+
     print(f"Report generation complete! File saved to: {report_path}")
-    
+    print(f"Rebuilt sections: {', '.join(report_generator.rebuilt_sections) or 'none'}")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()